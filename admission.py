@@ -0,0 +1,142 @@
+"""
+Controle de admissão por endpoint.
+
+Cada kind tem um orçamento de execuções simultâneas (os que abrem Chromium
+custam ~300 MB cada). Quem passa do orçamento espera numa fila por um tempo
+limitado; se o slot não abrir, recebe ``Overloaded`` e a rota responde 429
+com ``Retry-After`` em vez de empilhar até o container estourar a memória.
+
+A fila é por ordem de chegada (um ``Condition.notify`` acorda qualquer um) e
+as execuções de fundo (agendador) entram sempre atrás das requisições, que
+assim não ficam tomando 429 enquanto um acúmulo de agendamentos escoa.
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+import metrics
+
+DEFAULT_LIMITS = {
+    "monitor": 1,
+    "setlistfm": 1,
+    "cmc": 1,
+    "discogs": 2,
+    "bluesky": 4,
+    "monitorflip": 4,
+}
+
+# Quanto tempo (s) uma requisição síncrona espera por um slot antes do 429
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30"))
+# Quantas chamadas podem esperar na fila de cada kind
+MAX_WAITING = int(os.getenv("ADMISSION_MAX_WAITING", "10"))
+# Retry-After quando ainda não há histórico de duração do kind
+DEFAULT_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "30"))
+
+
+def admission_limit(kind: str) -> int:
+    return int(os.getenv(f"ADMISSION_LIMIT_{kind.upper()}", DEFAULT_LIMITS.get(kind, 2)))
+
+
+class Overloaded(Exception):
+    def __init__(self, kind: str, retry_after: int):
+        super().__init__(f"Limite de execucoes simultaneas de {kind} atingido")
+        self.kind = kind
+        self.retry_after = retry_after
+
+
+class _Budget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.running = 0
+        self.waiting = 0
+        self.avg_duration = None
+        self.cond = threading.Condition()
+        # fila de espera: (background, ticket) com as requisições antes das de fundo
+        self.queue = []
+
+    def enqueue(self, background: bool) -> object:
+        ticket = object()
+        position = len(self.queue)
+        if not background:
+            position = next((i for i, (bg, _) in enumerate(self.queue) if bg), position)
+        self.queue.insert(position, (background, ticket))
+        return ticket
+
+    def dequeue(self, ticket):
+        self.queue = [entry for entry in self.queue if entry[1] is not ticket]
+
+    def turn(self, ticket) -> bool:
+        """Há slot livre e ``ticket`` é o primeiro da fila."""
+        return self.running < self.limit and self.queue[0][1] is ticket
+
+
+class Admission:
+    def __init__(self, queue_timeout: float = QUEUE_TIMEOUT, max_waiting: int = MAX_WAITING):
+        self.queue_timeout = queue_timeout
+        self.max_waiting = max_waiting
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, kind: str) -> _Budget:
+        with self._lock:
+            budget = self._budgets.get(kind)
+            if budget is None:
+                budget = self._budgets[kind] = _Budget(admission_limit(kind))
+            return budget
+
+    def _retry_after(self, budget: _Budget) -> int:
+        if budget.avg_duration is None:
+            return DEFAULT_RETRY_AFTER
+        return max(1, int(budget.avg_duration))
+
+    @contextmanager
+    def slot(self, kind: str, timeout: float = None, background: bool = False):
+        """Ocupa um slot do kind. ``timeout`` None espera indefinidamente (jobs assíncronos).
+
+        ``background`` (agendador) só é atendido quando nenhuma requisição espera.
+        """
+        budget = self._budget(kind)
+        start = time.monotonic()
+
+        with budget.cond:
+            if budget.running >= budget.limit and timeout is not None and budget.waiting >= self.max_waiting:
+                metrics.inc("admission_rejected_total", kind=kind, reason="queue_full")
+                raise Overloaded(kind, self._retry_after(budget))
+
+            budget.waiting += 1
+            ticket = budget.enqueue(background)
+            try:
+                admitted = budget.cond.wait_for(lambda: budget.turn(ticket), timeout=timeout)
+            finally:
+                budget.waiting -= 1
+                budget.dequeue(ticket)
+                # o próximo da fila pode ter virado o primeiro (ou ainda há slot livre)
+                budget.cond.notify_all()
+            if not admitted:
+                metrics.inc("admission_rejected_total", kind=kind, reason="timeout")
+                raise Overloaded(kind, self._retry_after(budget))
+            budget.running += 1
+
+        metrics.observe("admission_wait_seconds", time.monotonic() - start, kind=kind)
+        run_start = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - run_start
+            with budget.cond:
+                budget.running -= 1
+                # média móvel da duração, usada para sugerir o Retry-After
+                if budget.avg_duration is None:
+                    budget.avg_duration = duration
+                else:
+                    budget.avg_duration = 0.8 * budget.avg_duration + 0.2 * duration
+                budget.cond.notify_all()
+
+    def status(self) -> dict:
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {
+            kind: {"limit": b.limit, "running": b.running, "waiting": b.waiting}
+            for kind, b in budgets.items()
+        }
@@ -1,29 +1,79 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, url_for
 import subprocess
 import json
-import sys
 import os
+import time
+import uuid
+import queue
 import logging
+import threading
+from datetime import datetime
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 print("Iniciando aplicação Flask...", flush=True)
 
-from monitor import run_monitor
+from monitor import run_monitor, LOCAL_TZ, MONITOR_CONCURRENCY, MONITOR_MAX_CONCURRENCY, MONITOR_HEDGE
+from monitor_store import get_store, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from scheduler import get_scheduler, MONITOR_SCHEDULER, MONITOR_SCHEDULE_MIN_INTERVAL
+from workers import get_pool, run_script, POOL_SIZE
+from jobs import JobManager
+from cache import ResultCache
+from admission import Admission, Overloaded, QUEUE_TIMEOUT
+import metrics
 
 app = Flask(__name__)
 
 API_TOKEN = os.getenv("API_TOKEN")
 
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Planilhas do modo binário ficam aqui até serem enviadas (limpeza por idade)
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/tmp/scripts-api-exports")
+EXPORT_TTL = int(os.getenv("EXPORT_TTL", "3600"))
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+# Rotas liberadas do Bearer token
+PUBLIC_PATHS = {"/health", "/metrics"}
+
 
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok'}), 200
 
 
+@app.route('/status', methods=['GET'])
+def status():
+    """Ocupação atual dos orçamentos de admissão por endpoint."""
+    return jsonify({'admission': admission.status()}), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if route != '/metrics':
+        metrics.inc('http_requests_total', route=route, method=request.method, status=response.status_code)
+        if response.status_code >= 400:
+            metrics.inc('http_request_errors_total', route=route, status=response.status_code)
+        if 'request_start' in g:
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start, route=route)
+    return response
+
+
 @app.before_request
 def authenticate():
-    # libera healthcheck
-    if request.path == "/health":
+    # libera healthcheck e métricas
+    if request.path in PUBLIC_PATHS:
         return
 
     auth_header = request.headers.get("Authorization")
@@ -35,175 +85,603 @@ def authenticate():
         return jsonify({"error": "Invalid token"}), 401
 
 
-@app.route('/run-monitor', methods=['POST'])
-def run_monitor_endpoint():
+# ---------------------------------------------------------------------------
+# EXPORTAÇÃO BINÁRIA (xlsx sem base64)
+# ---------------------------------------------------------------------------
+
+def _is_binary(body):
+    return isinstance(body, dict) and body.get('format') == 'binary'
+
+
+def _wants_binary():
+    """``?format=binary`` ou ``Accept`` de xlsx pedem o arquivo cru em vez do JSON base64."""
+    return request.args.get('format') == 'binary' or XLSX_MIMETYPE in request.headers.get('Accept', '')
+
+
+def _export_args(kind, body):
+    """Argumentos do script: no modo binário ele grava o xlsx num arquivo temporário."""
+    if not _is_binary(body):
+        return []
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_exports()
+    return ['--output', os.path.join(EXPORT_DIR, f"{kind}-{uuid.uuid4().hex}.xlsx")]
+
+
+def _cleanup_exports():
+    now = time.time()
+    for filename in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, filename)
+        try:
+            if now - os.path.getmtime(path) > EXPORT_TTL:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _send_file(payload):
+    """Envia a planilha gerada em pedaços, sem carregar o arquivo inteiro na memória."""
     try:
-        body = request.get_json()
-        if not body or 'sites' not in body or not isinstance(body['sites'], list):
-            return jsonify({'error': 'Body invalido. Esperado: {"sites": ["url1", "url2"]}'}), 400
+        f = open(payload['path'], 'rb')
+    except OSError:
+        return jsonify({'error': 'Arquivo expirado ou removido', 'fileName': payload.get('fileName')}), 410
 
-        sites = [s.strip() for s in body['sites'] if isinstance(s, str) and s.strip()]
-        if not sites:
-            return jsonify({'error': 'Lista de sites vazia'}), 400
+    size = os.fstat(f.fileno()).st_size
 
-        results = run_monitor(sites)
-        return jsonify(results), 200
+    def generate():
+        with f:
+            while True:
+                chunk = f.read(EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    return Response(generate(), status=200, mimetype=XLSX_MIMETYPE, headers={
+        'Content-Disposition': f'attachment; filename="{payload.get("fileName", "export.xlsx")}"',
+        'Content-Length': str(size),
+    })
+
+
+# ---------------------------------------------------------------------------
+# RUNNERS — cada um recebe o body da requisição e devolve (payload, status)
+# ---------------------------------------------------------------------------
+
+def _monitor_sites(body):
+    return [s.strip() for s in body['sites'] if isinstance(s, str) and s.strip()]
+
+
+def _monitor_options(body):
+    """Valida o body do monitor. Retorna (sites, opções do run_monitor, erro ou None)."""
+    if not body or 'sites' not in body or not isinstance(body['sites'], list):
+        return None, None, 'Body invalido. Esperado: {"sites": ["url1", "url2"]}'
+
+    sites = _monitor_sites(body)
+    if not sites:
+        return None, None, 'Lista de sites vazia'
+
+    concurrency = body.get('concurrency')
+    if concurrency is not None and (isinstance(concurrency, bool) or not isinstance(concurrency, int) or concurrency < 1):
+        return None, None, 'concurrency deve ser um inteiro >= 1'
+
+    hedge = body.get('hedge')
+    if hedge is not None and not isinstance(hedge, bool):
+        return None, None, 'hedge deve ser true ou false'
+
+    deadline_ms = body.get('deadline_ms')
+    if deadline_ms is not None and (isinstance(deadline_ms, bool) or not isinstance(deadline_ms, int) or deadline_ms < 1):
+        return None, None, 'deadline_ms deve ser um inteiro >= 1'
+
+    return sites, {'concurrency': concurrency, 'hedge': hedge, 'deadline_ms': deadline_ms}, None
+
+
+def _monitor_key(body):
+    """Sites + opções já com os padrões aplicados: só coalescem execuções que dariam o mesmo resultado."""
+    sites, options, error = _monitor_options(body)
+    if error:
+        return ()
+    concurrency = max(1, min(options['concurrency'] or MONITOR_CONCURRENCY, MONITOR_MAX_CONCURRENCY))
+    hedge = MONITOR_HEDGE if options['hedge'] is None else options['hedge']
+    return tuple(sorted(sites)), concurrency, hedge, options['deadline_ms']
+
+
+def _run_monitor(body, progress=None):
+    try:
+        sites, options, error = _monitor_options(body)
+        if error:
+            return {'error': error}, 400
+
+        on_result = None
+        if progress:
+            done = []
+
+            def on_result(result):
+                done.append(result)
+                progress(len(done), len(sites))
+
+        results = run_monitor(sites, on_result=on_result, **options)
+        return results, 200
 
     except Exception as e:
-        return jsonify({'error': 'Erro interno', 'details': str(e)}), 500
+        return {'error': 'Erro interno', 'details': str(e)}, 500
 
 
-@app.route('/run-discogs', methods=['POST'])
-def run_discogs():
+def _run_discogs(body, progress=None):
     try:
-        result = subprocess.run(
-            [sys.executable, 'discogs.py'],
-            capture_output=True, text=True, timeout=300
-        )
+        result = run_script('discogs.py', args=_export_args('discogs', body), timeout=300)
         if result.returncode != 0:
-            return jsonify({'error': 'Script failed', 'stderr': result.stderr}), 500
+            return {'error': 'Script failed', 'stderr': result.stderr}, 500
         output = result.stdout.strip()
         json_string = output[output.rfind('{'):]
-        return jsonify(json.loads(json_string)), 200
+        return json.loads(json_string), 200
     except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Script timeout (5 min)'}), 504
+        return {'error': 'Script timeout (5 min)'}, 504
     except json.JSONDecodeError as e:
-        return jsonify({'error': 'Invalid JSON output', 'details': str(e), 'output': result.stdout}), 500
+        return {'error': 'Invalid JSON output', 'details': str(e), 'output': result.stdout}, 500
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
 
 
-@app.route('/run-setlistfm', methods=['POST'])
-def run_setlistfm():
+def _run_setlistfm(body, progress=None):
     try:
-        result = subprocess.run(
-            [sys.executable, 'setlistfm.py'],
-            capture_output=True, text=True, timeout=900
-        )
+        # "full": true refaz o histórico de shows em vez da coleta incremental
+        args = _export_args('setlistfm', body) + (['--full'] if _is_full(body) else [])
+        result = run_script('setlistfm.py', args=args, timeout=900)
         if result.returncode != 0:
-            return jsonify({'error': 'Script failed', 'stderr': result.stderr,
-                            'stdout': result.stdout, 'returncode': result.returncode}), 500
+            return {'error': 'Script failed', 'stderr': result.stderr,
+                    'stdout': result.stdout, 'returncode': result.returncode}, 500
         output = result.stdout.strip()
         if not output:
-            return jsonify({'error': 'Script returned empty output', 'stderr': result.stderr}), 500
+            return {'error': 'Script returned empty output', 'stderr': result.stderr}, 500
         json_start = output.rfind('{')
         if json_start == -1:
-            return jsonify({'error': 'No JSON found in output', 'output': output[-1000:], 'stderr': result.stderr}), 500
+            return {'error': 'No JSON found in output', 'output': output[-1000:], 'stderr': result.stderr}, 500
         try:
-            return jsonify(json.loads(output[json_start:])), 200
+            return json.loads(output[json_start:]), 200
         except json.JSONDecodeError as e:
-            return jsonify({'error': 'Invalid JSON in output', 'json_error': str(e)}), 500
+            return {'error': 'Invalid JSON in output', 'json_error': str(e)}, 500
     except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Script timeout (15 min)'}), 504
+        return {'error': 'Script timeout (15 min)'}, 504
     except Exception as e:
-        return jsonify({'error': 'Unexpected error', 'details': str(e), 'type': type(e).__name__}), 500
+        return {'error': 'Unexpected error', 'details': str(e), 'type': type(e).__name__}, 500
 
 
-@app.route('/run-bluesky', methods=['POST'])
-def run_bluesky():
+def _is_full(body):
+    return isinstance(body, dict) and body.get('full') is True
+
+
+def _run_bluesky(body, progress=None):
     try:
-        body = request.get_json() or {}
+        body = body or {}
 
         handle = body.get("handle", "").strip()
         if not handle:
-            return jsonify({"error": "Campo 'handle' obrigatorio"}), 400
+            return {"error": "Campo 'handle' obrigatorio"}, 400
 
-        cmd = [sys.executable, "bluesky.py", handle]
-
-        result = subprocess.run(
-            cmd,
-            capture_output=True, text=True, timeout=120
-        )
+        result = run_script("bluesky.py", args=[handle], timeout=120)
 
         if result.returncode != 0:
-            return jsonify({
+            return {
                 "error": "Script failed",
                 "stderr": result.stderr,
                 "stdout": result.stdout,
                 "returncode": result.returncode
-            }), 500
+            }, 500
 
         output = result.stdout.strip()
         if not output:
-            return jsonify({"error": "Script returned empty output", "stderr": result.stderr}), 500
+            return {"error": "Script returned empty output", "stderr": result.stderr}, 500
 
-        return jsonify(json.loads(output)), 200
+        return json.loads(output), 200
 
     except subprocess.TimeoutExpired:
-        return jsonify({"error": "Script timeout (2 min)"}), 504
+        return {"error": "Script timeout (2 min)"}, 504
     except json.JSONDecodeError as e:
-        return jsonify({"error": "Invalid JSON in output", "json_error": str(e)}), 500
+        return {"error": "Invalid JSON in output", "json_error": str(e)}, 500
     except Exception as e:
-        return jsonify({"error": "Unexpected error", "details": str(e), "type": type(e).__name__}), 500
+        return {"error": "Unexpected error", "details": str(e), "type": type(e).__name__}, 500
 
 
-@app.route('/run-monitorflip', methods=['POST'])
-def run_monitorflip():
+def _run_monitorflip(body, progress=None):
     try:
-        body = request.get_json() or {}
+        body = body or {}
 
         date = body.get("date", "").strip()
         origin = body.get("origin", "").strip()
         destiny = body.get("destiny", "").strip()
 
         if not date or not origin or not destiny:
-            return jsonify({"error": "Missing required fields: date, origin, destiny"}), 400
+            return {"error": "Missing required fields: date, origin, destiny"}, 400
 
         payload = json.dumps({"date": date, "origin": origin, "destiny": destiny})
-        result = subprocess.run(
-            [sys.executable, "monitorflip.py"],
-            input=payload,
-            capture_output=True, text=True, timeout=120
-        )
+        result = run_script("monitorflip.py", input=payload, timeout=120)
 
         if result.returncode != 0:
-            return jsonify({
+            return {
                 "error": "Script failed",
                 "stderr": result.stderr,
                 "stdout": result.stdout,
                 "returncode": result.returncode
-            }), 500
+            }, 500
 
         output = result.stdout.strip()
         if not output:
-            return jsonify({"error": "Script returned empty output", "stderr": result.stderr}), 500
+            return {"error": "Script returned empty output", "stderr": result.stderr}, 500
 
-        return jsonify(json.loads(output)), 200
+        return json.loads(output), 200
 
     except subprocess.TimeoutExpired:
-        return jsonify({"error": "Script timeout (2 min)"}), 504
+        return {"error": "Script timeout (2 min)"}, 504
     except json.JSONDecodeError as e:
-        return jsonify({"error": "Invalid JSON in output", "json_error": str(e)}), 500
+        return {"error": "Invalid JSON in output", "json_error": str(e)}, 500
     except Exception as e:
-        return jsonify({"error": "Unexpected error", "details": str(e), "type": type(e).__name__}), 500
+        return {"error": "Unexpected error", "details": str(e), "type": type(e).__name__}, 500
 
 
-@app.route('/run-cmc', methods=['POST'])
-def run_cmc():
+def _run_cmc(body, progress=None):
     try:
-        result = subprocess.run(
-            [sys.executable, 'cmc.py'],
-            capture_output=True, text=True, timeout=300
-        )
+        result = run_script('cmc.py', args=_export_args('cmc', body), timeout=300)
         if result.returncode != 0:
-            return jsonify({'error': 'Script failed', 'stderr': result.stderr,
-                           'stdout': result.stdout, 'returncode': result.returncode}), 500
+            return {'error': 'Script failed', 'stderr': result.stderr,
+                    'stdout': result.stdout, 'returncode': result.returncode}, 500
         output = result.stdout.strip()
         if not output:
-            return jsonify({'error': 'Script returned empty output', 'stderr': result.stderr}), 500
+            return {'error': 'Script returned empty output', 'stderr': result.stderr}, 500
         json_start = output.rfind('{')
         if json_start == -1:
-            return jsonify({'error': 'No JSON found in output', 'output': output[-1000:], 'stderr': result.stderr}), 500
+            return {'error': 'No JSON found in output', 'output': output[-1000:], 'stderr': result.stderr}, 500
         try:
-            return jsonify(json.loads(output[json_start:])), 200
+            return json.loads(output[json_start:]), 200
         except json.JSONDecodeError as e:
-            return jsonify({'error': 'Invalid JSON in output', 'json_error': str(e)}), 500
+            return {'error': 'Invalid JSON in output', 'json_error': str(e)}, 500
     except subprocess.TimeoutExpired:
-        return jsonify({'error': 'Script timeout (5 min)'}), 504
+        return {'error': 'Script timeout (5 min)'}, 504
     except Exception as e:
-        return jsonify({'error': 'Unexpected error', 'details': str(e), 'type': type(e).__name__}), 500
+        return {'error': 'Unexpected error', 'details': str(e), 'type': type(e).__name__}, 500
+
+
+RUNNERS = {
+    'monitor': _run_monitor,
+    'discogs': _run_discogs,
+    'setlistfm': _run_setlistfm,
+    'bluesky': _run_bluesky,
+    'monitorflip': _run_monitorflip,
+    'cmc': _run_cmc,
+}
+
+# Chaves normalizadas para coalescer chamadas idênticas simultâneas (single-flight)
+COALESCE_KEYS = {
+    'monitor': lambda body: _monitor_key(body),
+    'discogs': lambda body: ('binary',) if _is_binary(body) else (),
+    'setlistfm': lambda body: (('binary',) if _is_binary(body) else ()) + (('full',) if _is_full(body) else ()),
+    'bluesky': lambda body: str(body.get('handle', '')).strip().lstrip('@').lower(),
+    'monitorflip': lambda body: (
+        str(body.get('date', '')).strip(),
+        str(body.get('origin', '')).strip().upper(),
+        str(body.get('destiny', '')).strip().upper(),
+    ),
+    'cmc': lambda body: ('binary',) if _is_binary(body) else (),
+}
+
+# Kinds que aceitam ?format=binary / Accept: xlsx
+BINARY_KINDS = {'discogs', 'setlistfm', 'cmc'}
+
+
+def _rebind_shared(kind, body, payload):
+    """O resultado coalescido do monitor volta na ordem de sites de cada chamador."""
+    if kind != 'monitor' or not isinstance(payload, list):
+        return payload
+    by_url = {}
+    for result in payload:
+        by_url.setdefault(result['url'], []).append(result)
+    return [by_url[url].pop(0) for url in _monitor_sites(body)]
+
+
+results_cache = ResultCache()
+admission = Admission()
+jobs = JobManager(
+    RUNNERS, keys=COALESCE_KEYS, rebind=_rebind_shared, cache=results_cache, admission=admission,
+    # o payload binário aponta para um arquivo temporário: não vai para o cache
+    cacheable=lambda kind, body: not _is_binary(body),
+)
+
+
+def _wants_refresh():
+    """``Cache-Control: no-cache`` na requisição força uma nova execução."""
+    return 'no-cache' in request.headers.get('Cache-Control', '').lower()
+
+
+def _send_entry(entry, cache_status):
+    """Responde com o corpo já serializado do cache (ou 304 se o cliente já tem essa versão)."""
+    headers = {'ETag': entry.etag, 'X-Cache': cache_status, 'Age': str(entry.age)}
+    if entry.matches(request.headers.get('If-None-Match')):
+        return Response(status=304, headers=headers)
+    return Response(entry.body, status=200, mimetype='application/json', headers=headers)
+
+
+def _job_response(job):
+    headers = {'X-Coalesced-Callers': str(job.coalesced)}
+    if job.retry_after is not None:
+        headers['Retry-After'] = str(job.retry_after)
+    if _is_binary(job.body) and job.http_status == 200 and 'path' in job.payload:
+        response = _send_file(job.payload)
+        if isinstance(response, Response):
+            response.headers.update(headers)
+        return response
+    if job.entry is not None:
+        response = _send_entry(job.entry, job.cache.upper())
+        response.headers.update(headers)
+        return response
+    return jsonify(job.payload), job.http_status, headers
+
+
+def _request_body(kind):
+    body = request.get_json(silent=True)
+    if kind in BINARY_KINDS and _wants_binary():
+        body = dict(body if isinstance(body, dict) else {}, format='binary')
+    return body
+
+
+def _run_sync(kind):
+    """Rotas síncronas: enfileira o job e espera o resultado na mesma requisição."""
+    body = _request_body(kind)
+    refresh = _wants_refresh()
+    if not refresh:
+        entry = jobs.cached(kind, body)
+        if entry is not None:
+            return _send_entry(entry, 'HIT')
+
+    # Síncrono: roda na thread da requisição e espera no máximo
+    # ADMISSION_QUEUE_TIMEOUT por um slot, depois 429
+    job = jobs.run(kind, body, refresh=refresh, queue_timeout=QUEUE_TIMEOUT)
+    return _job_response(job)
+
+
+# ---------------------------------------------------------------------------
+# ROTAS SÍNCRONAS (compatibilidade com os fluxos do n8n)
+# ---------------------------------------------------------------------------
+
+@app.route('/run-monitor', methods=['POST'])
+def run_monitor_endpoint():
+    if NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        return _stream_monitor()
+    return _run_sync('monitor')
+
+
+_STREAM_END = object()
+
+
+def _stream_monitor():
+    """``Accept: application/x-ndjson``: uma linha JSON por site assim que ele termina.
+
+    A última linha é ``{"summary": {...}}`` com os totais. Os resultados saem
+    na ordem em que terminam (cada um traz a ``url``) e não ficam acumulados
+    no servidor. Não passa pelo cache nem pelo single-flight dos jobs, mas
+    respeita a admissão do kind monitor.
+    """
+    sites, options, error = _monitor_options(request.get_json(silent=True))
+    if error:
+        return jsonify({'error': error}), 400
+
+    lines = queue.Queue()
+
+    def run():
+        start = time.monotonic()
+        summary = {'total': len(sites), 'ok': 0, 'failed': 0, 'changed': 0, 'cached': 0, 'skipped_deadline': 0}
+
+        def on_result(result):
+            summary['ok' if result['ok'] else 'failed'] += 1
+            summary['changed'] += bool(result.get('changed'))
+            summary['cached'] += bool(result.get('cached'))
+            summary['skipped_deadline'] += bool(result.get('skipped_deadline'))
+            lines.put(app.json.dumps(result))
+
+        try:
+            with admission.slot('monitor', timeout=QUEUE_TIMEOUT):
+                lines.put(None)  # admitido: a resposta pode começar
+                run_monitor(sites, on_result=on_result, keep_results=False, **options)
+        except Overloaded as e:
+            lines.put(e)
+            return
+        except Exception as e:
+            logging.exception("Erro no /run-monitor em streaming")
+            summary['error'] = str(e)
+        summary['duration_seconds'] = round(time.monotonic() - start, 2)
+        lines.put(app.json.dumps({'summary': summary}))
+        lines.put(_STREAM_END)
+
+    threading.Thread(target=run, name='monitor-stream', daemon=True).start()
+
+    first = lines.get()
+    if isinstance(first, Overloaded):
+        return jsonify({'error': 'Too many requests', 'details': str(first), 'retry_after': first.retry_after}), \
+            429, {'Retry-After': str(first.retry_after)}
+
+    def generate():
+        while True:
+            line = lines.get()
+            if line is _STREAM_END:
+                return
+            yield line + '\n'
+
+    return Response(generate(), status=200, mimetype=NDJSON_MIMETYPE, headers={
+        'Cache-Control': 'no-cache',
+        # proxies (nginx/EasyPanel) não devem segurar as linhas em buffer
+        'X-Accel-Buffering': 'no',
+    })
+
+
+@app.route('/run-discogs', methods=['POST'])
+def run_discogs():
+    return _run_sync('discogs')
+
+
+@app.route('/run-setlistfm', methods=['POST'])
+def run_setlistfm():
+    return _run_sync('setlistfm')
+
+
+@app.route('/run-bluesky', methods=['POST'])
+def run_bluesky():
+    return _run_sync('bluesky')
+
+
+@app.route('/run-monitorflip', methods=['POST'])
+def run_monitorflip():
+    return _run_sync('monitorflip')
+
+
+@app.route('/run-cmc', methods=['POST'])
+def run_cmc():
+    return _run_sync('cmc')
+
+
+def _iso_ts(ts):
+    return datetime.fromtimestamp(ts, LOCAL_TZ).isoformat(timespec='seconds') if ts is not None else None
+
+
+@app.route('/monitor/history', methods=['GET'])
+def monitor_history():
+    """Snapshots de uma URL do monitor, do mais recente ao mais antigo.
+
+    Paginação: ``limit`` (padrão 50, máx. 500) e ``before`` (o ``next_before``
+    da página anterior).
+    """
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'Parametro url obrigatorio'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+        before = request.args.get('before')
+        before = float(before) if before else None
+    except ValueError:
+        return jsonify({'error': 'limit e before devem ser numericos'}), 400
+
+    snapshots = get_store().history(url, limit=limit, before=before)
+    next_before = snapshots[-1]['checked_at'] if len(snapshots) == limit else None
+    for snapshot in snapshots:
+        snapshot['checked_at_iso'] = _iso_ts(snapshot['checked_at'])
+    return jsonify({'url': url, 'snapshots': snapshots, 'next_before': next_before}), 200
+
+
+def _schedule_entry(entry):
+    for field in ('next_run_at', 'last_run_at', 'created_at'):
+        entry[f'{field}_iso'] = _iso_ts(entry[field])
+    return entry
+
+
+@app.route('/monitor/schedule', methods=['POST'])
+def monitor_schedule():
+    """Cadastra sites no monitoramento agendado.
+
+    Body: ``{"sites": [...], "interval": segundos, "webhook": "https://..."}``;
+    o webhook (opcional) recebe um POST com o resultado quando o site muda.
+    Recadastrar um site atualiza o intervalo e o webhook.
+    """
+    body = request.get_json(silent=True)
+    if not body or not isinstance(body.get('sites'), list):
+        return jsonify({'error': 'Body invalido. Esperado: {"sites": ["url1"], "interval": 3600}'}), 400
+    sites = _monitor_sites(body)
+    if not sites:
+        return jsonify({'error': 'Lista de sites vazia'}), 400
+
+    interval = body.get('interval')
+    if isinstance(interval, bool) or not isinstance(interval, int) or interval < MONITOR_SCHEDULE_MIN_INTERVAL:
+        return jsonify({'error': f'interval deve ser um inteiro >= {MONITOR_SCHEDULE_MIN_INTERVAL} (segundos)'}), 400
+
+    webhook = body.get('webhook')
+    if webhook is not None and not (isinstance(webhook, str) and webhook.startswith(('http://', 'https://'))):
+        return jsonify({'error': 'webhook deve ser uma URL http(s)'}), 400
+
+    entries = get_scheduler().register(sites, interval, webhook)
+    return jsonify({'scheduled': [_schedule_entry(entry) for entry in entries]}), 200
+
+
+@app.route('/monitor/schedule', methods=['GET'])
+def monitor_schedule_list():
+    """Sites agendados com a próxima execução e o último resultado de cada um."""
+    entries = get_store().scheduled()
+    return jsonify({'running': MONITOR_SCHEDULER, 'sites': [_schedule_entry(entry) for entry in entries]}), 200
+
+
+@app.route('/monitor/schedule', methods=['DELETE'])
+def monitor_unschedule():
+    url = request.args.get('url') or (request.get_json(silent=True) or {}).get('url')
+    if not url:
+        return jsonify({'error': 'Parametro url obrigatorio'}), 400
+    if not get_scheduler().unregister(url):
+        return jsonify({'error': 'Site nao agendado'}), 404
+    return jsonify({'url': url, 'removed': True}), 200
+
+
+@app.route('/monitor/changes', methods=['GET'])
+def monitor_changes():
+    """Mudanças detectadas (agendadas ou não), da mais antiga para a mais nova.
+
+    Cursor: ``since`` (o ``next_since`` da página anterior) e ``limit``.
+    """
+    try:
+        limit = max(1, min(int(request.args.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE))
+        since = request.args.get('since')
+        since = float(since) if since else None
+    except ValueError:
+        return jsonify({'error': 'limit e since devem ser numericos'}), 400
+
+    changes = get_store().changes(since=since, limit=limit)
+    for change in changes:
+        change['checked_at_iso'] = _iso_ts(change['checked_at'])
+    next_since = changes[-1]['checked_at'] if changes else since
+    return jsonify({'changes': changes, 'next_since': next_since}), 200
+
+
+# ---------------------------------------------------------------------------
+# JOBS ASSÍNCRONOS
+# ---------------------------------------------------------------------------
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def create_job(kind):
+    if kind not in RUNNERS:
+        return jsonify({'error': f"Tipo de job desconhecido: {kind}", 'kinds': sorted(RUNNERS)}), 404
+
+    body = _request_body(kind)
+    if body is None:
+        body = {}
+    elif not isinstance(body, dict):
+        return jsonify({'error': 'Body invalido. Esperado um objeto JSON'}), 400
+    callback_url = body.pop('callback_url', None) or request.args.get('callback_url')
+
+    job = jobs.submit(kind, body, callback_url=callback_url, refresh=_wants_refresh())
+    status_url = url_for('get_job', job_id=job.id)
+    return jsonify({
+        'id': job.id,
+        'kind': kind,
+        'status': job.status,
+        'status_url': status_url,
+        'result_url': url_for('get_job_result', job_id=job.id),
+    }), 202, {'Location': status_url}
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job nao encontrado'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = jobs.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job nao encontrado'}), 404
+    if not job.finished:
+        return jsonify({'id': job.id, 'status': job.status, 'progress': job.progress}), 202
+    return _job_response(job)
 
 
 if __name__ == '__main__':
+    if POOL_SIZE > 0:
+        # Sobe os workers já importando os scripts, antes da primeira requisição
+        get_pool()
+    if MONITOR_SCHEDULER:
+        get_scheduler().start(admission)
     print("Chamando app.run() na porta 5000...", flush=True)
-    app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=False)
@@ -0,0 +1,402 @@
+"""
+Benchmark das extrações do monitor.py.
+
+Compara a implementação atual com a original (copiada abaixo como
+referência): primeiro confere que a saída é idêntica em fixtures e em
+entradas geradas, depois mede o throughput em MB/s.
+
+Uso: python bench_monitor.py [--repeat N] [--sizes 0.1,1,5]
+"""
+import re
+import sys
+import time
+import random
+import argparse
+import warnings
+
+import bs4
+from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
+
+import monitor
+
+
+# ---------------------------------------------------------------------------
+# IMPLEMENTAÇÃO ORIGINAL (referência)
+# ---------------------------------------------------------------------------
+
+def legacy_extract_meaningful(jina_markdown: str, url: str) -> str:
+    if not jina_markdown:
+        return ""
+
+    nav_links = []
+    social = []
+    headings_raw = []
+
+    for line in jina_markdown.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        social_match = re.findall(
+            r'\[.*?\]\((https?://(?:www\.)?(facebook|instagram|twitter|pinterest|youtube|linkedin|tiktok)\.com[^)]*)\)',
+            line, flags=re.IGNORECASE,
+        )
+        for _, platform in social_match:
+            social.append(platform.lower())
+
+        for text in re.findall(r'\[([A-Za-z0-9][^\]]{1,40})\]\([^)]+\)', line):
+            text = text.strip()
+            if text and not re.search(r'http|\.jpg|\.png|\.gif|\.webp|image\s*\d', text, re.IGNORECASE):
+                nav_links.append(text)
+
+        if '###' in line:
+            clean = line
+            clean = re.sub(r'!\[.*?\]\(.*?\)', '', clean)
+            clean = re.sub(r'\[([^\]]*?)\]\([^)]*\)', r'\1', clean)
+            clean = re.sub(r'http\S+', '', clean)
+            clean = re.sub(r'\]\([^)]*\)', '', clean)
+            for part in re.split(r'#{1,3}\s+', clean)[1:]:
+                part = re.sub(r'veja\s*mais', '', part, flags=re.IGNORECASE)
+                part = re.sub(r'\b\d{2,}\b', '', part)
+                part = re.sub(r'\s+', ' ', part).strip()
+                if len(part) >= 5:
+                    headings_raw.append(part)
+
+    md = jina_markdown
+    md = re.sub(r'\[!\[.*?\]\(.*?\)\]\(.*?\)', '', md)
+    md = re.sub(r'!\[.*?\]\(.*?\)', '', md)
+    md = re.sub(r'\[([^\]]*?)\]\([^)]*\)', r'\1', md)
+    md = re.sub(r'\?[^\s)\]"><]+', '', md)
+    md = re.sub(r'blob:https?://[^\s)\]"><]+', '', md)
+    md = re.sub(r'veja\s*mais', '', md, flags=re.IGNORECASE)
+    md = re.sub(r'\b\d{2,}\b', '', md)
+    md = re.sub(r'[*]{1,2}', '', md)
+
+    headings = []
+    for line in md.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        h_match = re.search(r'#{1,3}\s+(.+)', line)
+        if h_match:
+            text = h_match.group(1).strip()
+            if len(text) >= 5:
+                headings.append(text)
+
+    boilerplate = re.compile(
+        r'(feito\s+com|site\s+gr[aá]tis|comece\s+j[aá]|'
+        r'image\s*\d+\s*:|alboom\s*pro|www\.alboom|'
+        r'ir\s+para\s+o\s+topo|'
+        r'p[aá]gina\s+inicial\s+de)',
+        re.IGNORECASE,
+    )
+    nav_links = sorted(set(
+        n for n in nav_links
+        if not boilerplate.search(n)
+    ))
+    all_headings = headings_raw + headings
+    all_headings = sorted(set(
+        h for h in all_headings
+        if not boilerplate.search(h) and len(h.strip()) >= 5
+    ))
+    social = sorted(set(social))
+
+    if not all_headings:
+        return ""
+    return '|'.join(all_headings)
+
+
+def legacy_extract_content(html: str, url: str) -> str:
+    if not html:
+        return ""
+
+    if "cartaometrocard.com.br" in url:
+        return legacy_extract_metrocard(html)
+
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
+        tag.decompose()
+
+    titles = []
+    for h in soup.find_all(["h1", "h2", "h3"]):
+        text = h.get_text(" ", strip=True)
+        if len(text) >= 10:
+            titles.append(text)
+
+    return "\n".join(sorted(set(titles)))
+
+
+def legacy_extract_metrocard(html: str) -> str:
+    try:
+        soup = BeautifulSoup(html, "html.parser")
+        rows = soup.select("table tbody tr, table tr")
+
+        results = []
+        for row in rows:
+            cells = row.find_all(["td", "th"])
+            if len(cells) >= 2:
+                tipo = cells[0].get_text(strip=True) or "N/A"
+                linha = cells[1].get_text(strip=True) or "N/A"
+                link = row.find("a")
+                href = link.get("href", "") if link else ""
+                results.append(f"{tipo}-{linha}-{href}")
+
+        lines = sorted(set(r.strip() for r in results if r.strip()))
+        return "\n".join(lines)
+
+    except Exception:
+        return ""
+
+
+# ---------------------------------------------------------------------------
+# ENTRADAS
+# ---------------------------------------------------------------------------
+
+MEANINGFUL_FIXTURES = [
+    "",
+    "sem titulos aqui, so texto corrido [link](https://a.com)",
+    "### Casamento Ana e Pedro\n### Ensaio",
+    "# Titulo unico\n## Subtitulo grande\n#### Nivel quatro fica de fora?",
+    "[![Image 1: capa](https://cdn.alboom.com/x.jpg?w=300)](https://site.com/p/1)\n### Casamento 2023 Veja mais 1520",
+    "[Portfolio\n### Titulo dentro de link multi-linha](https://site.com/p)",
+    "### Ensaio de familia veja\nmais 123 fotos",
+    "texto **negrito** ### Parte um ### Parte dois ### ab",
+    "### Feito com Alboom Pro\n### Ir para o topo\n### Página inicial de Fulano",
+    "![img](blob:https://site.com/abc-123)\n### Newborn Maria ![x](y) [Veja mais](https://s.com/?a=1)",
+    "### Título\r\n### Outro título\r\n",
+    "[Facebook](https://facebook.com/x) [Instagram](https://www.instagram.com/y)\n## Contato e orcamentos",
+    "###Sem espaco depois\n###   Com espacos   \n### 12345 67\n### ab 99 cd 100",
+    "link [quebrado](https://a.com/\n### Titulo apos url quebrada) fim",
+    "http://nua.com/path?x=1 ### Titulo com url http://a.com/b antes",
+]
+
+FUZZ_TOKENS = [
+    "[", "]", "(", ")", "!", "#", "##", "###", "####", " ", "  ", "\t", "\n", "\n", "\r\n", "*", "**",
+    "?", "=", "&", "veja", "Veja", "mais", "MAIS", "12", "345", "7", "http://", "https://a.com/b",
+    "blob:https://x.com/", "www.alboom", "feito com", "ir para o topo", "Título", "casamento", "\u00a0",
+]
+
+
+def fuzz_inputs(count: int = 3000, seed: int = 7) -> list:
+    """Combinações aleatórias dos caracteres que os padrões tratam (casos de borda)."""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(FUZZ_TOKENS) for _ in range(rng.randint(1, 60))) for _ in range(count)]
+
+
+CONTENT_FIXTURES = [
+    "",
+    "<html><body><h1>Titulo principal da pagina</h1><h2>curto</h2></body></html>",
+    "<nav><h1>Titulo dentro do menu</h1></nav><h1>Titulo fora do menu</h1>",
+    "<h1>Titulo com <script>var x = '<h2>falso titulo</h2>';</script> script no meio</h1>",
+    "<h1>Aninhado <h2>segundo nivel aberto</h2> fim do h1</h1>",
+    "<h1>Nao fechado <p>paragrafo dentro do titulo",
+    "<header><nav><script>x</script></nav><h2>Titulo no cabecalho</h2></header><h3>Titulo depois</h3>",
+    "<h2>Entidades &amp; &eacute; &#233; &#x00e9; &nbsp; &notanentity; texto</h2>",
+    "<h1>a<![CDATA[ cdata dentro ]]>b <!-- comentario --> c<rt>ruby</rt><rp>(</rp> d</h1>",
+    "<h1>Com <br> quebra <img src=x> e <br/> vazias</h1><h3>Quebra</br>fechada errada</h3>",
+    "<template><h1>Titulo no template aqui</h1></template><h1>Texto <template>t</template> misto aqui</h1>",
+    "<aside><h1>Lateral sem fechar <h2>Titulo interno descartado</aside><h2>Titulo visivel no fim</h2>",
+    "<H1 CLASS=x>Maiusculas no nome da tag</H1><h2\n>Quebra de linha na tag</h2 >",
+    "<h1>\u00a0 espaco\u00a0nao quebravel \u2003 </h1><h2>\r\n  Titulo com CRLF \r\n</h2>",
+    "<style>h1 { color: red }</style><h1>Depois do style</h1></style><h2>fechamento orfao ok</h2>",
+    "<p></h1><h1>Fechamento orfao antes do titulo</h1></div></nav>",
+    "<?xml version='1.0'?><!DOCTYPE html><h1>Documento com PI e doctype</h1>",
+    "<textarea><h1>dentro de textarea</h1></textarea><title><h2>dentro do title</h2></title>",
+    "<table><tr><td>Linha</td><td>100</td><td><a href='/l/100'>ver</a></td></tr>"
+    "<tr><th>Tipo</th><th>Nome</th></tr><tr><td>so uma</td></tr></table>",
+    "<table><tbody><tr><td> </td><td></td></tr><tr><td>A<b>B</b> C</td><td><a>sem</a><a href=x>href</a></td></tr>"
+    "<tr><td>Ext<table><tr><td>in1</td><td>in2<a href='/in'>i</a></td></tr></table></td><td>fora</td></tr>"
+    "</tbody></table><tr><td>fora</td><td>da tabela</td></tr>",
+    "<table><tr><td>x<td>y<a href=a href=b>dup</a><tr><td>sem fechar</td><td><script>z</script></td></table>",
+    # referências numéricas passam pelo handle_charref do bs4 (que lê atributos do "soup")
+    "<h1>Not&#237;cia &#8211; Prefeitura</h1><h2>Aspas &#147;cp1252&#148; &#x2014; &#0; &#xD800; &#1114112;</h2>",
+    "<table><tr><td>Ônibus &#8211; &#237;</td><td>Linha &#x31;00</td><td><a href='/l?a=1&#38;b=2'>v</a></td></tr></table>",
+]
+
+HTML_FUZZ_TOKENS = [
+    "<h1>", "</h1>", "<h2>", "</h2>", "<h3 class='t'>", "</h3>", "<nav>", "</nav>", "<script>", "</script>",
+    "<style>", "</style>", "<header>", "</header>", "<aside>", "</aside>", "<footer>", "</footer>",
+    "<template>", "</template>", "<rt>", "</rt>", "<p>", "</p>", "<div>", "</div>", "<br>", "<br/>", "<img src=x>",
+    "<table>", "</table>", "<tbody>", "</tbody>", "<tr>", "</tr>", "<td>", "</td>", "<th>", "</th>",
+    "<a href='/x'>", "<a>", "</a>", "<b>", "</b>", "<!-- c -->", "<![CDATA[ cd ]]>", "<?pi?>", "<!DOCTYPE html>",
+    "&amp;", "&nbsp;", "&#233;", "&#8211;", "&#x2014;", "&#150;", "&bogus;", "<", ">", "&", " ", "\n", "\u00a0",
+    "Titulo", "casamento 2024",
+    "Ensaio de familia", "R$ 4,50", "linha 100", "é",
+]
+
+
+def fuzz_html(count: int = 3000, seed: int = 11) -> list:
+    """HTML malformado de propósito: tags sem fechar, aninhamentos estranhos, entidades."""
+    rng = random.Random(seed)
+    return ["".join(rng.choice(HTML_FUZZ_TOKENS) for _ in range(rng.randint(1, 80))) for _ in range(count)]
+
+
+WORDS = [
+    "casamento", "ensaio", "gestante", "newborn", "familia", "aniversario",
+    "formatura", "debutante", "corporativo", "batizado", "pre-wedding", "book",
+    "Curitiba", "Ana", "Pedro", "Maria", "João", "Beatriz", "Lucas", "praia",
+]
+
+
+def _title(rng):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).capitalize()
+
+
+def alboom_markdown(size_mb: float, seed: int = 1) -> str:
+    """Markdown parecido com o que o Jina devolve para um portfólio Alboom."""
+    rng = random.Random(seed)
+    header = [
+        "Title: Portfolio | Fotografia",
+        "URL Source: https://fotografo.alboompro.com/portfolio",
+        "Markdown Content:",
+        "[Início](https://fotografo.alboompro.com/) [Portfólio](https://fotografo.alboompro.com/portfolio) "
+        "[Contato](https://fotografo.alboompro.com/contato) [Blog](https://fotografo.alboompro.com/blog)",
+        "[Facebook](https://www.facebook.com/fotografo) [Instagram](https://instagram.com/fotografo)",
+        "",
+    ]
+    target = int(size_mb * 1024 * 1024)
+    parts, size = list(header), sum(len(h) + 1 for h in header)
+    n = 0
+    while size < target:
+        n += 1
+        slug = f"{n}-{rng.randint(1000, 9999)}"
+        block = [
+            f"[![Image {n}: {_title(rng)}](https://cdn.alboompro.com/{slug}.jpg?v={rng.randint(1, 10**9)}&w=800)]"
+            f"(https://fotografo.alboompro.com/portfolio/{slug})",
+            f"### [{_title(rng)}](https://fotografo.alboompro.com/portfolio/{slug}) "
+            f"{rng.randint(10, 9999)} visualizações **Veja mais**",
+            f"![Image {n + 1}](blob:https://fotografo.alboompro.com/{rng.getrandbits(64):x})",
+            f"Publicado em {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(15, 24)} - "
+            f"{rng.randint(10, 500)} fotos",
+            "",
+        ]
+        if n % 25 == 0:
+            block.append("## Feito com Alboom Pro - comece já seu site grátis")
+        for line in block:
+            parts.append(line)
+            size += len(line) + 1
+    return "\n".join(parts)
+
+
+def portal_html(size_mb: float, seed: int = 1) -> str:
+    """HTML de portal: muito script inline, menus, cards com títulos e um rodapé."""
+    rng = random.Random(seed)
+    head = (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'><title>Portal</title>"
+        "<style>" + "body { margin: 0 } .card h3 { font-weight: 700 } " * 200 + "</style></head><body>"
+        "<header><nav><ul>" + "".join(f"<li><a href='/s/{i}'>Secao {i}</a></li>" for i in range(40)) +
+        "</ul></nav></header><main>"
+    )
+    target = int(size_mb * 1024 * 1024)
+    parts, size = [head], len(head)
+    n = 0
+    while size < target:
+        n += 1
+        block = (
+            f"<article class='card'><h3><a href='/noticia/{n}'>{_title(rng)} &amp; {_title(rng)}</a></h3>"
+            f"<p>{' '.join(rng.choice(WORDS) for _ in range(40))}</p>"
+            f"<img src='/img/{n}.jpg' alt='{_title(rng)}'><br>"
+            f"<script>window.__data_{n} = {{\"id\": {n}, \"tags\": \"<h1>{_title(rng)}</h1>\"}};</script>"
+            "</article>"
+        )
+        if n % 50 == 0:
+            block += f"<section><h2>Edital {n} - {_title(rng)}</h2><!-- destaque --></section>"
+        if n % 200 == 0:
+            block += "<aside><h2>Mais lidas da semana</h2></aside>"
+        parts.append(block)
+        size += len(block)
+    parts.append("</main><footer><h2>Prefeitura - todos os direitos</h2></footer></body></html>")
+    return "".join(parts)
+
+
+def metrocard_html(size_mb: float, seed: int = 1) -> str:
+    """Tabela de linhas como a do cartaometrocard.com.br."""
+    rng = random.Random(seed)
+    head = "<html><body><table><thead><tr><th>Tipo</th><th>Linha</th><th></th></tr></thead><tbody>"
+    target = int(size_mb * 1024 * 1024)
+    parts, size = [head], len(head)
+    n = 0
+    while size < target:
+        n += 1
+        row = (
+            f"<tr><td>{rng.choice(['Urbano', 'Metropolitano', 'Executivo'])}</td>"
+            f"<td> {n:04d} - {_title(rng)} </td><td><a href='/linha/{n}'>Itinerario</a></td></tr>"
+        )
+        parts.append(row)
+        size += len(row)
+    parts.append("</tbody></table></body></html>")
+    return "".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# EXECUÇÃO
+# ---------------------------------------------------------------------------
+
+def _throughput(fn, text: str, url: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text, url)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode("utf-8")) / (1024 * 1024) / best
+
+
+def check_equal(name: str, new, old, inputs, url: str) -> bool:
+    ok = True
+    for i, text in enumerate(inputs):
+        if new(text, url) != old(text, url):
+            print(f"  DIVERGENCIA em {name}, entrada #{i}")
+            ok = False
+    return ok
+
+
+def bench(name: str, new, old, inputs, url: str, repeat: int):
+    print(f"{name}:")
+    for label, text in inputs:
+        old_mbs = _throughput(old, text, url, repeat)
+        new_mbs = _throughput(new, text, url, repeat)
+        print(f"  {label:>8}  original {old_mbs:8.2f} MB/s  atual {new_mbs:8.2f} MB/s  ({new_mbs / old_mbs:5.1f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--sizes", default="0.1,1,5", help="tamanhos das entradas geradas, em MB")
+    args = parser.parse_args()
+    # o fuzz gera "<?pi?>", que faz o bs4 avisar que o documento parece XML
+    warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+    sizes = [float(s) for s in args.sizes.split(",")]
+
+    url = "https://fotografo.alboompro.com/portfolio"
+    generated = [(f"{size:g} MB", alboom_markdown(size, seed=i)) for i, size in enumerate(sizes)]
+
+    portal_url = "https://www.curitiba.pr.gov.br/noticias"
+    portals = [(f"{size:g} MB", portal_html(size, seed=i)) for i, size in enumerate(sizes)]
+    metrocard_url = "https://www.cartaometrocard.com.br/linhas"
+    tables = [(f"{size:g} MB", metrocard_html(size, seed=i)) for i, size in enumerate(sizes)]
+
+    ok = check_equal(
+        "extract_meaningful", monitor.extract_meaningful, legacy_extract_meaningful,
+        MEANINGFUL_FIXTURES + fuzz_inputs() + [text for _, text in generated], url,
+    )
+    html_inputs = CONTENT_FIXTURES + fuzz_html()
+    ok &= check_equal(
+        "extract_content", monitor.extract_content, legacy_extract_content,
+        html_inputs + [text for _, text in portals], portal_url,
+    )
+    ok &= check_equal(
+        "extract_content (metrocard)", monitor.extract_content, legacy_extract_content,
+        html_inputs + [text for _, text in tables], metrocard_url,
+    )
+    if not ok:
+        sys.exit(1)
+    print(f"Saidas identicas a implementacao original (bs4 {bs4.__version__}).\n")
+
+    bench("extract_meaningful", monitor.extract_meaningful, legacy_extract_meaningful, generated, url, args.repeat)
+    bench("extract_content", monitor.extract_content, legacy_extract_content, portals, portal_url, args.repeat)
+    bench("extract_content (metrocard)", monitor.extract_content, legacy_extract_content, tables, metrocard_url,
+          args.repeat)
+
+
+if __name__ == "__main__":
+    main()
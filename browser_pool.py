@@ -0,0 +1,220 @@
+"""
+Chromium compartilhado e de longa duração para monitor, setlistfm e cmc.
+
+Em vez de cada chamada lançar e fechar o próprio navegador, o processo mantém
+um Chromium aberto (com ``--remote-debugging-port``) e entrega contextos
+isolados sob demanda via ``connect_over_cdp``. O Playwright síncrono só pode
+ser usado na thread que o criou, então cada thread abre a sua conexão com o
+mesmo navegador (um driver Node por thread). Ela é encerrada quando o último
+contexto da thread fecha: as threads de requisição, de jobs e do monitor são
+de pools e nunca chamariam ``close_thread``, e os drivers ficariam acumulando.
+Quem abre vários contextos em sequência (as faixas do monitor) segura a
+conexão com ``session``.
+
+O navegador é relançado se cair e reciclado depois de ``BROWSER_MAX_CONTEXTS``
+contextos (quando não houver nenhum em uso), para limitar vazamentos.
+"""
+import os
+import time
+import shutil
+import atexit
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+from playwright.sync_api import sync_playwright
+
+import metrics
+
+CHROME_BIN = os.environ.get("CHROME_BIN", "/usr/bin/chromium")
+BROWSER_MAX_CONTEXTS = int(os.getenv("BROWSER_MAX_CONTEXTS", "200"))
+BROWSER_LAUNCH_TIMEOUT = 30
+
+CHROME_ARGS = [
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-software-rasterizer",
+    "--disable-extensions",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--remote-debugging-address=127.0.0.1",
+    "--remote-debugging-port=0",
+]
+
+
+class BrowserPool:
+    def __init__(self, max_contexts: int = BROWSER_MAX_CONTEXTS):
+        self.max_contexts = max_contexts
+        self._process = None
+        self._user_data_dir = None
+        self._endpoint = None
+        self._generation = 0
+        self._served = 0
+        self._active = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    # -- processo do Chromium ---------------------------------------------
+
+    def _launch(self):
+        self._user_data_dir = tempfile.mkdtemp(prefix="chromium-")
+        port_file = os.path.join(self._user_data_dir, "DevToolsActivePort")
+
+        with metrics.timer("browser_launch_seconds", scraper="shared"):
+            self._process = subprocess.Popen(
+                [CHROME_BIN, *CHROME_ARGS, f"--user-data-dir={self._user_data_dir}", "about:blank"],
+                stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            # O Chromium grava a porta escolhida (e o path do websocket) neste arquivo
+            deadline = time.monotonic() + BROWSER_LAUNCH_TIMEOUT
+            while True:
+                if self._process.poll() is not None:
+                    raise RuntimeError(f"Chromium saiu ao iniciar (exitcode={self._process.returncode})")
+                try:
+                    with open(port_file) as f:
+                        port, path = f.read().split()[:2]
+                    break
+                except (OSError, ValueError):
+                    pass
+                if time.monotonic() > deadline:
+                    self._terminate()
+                    raise RuntimeError("Timeout aguardando o Chromium abrir a porta de depuracao")
+                time.sleep(0.05)
+
+        self._endpoint = f"ws://127.0.0.1:{port}{path}"
+        self._generation += 1
+        self._served = 0
+        logging.info(f"Chromium compartilhado iniciado (pid {self._process.pid}, geracao {self._generation})")
+
+    def _terminate(self):
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait(timeout=5)
+            self._process = None
+        if self._user_data_dir:
+            shutil.rmtree(self._user_data_dir, ignore_errors=True)
+            self._user_data_dir = None
+
+    def _ensure_browser(self):
+        """Chamado com o lock: relança se o Chromium caiu e recicla se serviu contextos demais."""
+        if self._process is not None and self._process.poll() is not None:
+            logging.warning(f"Chromium compartilhado caiu (exitcode={self._process.returncode}), relançando")
+            metrics.inc("browser_relaunches_total", reason="crash")
+            self._terminate()
+        elif self._process is not None and self._served >= self.max_contexts and self._active == 0:
+            logging.info(f"Reciclando Chromium compartilhado apos {self._served} contextos")
+            metrics.inc("browser_relaunches_total", reason="recycle")
+            self._terminate()
+
+        if self._process is None:
+            self._launch()
+
+    # -- conexão por thread -------------------------------------------------
+
+    def _browser(self, generation: int, endpoint: str):
+        local = self._local
+        if getattr(local, "playwright", None) is None:
+            local.playwright = sync_playwright().start()
+            local.browser = None
+
+        if local.browser is not None and (local.generation != generation or not local.browser.is_connected()):
+            try:
+                local.browser.close()
+            except Exception:
+                pass
+            local.browser = None
+
+        if local.browser is None:
+            local.browser = local.playwright.chromium.connect_over_cdp(endpoint)
+            local.generation = generation
+        return local.browser
+
+    @contextmanager
+    def session(self):
+        """Mantém a conexão Playwright da thread aberta durante o bloco.
+
+        Sem isso ela fecha junto com o último contexto da thread; aninhar é permitido.
+        """
+        local = self._local
+        local.sessions = getattr(local, "sessions", 0) + 1
+        try:
+            yield
+        finally:
+            local.sessions -= 1
+            if local.sessions == 0:
+                self.close_thread()
+
+    @contextmanager
+    def context(self, **options):
+        """Contexto isolado (cookies, cache, storage próprios), fechado ao sair do bloco."""
+        with self.session(), self._context(**options) as context:
+            yield context
+
+    @contextmanager
+    def _context(self, **options):
+        with self._lock:
+            self._ensure_browser()
+            self._active += 1
+            self._served += 1
+            generation, endpoint = self._generation, self._endpoint
+
+        metrics.inc("browser_contexts_total")
+        try:
+            browser = self._browser(generation, endpoint)
+            context = browser.new_context(**options)
+            try:
+                yield context
+            finally:
+                try:
+                    context.close()
+                except Exception as e:
+                    logging.debug(f"Falha ao fechar contexto: {e}")
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    def close_thread(self):
+        """Encerra a conexão Playwright da thread atual (o Chromium continua de pé)."""
+        local = self._local
+        if getattr(local, "playwright", None) is None:
+            return
+        try:
+            if local.browser is not None:
+                local.browser.close()
+            local.playwright.stop()
+        except Exception as e:
+            logging.debug(f"Falha ao encerrar Playwright da thread: {e}")
+        local.playwright = local.browser = None
+
+    def shutdown(self):
+        self.close_thread()
+        with self._lock:
+            self._terminate()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def shutdown_browser_pool():
+    """Fecha o Chromium do processo, se foi aberto (os workers chamam ao sair)."""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
@@ -0,0 +1,219 @@
+"""
+Cache de resultados dos scrapers com TTL por endpoint e ETag forte.
+
+O resultado é guardado já serializado (os mesmos bytes que o Flask enviaria),
+então um acerto de cache não re-serializa o xlsx em base64 e o ETag vale para
+``If-None-Match``. Memória e disco são LRU com limite em MB; o que sai da
+memória desce para o disco e volta ao ser lido.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+# TTL (s) por kind; 0 desliga o cache do endpoint. Sobrescreva com CACHE_TTL_<KIND>.
+DEFAULT_TTLS = {
+    "discogs": 6 * 3600,
+    "setlistfm": 6 * 3600,
+    "bluesky": 300,
+}
+
+CACHE_MAX_MEMORY_MB = float(os.getenv("CACHE_MAX_MEMORY_MB", "64"))
+CACHE_MAX_DISK_MB = float(os.getenv("CACHE_MAX_DISK_MB", "512"))
+CACHE_DIR = os.getenv("CACHE_DIR", "/tmp/scripts-api-cache")
+
+
+def cache_ttl(kind: str) -> int:
+    return int(os.getenv(f"CACHE_TTL_{kind.upper()}", DEFAULT_TTLS.get(kind, 0)))
+
+
+def serialize(payload) -> bytes:
+    """Mesmo formato do ``jsonify`` do Flask fora do modo debug."""
+    return (json.dumps(payload, separators=(",", ":"), sort_keys=True) + "\n").encode("utf-8")
+
+
+class Entry:
+    def __init__(self, kind: str, body: bytes, etag: str, created_at: float, expires_at: float):
+        self.kind = kind
+        self.body = body
+        self.etag = etag
+        self.created_at = created_at
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+    @property
+    def age(self) -> int:
+        return int(time.time() - self.created_at)
+
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def payload(self):
+        return json.loads(self.body)
+
+    def matches(self, if_none_match: str) -> bool:
+        """Compara com o header If-None-Match (lista de ETags ou ``*``)."""
+        if not if_none_match:
+            return False
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags or f"W/{self.etag}" in tags
+
+
+class ResultCache:
+    def __init__(self, max_memory_mb: float = CACHE_MAX_MEMORY_MB,
+                 max_disk_mb: float = CACHE_MAX_DISK_MB, directory: str = CACHE_DIR):
+        self.max_memory = int(max_memory_mb * 1024 * 1024)
+        self.max_disk = int(max_disk_mb * 1024 * 1024)
+        self.directory = directory
+        self._memory = OrderedDict()   # name -> Entry
+        self._disk = OrderedDict()     # name -> meta (sem o body)
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        if self.max_disk > 0:
+            self._load_disk_index()
+
+    @staticmethod
+    def _name(key) -> str:
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+    def _path(self, name: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{name}.{suffix}")
+
+    # -- API ---------------------------------------------------------------
+
+    def enabled(self, kind: str) -> bool:
+        return cache_ttl(kind) > 0
+
+    def get(self, kind: str, key):
+        if not self.enabled(kind):
+            return None
+        name = self._name((kind, key))
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is None and name in self._disk:
+                entry = self._read_disk(name)
+                if entry is not None:
+                    self._remember(name, entry)
+            if entry is None:
+                return None
+            if entry.expired():
+                self._forget(name)
+                return None
+            self._memory.move_to_end(name)
+            return entry
+
+    def put(self, kind: str, key, payload) -> Entry:
+        body = serialize(payload)
+        now = time.time()
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        entry = Entry(kind, body, etag, now, now + cache_ttl(kind))
+        if self.enabled(kind):
+            name = self._name((kind, key))
+            with self._lock:
+                self._forget(name)
+                self._remember(name, entry)
+        return entry
+
+    # -- memória -----------------------------------------------------------
+
+    def _remember(self, name: str, entry: Entry):
+        if entry.size > self.max_memory:
+            self._write_disk(name, entry)
+            return
+        self._memory[name] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.max_memory:
+            old_name, old = self._memory.popitem(last=False)
+            self._memory_bytes -= old.size
+            if not old.expired():
+                self._write_disk(old_name, old)
+
+    def _forget(self, name: str):
+        entry = self._memory.pop(name, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+        self._drop_disk(name)
+
+    # -- disco -------------------------------------------------------------
+
+    def _load_disk_index(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            metas = []
+            for filename in os.listdir(self.directory):
+                if not filename.endswith(".meta"):
+                    continue
+                with open(os.path.join(self.directory, filename)) as f:
+                    metas.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.warning(f"Cache: indice em disco ignorado ({e})")
+            return
+
+        now = time.time()
+        for meta in sorted(metas, key=lambda m: m.get("accessed_at", 0)):
+            if meta.get("expires_at", 0) <= now:
+                self._unlink(meta["name"])
+                continue
+            self._disk[meta["name"]] = meta
+            self._disk_bytes += meta["size"]
+
+    def _write_disk(self, name: str, entry: Entry):
+        if self.max_disk <= 0 or entry.size > self.max_disk:
+            return
+        meta = {
+            "name": name,
+            "kind": entry.kind,
+            "etag": entry.etag,
+            "size": entry.size,
+            "created_at": entry.created_at,
+            "expires_at": entry.expires_at,
+            "accessed_at": time.time(),
+        }
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(name, "json"), "wb") as f:
+                f.write(entry.body)
+            with open(self._path(name, "meta"), "w") as f:
+                json.dump(meta, f)
+        except OSError as e:
+            logging.warning(f"Cache: falha ao gravar em disco ({e})")
+            return
+
+        self._drop_disk(name)
+        self._disk[name] = meta
+        self._disk_bytes += entry.size
+        while self._disk_bytes > self.max_disk:
+            old_name, _ = next(iter(self._disk.items()))
+            self._drop_disk(old_name)
+
+    def _read_disk(self, name: str):
+        meta = self._disk.pop(name)
+        self._disk_bytes -= meta["size"]
+        try:
+            with open(self._path(name, "json"), "rb") as f:
+                body = f.read()
+        except OSError:
+            self._unlink(name)
+            return None
+        self._unlink(name)
+        return Entry(meta["kind"], body, meta["etag"], meta["created_at"], meta["expires_at"])
+
+    def _drop_disk(self, name: str):
+        meta = self._disk.pop(name, None)
+        if meta is not None:
+            self._disk_bytes -= meta["size"]
+            self._unlink(name)
+
+    def _unlink(self, name: str):
+        for suffix in ("json", "meta"):
+            try:
+                os.remove(self._path(name, suffix))
+            except OSError:
+                pass
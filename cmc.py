@@ -1,13 +1,20 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from pathlib import Path
 import requests
 import base64
 import json
 import pandas as pd
 import os
-from io import BytesIO
+import sys
+import time
+import shutil
+import tempfile
 from PIL import Image
 from datetime import datetime, timedelta
+from contextlib import ExitStack
+
+import metrics
+from browser_pool import get_browser_pool
 
 
 class CMCCuritibaScraper:
@@ -39,17 +46,9 @@ class CMCCuritibaScraper:
         return json.loads(r.text)
 
     def setup_browser(self):
-        self._playwright = sync_playwright().start()
-        self.browser = self._playwright.chromium.launch(
-            headless=self.headless,
-            executable_path=os.environ.get("CHROME_BIN", "/usr/bin/chromium"),
-            args=[
-                "--no-sandbox",
-                "--disable-dev-shm-usage",
-                "--disable-gpu",
-            ]
-        )
-        self.context = self.browser.new_context()
+        # Contexto isolado no Chromium compartilhado do processo (browser_pool)
+        self._stack = ExitStack()
+        self.context = self._stack.enter_context(get_browser_pool().context())
         self.page = self.context.new_page()
 
     def extract_all_pages(self, page):
@@ -121,7 +120,8 @@ class CMCCuritibaScraper:
             self.setup_browser()
 
             print("🌐 Acessando curitiba.pr.leg.br...")
-            self.page.goto("https://www.curitiba.pr.leg.br/", wait_until="networkidle")
+            with metrics.timer("page_goto_seconds", scraper="cmc"):
+                self.page.goto("https://www.curitiba.pr.leg.br/", wait_until="networkidle")
             self.page.wait_for_timeout(3000)
 
             # Fecha popups/modais que possam estar bloqueando
@@ -184,6 +184,7 @@ class CMCCuritibaScraper:
                     print(f"Erro ao processar CAPTCHA: {e}")
                 attempts += 1
 
+            metrics.observe("cmc_captcha_attempts", attempts, solved=str(solved).lower())
             if not solved:
                 raise Exception("Numero maximo de tentativas de captcha alcancado.")
 
@@ -212,13 +213,9 @@ class CMCCuritibaScraper:
             page1.close()
 
         finally:
-            if hasattr(self, "context"):
-                self.context.close()
-            if hasattr(self, "browser"):
-                self.browser.close()
-            if hasattr(self, "_playwright"):
-                self._playwright.stop()
-            print("🔒 Browser fechado")
+            if hasattr(self, "_stack"):
+                self._stack.close()
+            print("🔒 Contexto do browser fechado")
 
     def _excel_path(self):
         return self._current_dir() / "cmc_dados.xlsx"
@@ -242,53 +239,64 @@ class CMCCuritibaScraper:
         self._save_excel(df_final)
 
     def _save_excel(self, df):
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            df.to_excel(writer, sheet_name="Dados CMC", index=False)
-
-            stats_data = {
-                "Metrica": [
-                    "Total de Registros",
-                    "Data Inicio",
-                    "Data Fim",
-                    "Ultima Atualizacao",
-                    "Termo Pesquisado",
-                    "Fonte"
-                ],
-                "Valor": [
-                    len(df),
-                    self.data_inicio.strftime("%d/%m/%Y"),
-                    self.data_fim.strftime("%d/%m/%Y"),
-                    datetime.now().strftime("%d/%m/%Y %H:%M"),
-                    "itinerario",
-                    "curitiba.pr.leg.br"
-                ]
-            }
-            pd.DataFrame(stats_data).to_excel(writer, sheet_name="Estatisticas", index=False)
-
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if cell.value:
-                                max_length = max(max_length, len(str(cell.value)))
-                        except Exception:
-                            pass
-                    worksheet.column_dimensions[column_letter].width = min(max_length + 2, 50)
-
-        # Salvar em disco
+        # Salvar em disco (a planilha acumulada é a base do proximo merge)
         path = self._excel_path()
-        with open(path, "wb") as f:
-            f.write(buffer.getvalue())
-        buffer.seek(0)
-
-        self._file_base64 = base64.b64encode(buffer.read()).decode()
+        start = time.perf_counter()
+        # Escreve num temporário no mesmo diretório e troca no fim: se o
+        # processo morrer no meio, a planilha acumulada anterior continua inteira
+        fd, tmp_path = tempfile.mkstemp(prefix=".cmc_dados-", suffix=".xlsx", dir=path.parent)
+        os.close(fd)
+        try:
+            with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+                df.to_excel(writer, sheet_name="Dados CMC", index=False)
+
+                stats_data = {
+                    "Metrica": [
+                        "Total de Registros",
+                        "Data Inicio",
+                        "Data Fim",
+                        "Ultima Atualizacao",
+                        "Termo Pesquisado",
+                        "Fonte"
+                    ],
+                    "Valor": [
+                        len(df),
+                        self.data_inicio.strftime("%d/%m/%Y"),
+                        self.data_fim.strftime("%d/%m/%Y"),
+                        datetime.now().strftime("%d/%m/%Y %H:%M"),
+                        "itinerario",
+                        "curitiba.pr.leg.br"
+                    ]
+                }
+                pd.DataFrame(stats_data).to_excel(writer, sheet_name="Estatisticas", index=False)
+
+                for sheet_name in writer.sheets:
+                    worksheet = writer.sheets[sheet_name]
+                    for column in worksheet.columns:
+                        max_length = 0
+                        column_letter = column[0].column_letter
+                        for cell in column:
+                            try:
+                                if cell.value:
+                                    max_length = max(max_length, len(str(cell.value)))
+                            except Exception:
+                                pass
+                        worksheet.column_dimensions[column_letter].width = min(max_length + 2, 50)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+        metrics.observe("excel_generation_seconds", time.perf_counter() - start, script="cmc")
+        metrics.observe("excel_size_bytes", os.path.getsize(path), script="cmc")
 
     def generate_excel_base64(self):
-        return self._file_base64
+        with open(self._excel_path(), "rb") as f:
+            return base64.b64encode(f.read()).decode()
+
+    def copy_excel(self, output_path):
+        """Copia a planilha salva para ``output_path`` (modo binario, sem base64)."""
+        shutil.copyfile(self._excel_path(), output_path)
 
 
 def main():
@@ -317,6 +325,18 @@ def main():
 
     scraper.merge_and_save()
 
+    # --output <arquivo>: grava o xlsx direto no arquivo em vez de imprimir em base64
+    if "--output" in sys.argv:
+        output_path = sys.argv[sys.argv.index("--output") + 1]
+        scraper.copy_excel(output_path)
+        print(json.dumps({
+            "success": True,
+            "message": f"{len(scraper.df_final)} registros totais ({len(scraper.all_data)} novos)",
+            "fileName": "cmc_preposicoes.xlsx",
+            "path": output_path
+        }), flush=True)
+        return
+
     file_base64 = scraper.generate_excel_base64()
     if not file_base64:
         print(json.dumps({
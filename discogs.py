@@ -5,6 +5,10 @@ import base64
 import json
 from io import BytesIO
 import os
+import sys
+import time
+
+import metrics
 
 # Substitua por seu nome de usuário e token do Discogs
 USERNAME = 'wsmetal'
@@ -16,61 +20,81 @@ headers = {
     'Authorization': f'Discogs token={TOKEN}'
 }
 
-# Lista para armazenar os dados
-colecao = []
-
-page = 1
-while True:
-    print(f"Carregando página {page}...")
-    url = f'https://api.discogs.com/users/{USERNAME}/collection/folders/0/releases?page={page}&per_page=100'
-    response = requests.get(url, headers=headers)
-    data = response.json()
-
-    for item in data['releases']:
-        release = item['basic_information']
-        artist = ', '.join([a['name'] for a in release['artists']])
-        title = release['title']
-        year = release['year']        
-        label = ', '.join([l['name'] for l in release['labels']])
-        catno = ', '.join([l['catno'] for l in release['labels']])
-        format_ = ', '.join([f['name'] for f in release['formats']])  
-        
-        colecao.append([artist, title, year, label, catno, format_])
-
-    if data['pagination']['pages'] > page:
-        page += 1
-    else:
-        break
-
-# Ordenar a lista por artista
-colecao.sort(key=lambda x: x[0].lower())  # x[0] ? artista
-
-# Criar planilha Excel
-wb = openpyxl.Workbook()
-ws = wb.active
-ws.title = 'Discogs Collection'
-
-# Cabe?hos
-ws.append(['Artista', 'Título', 'Ano', 'Label', 'CatNo', 'Formato'])
-for cell in ws[1]:  
-        cell.font = Font(bold=True) 
-
-# Adicionar dados ordenados
-for linha in colecao:
-    ws.append(linha)
-
-# 🔥 SALVAR EM MEMÓRIA (não em disco)
-buffer = BytesIO()
-wb.save(buffer)
-buffer.seek(0)
-
-# Converter para base64
-file_base64 = base64.b64encode(buffer.read()).decode()
-
-# Imprimir JSON para o n8n
-print(json.dumps({
-    "file": file_base64,
-    "fileName": "discogs_colecao.xlsx"
-}))
+
+def main():
+    # --output <arquivo>: grava o xlsx direto no arquivo em vez de imprimir em base64
+    output_path = sys.argv[sys.argv.index('--output') + 1] if '--output' in sys.argv else None
+
+    # Lista para armazenar os dados
+    colecao = []
+
+    page = 1
+    while True:
+        print(f"Carregando página {page}...")
+        url = f'https://api.discogs.com/users/{USERNAME}/collection/folders/0/releases?page={page}&per_page=100'
+        response = requests.get(url, headers=headers)
+        data = response.json()
+
+        for item in data['releases']:
+            release = item['basic_information']
+            artist = ', '.join([a['name'] for a in release['artists']])
+            title = release['title']
+            year = release['year']        
+            label = ', '.join([l['name'] for l in release['labels']])
+            catno = ', '.join([l['catno'] for l in release['labels']])
+            format_ = ', '.join([f['name'] for f in release['formats']])  
+
+            colecao.append([artist, title, year, label, catno, format_])
+
+        if data['pagination']['pages'] > page:
+            page += 1
+        else:
+            break
+
+    # Ordenar a lista por artista
+    colecao.sort(key=lambda x: x[0].lower())  # x[0] ? artista
+
+    # Criar planilha Excel
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = 'Discogs Collection'
+
+    # Cabe?hos
+    ws.append(['Artista', 'Título', 'Ano', 'Label', 'CatNo', 'Formato'])
+    for cell in ws[1]:  
+            cell.font = Font(bold=True) 
+
+    # Adicionar dados ordenados
+    for linha in colecao:
+        ws.append(linha)
+
+    start = time.perf_counter()
+    if output_path:
+        wb.save(output_path)
+        metrics.observe("excel_generation_seconds", time.perf_counter() - start, script="discogs")
+        metrics.observe("excel_size_bytes", os.path.getsize(output_path), script="discogs")
+        print(json.dumps({
+            "path": output_path,
+            "fileName": "discogs_colecao.xlsx"
+        }))
+        return
+
+    # 🔥 SALVAR EM MEMÓRIA (não em disco)
+    buffer = BytesIO()
+    wb.save(buffer)
+    metrics.observe("excel_generation_seconds", time.perf_counter() - start, script="discogs")
+    metrics.observe("excel_size_bytes", buffer.tell(), script="discogs")
+    buffer.seek(0)
+
+    # Converter para base64
+    file_base64 = base64.b64encode(buffer.read()).decode()
+
+    # Imprimir JSON para o n8n
+    print(json.dumps({
+        "file": file_base64,
+        "fileName": "discogs_colecao.xlsx"
+    }))
 
 
+if __name__ == "__main__":
+    main()
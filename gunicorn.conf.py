@@ -0,0 +1,32 @@
+# Configuração do gunicorn para produção: gunicorn -c gunicorn.conf.py app:app
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+# Um processo com várias threads: jobs, cache, single-flight e admissão ficam
+# em memória, então mais de um processo dividiria esse estado.
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+
+# O /run-setlistfm pode levar até 15 min (+ a fila de admissão)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "1000"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    # Sobe o pool de workers dos scripts antes da primeira requisição
+    from workers import get_pool, POOL_SIZE
+    if POOL_SIZE > 0:
+        get_pool()
+
+    # Agendador do monitor: uma thread no processo, dividindo a admissão com as rotas
+    from app import admission
+    from scheduler import get_scheduler, MONITOR_SCHEDULER
+    if MONITOR_SCHEDULER:
+        get_scheduler().start(admission)
@@ -0,0 +1,260 @@
+"""
+Subsistema de jobs assíncronos para os scrapers longos.
+
+``POST /jobs/<kind>`` enfileira a execução e devolve um id na hora; o runner
+roda num pool de threads e o resultado fica guardado até expirar. As rotas
+síncronas antigas usam os mesmos runners (``run``), na thread da requisição
+e sem guardar o job.
+"""
+import os
+import time
+import uuid
+import logging
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from singleflight import SingleFlight
+from admission import Overloaded
+
+# Threads que executam/aguardam jobs; o limite real por endpoint fica na admissão
+JOBS_MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", "32"))
+# Quanto tempo (s) um job finalizado fica disponível para consulta
+JOBS_TTL = int(os.getenv("JOBS_TTL", "3600"))
+JOBS_MAX_KEPT = int(os.getenv("JOBS_MAX_KEPT", "200"))
+
+CALLBACK_TIMEOUT = 15
+CALLBACK_RETRIES = 3
+
+
+def post_with_retries(url: str, body: dict) -> dict:
+    """POST de ``body`` em ``url`` com até CALLBACK_RETRIES tentativas (espera 2, 4, ... s).
+
+    Devolve o estado da última tentativa: ``ok``, ``status`` ou ``error`` e ``attempts``.
+    """
+    for attempt in range(1, CALLBACK_RETRIES + 1):
+        try:
+            resp = requests.post(url, json=body, timeout=CALLBACK_TIMEOUT)
+            outcome = {"ok": resp.ok, "status": resp.status_code, "attempts": attempt}
+        except requests.RequestException as e:
+            outcome = {"ok": False, "error": str(e), "attempts": attempt}
+        if outcome["ok"]:
+            break
+        if attempt < CALLBACK_RETRIES:
+            time.sleep(2 ** attempt)
+    return outcome
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+class Job:
+    def __init__(self, kind: str, body: dict, callback_url: str = None, refresh: bool = False,
+                 queue_timeout: float = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.body = body
+        self.callback_url = callback_url
+        self.refresh = refresh
+        self.queue_timeout = queue_timeout
+        self.retry_after = None
+        self.status = "queued"
+        self.progress = {}
+        self.payload = None
+        self.http_status = None
+        self.callback = None
+        self.coalesced = 1
+        self.entry = None   # cache.Entry quando o resultado é cacheável
+        self.cache = None   # "hit", "miss" ou "bypass"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def set_progress(self, done: int, total: int):
+        self.progress = {"done": done, "total": total}
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        queued_until = self.started_at or now
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "http_status": self.http_status,
+            "coalesced": self.coalesced,
+            "cache": self.cache,
+            "etag": self.entry.etag if self.entry else None,
+            "created_at": _iso(self.created_at),
+            "started_at": _iso(self.started_at),
+            "finished_at": _iso(self.finished_at),
+            "queued_ms": int((queued_until - self.created_at) * 1000),
+            "run_ms": int(((self.finished_at or now) - self.started_at) * 1000) if self.started_at else None,
+            "callback": self.callback,
+        }
+
+
+class JobManager:
+    """
+    ``keys`` mapeia kind -> função(body) que gera a chave normalizada da execução;
+    jobs com a mesma chave rodando ao mesmo tempo são coalescidos (single-flight).
+    ``rebind(kind, body, payload)`` adapta o resultado compartilhado para cada chamador.
+    ``cache`` (um ``cache.ResultCache``) guarda os resultados 200 dos kinds com TTL;
+    ``cacheable(kind, body)`` pode excluir chamadas específicas do cache.
+    ``admission`` (um ``admission.Admission``) limita execuções simultâneas por kind.
+    """
+
+    def __init__(self, runners: dict, keys: dict = None, rebind=None, cache=None, cacheable=None,
+                 admission=None, max_workers: int = JOBS_MAX_WORKERS):
+        self.runners = runners
+        self.keys = keys or {}
+        self.rebind = rebind
+        self.cache = cache
+        self.cacheable = cacheable
+        self.admission = admission
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def key_for(self, kind: str, body):
+        """Chave normalizada da execução, ou None se o kind não coalesce."""
+        key_func = self.keys.get(kind)
+        if not key_func:
+            return None
+        return kind, key_func(body if isinstance(body, dict) else {})
+
+    def cached(self, kind: str, body):
+        """Entrada de cache válida para esta chamada, sem enfileirar nada."""
+        key = self.key_for(kind, body)
+        if key is None or not self._uses_cache(kind, body):
+            return None
+        return self.cache.get(kind, key)
+
+    def _uses_cache(self, kind: str, body) -> bool:
+        if self.cache is None or not self.cache.enabled(kind):
+            return False
+        return self.cacheable is None or self.cacheable(kind, body)
+
+    def submit(self, kind: str, body: dict, callback_url: str = None, refresh: bool = False,
+               queue_timeout: float = None) -> Job:
+        """``queue_timeout``: espera máxima por um slot de admissão (None = sem limite)."""
+        if kind not in self.runners:
+            raise KeyError(kind)
+        job = self._register(Job(kind, body, callback_url, refresh=refresh, queue_timeout=queue_timeout))
+        self._executor.submit(self._run, job)
+        return job
+
+    def run(self, kind: str, body: dict, refresh: bool = False, queue_timeout: float = None) -> Job:
+        """Executa o job na thread de quem chama e devolve ele já finalizado (rotas síncronas).
+
+        Não passa pelo pool de threads: jobs assíncronos esperando admissão
+        (sem timeout) podem ocupar todas as threads, e a requisição síncrona
+        ficaria na fila do executor sem nunca chegar ao 429 rápido da admissão.
+        Também não entra em ``_jobs``: ninguém consulta o job pelo id, e guardar
+        o resultado (planilhas de vários MB) até o JOBS_TTL só ocuparia memória.
+        """
+        if kind not in self.runners:
+            raise KeyError(kind)
+        job = Job(kind, body, refresh=refresh, queue_timeout=queue_timeout)
+        self._run(job)
+        return job
+
+    def _register(self, job: Job) -> Job:
+        with self._lock:
+            self._evict()
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.payload, job.http_status = self._execute(job)
+        except Overloaded as e:
+            job.retry_after = e.retry_after
+            job.payload, job.http_status = {"error": "Too many requests", "details": str(e),
+                                            "retry_after": e.retry_after}, 429
+        except Exception as e:
+            logging.exception(f"Job {job.id} ({job.kind}) falhou")
+            job.payload, job.http_status = {"error": "Unexpected error", "details": str(e), "type": type(e).__name__}, 500
+
+        job.status = "succeeded" if job.http_status < 400 else "failed"
+        job.finished_at = time.time()
+        logging.info(f"Job {job.id} ({job.kind}) {job.status} em {job.finished_at - job.started_at:.1f}s")
+        job._done.set()
+
+        if job.callback_url:
+            self._notify(job)
+
+    def _call_runner(self, job: Job):
+        runner = self.runners[job.kind]
+        if self.admission is None:
+            return runner(job.body, progress=job.set_progress)
+        # "waiting": aguardando um slot livre do kind na admissão
+        job.status = "waiting"
+        with self.admission.slot(job.kind, timeout=job.queue_timeout):
+            job.status = "running"
+            return runner(job.body, progress=job.set_progress)
+
+    def _execute(self, job: Job):
+        key = self.key_for(job.kind, job.body)
+        if key is None:
+            return self._call_runner(job)
+
+        use_cache = self._uses_cache(job.kind, job.body)
+        if use_cache:
+            job.cache = "bypass" if job.refresh else "miss"
+            entry = None if job.refresh else self.cache.get(job.kind, key)
+            if entry is not None:
+                job.entry, job.cache = entry, "hit"
+                return entry.payload(), 200
+
+        def execute():
+            payload, status = self._call_runner(job)
+            entry = self.cache.put(job.kind, key, payload) if use_cache and status == 200 else None
+            return payload, status, entry
+
+        (payload, status, job.entry), job.coalesced = self._flights.do(key, execute)
+        if job.coalesced > 1:
+            logging.info(f"Job {job.id} ({job.kind}) coalescido com {job.coalesced - 1} outra(s) chamada(s)")
+        if self.rebind:
+            payload = self.rebind(job.kind, job.body, payload)
+        return payload, status
+
+    def _notify(self, job: Job):
+        """Envia o status + resultado do job para o webhook informado no submit."""
+        body = job.to_dict()
+        body["result"] = job.payload
+        job.callback = post_with_retries(job.callback_url, body)
+        if not job.callback["ok"]:
+            logging.warning(f"Callback do job {job.id} falhou: {job.callback}")
+
+    def _evict(self):
+        """Remove jobs finalizados que expiraram (e os mais antigos se passar do limite)."""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and now - job.finished_at > JOBS_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(self._jobs) - JOBS_MAX_KEPT)]:
+            del self._jobs[job.id]
@@ -0,0 +1,168 @@
+"""
+Métricas no formato texto do Prometheus, sem dependências externas.
+
+Contadores e histogramas ficam num registro em memória do processo. Os workers
+do pool (workers.py) devolvem o que mediram junto com o resultado do job
+(``drain``) e o processo do Flask soma no seu registro (``merge``), então o
+``/metrics`` mostra também as fases internas dos scrapers.
+"""
+import time
+import threading
+from contextlib import contextmanager
+
+PREFIX = "scripts_api_"
+
+# Buckets em segundos (padrão) e em bytes (tamanho de planilha)
+TIME_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600, 900)
+SIZE_BUCKETS = (10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+BUCKETS = {
+    "excel_size_bytes": SIZE_BUCKETS,
+    "cmc_captcha_attempts": COUNT_BUCKETS,
+    "setlistfm_pages_walked": COUNT_BUCKETS,
+}
+
+HELP = {
+    "http_requests_total": "Requisicoes HTTP por rota, metodo e status",
+    "http_request_errors_total": "Respostas HTTP com status >= 400 por rota",
+    "http_request_duration_seconds": "Latencia das requisicoes HTTP por rota",
+    "worker_job_duration_seconds": "Duracao de cada script no pool de workers/subprocess",
+    "worker_checkout_seconds": "Espera por um worker livre no pool (fora do timeout do script)",
+    "worker_pool_spawned_total": "Workers extras subidos sob demanda (acima de WORKER_POOL_SIZE)",
+    "browser_launch_seconds": "Tempo para subir o Chromium",
+    "browser_relaunches_total": "Relancamentos do Chromium compartilhado (crash ou reciclagem)",
+    "browser_contexts_total": "Contextos abertos no Chromium compartilhado",
+    "monitor_page_rotations_total": "Trocas de pagina do monitor (sites, heap ou crash)",
+    "page_goto_seconds": "Duracao de page.goto",
+    "monitor_wait_seconds": "Esperas do monitor.fetch_html (selector e prontidao adaptativa)",
+    "monitor_extract_seconds": "Extracao do conteudo dentro da pagina (page.evaluate)",
+    "jina_fetch_seconds": "Duracao das chamadas ao Jina Reader",
+    "static_fetch_seconds": "Duracao do GET estatico do monitor (tier sem navegador)",
+    "politeness_wait_seconds": "Espera pelo token do host antes de visitar um site ou chamar o Jina",
+    "politeness_deadline_skips_total": "Visitas puladas porque o token do host so sairia depois do prazo",
+    "monitor_precheck_total": "Resultado da pre-checagem condicional do monitor",
+    "monitor_hedge_total": "Resultado do hedging Playwright x Jina (vencedor ou not_started)",
+    "monitor_hedge_cost_seconds": "Tempo gasto pelo perdedor quando o hedging disparou o Jina",
+    "monitor_schedule_lag_seconds": "Atraso entre o horario agendado e o inicio da verificacao",
+    "monitor_schedule_runs_total": "Verificacoes feitas pelo agendador do monitor por resultado",
+    "monitor_schedule_webhooks_total": "Webhooks de mudanca enviados pelo agendador do monitor",
+    "cmc_captcha_attempts": "Tentativas de captcha por execucao do CMC",
+    "setlistfm_pages_walked": "Paginas percorridas por coleta do setlist.fm (http ou playwright)",
+    "setlistfm_page_seconds": "Download de cada pagina do attended do setlist.fm",
+    "setlistfm_page_retries_total": "Paginas do attended baixadas de novo apos erro de rede ou status != 200",
+    "setlistfm_http_fallback_total": "Coletas do setlist.fm que cairam no Playwright (HTTP bloqueado)",
+    "excel_generation_seconds": "Tempo para gerar a planilha xlsx",
+    "excel_size_bytes": "Tamanho da planilha xlsx gerada",
+    "admission_rejected_total": "Chamadas recusadas com 429 pelo controle de admissao",
+    "admission_wait_seconds": "Tempo na fila de admissao ate conseguir um slot",
+}
+
+_lock = threading.Lock()
+_counters = {}     # (name, labels) -> valor
+_histograms = {}   # (name, labels) -> [contagens por bucket..., soma, total]
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, value: float, **labels):
+    buckets = BUCKETS.get(name, TIME_BUCKETS)
+    key = (name, _labels(labels))
+    with _lock:
+        data = _histograms.get(key)
+        if data is None:
+            data = _histograms[key] = [0] * len(buckets) + [0.0, 0]
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Mede o bloco em segundos (mesmo que ele levante exceção)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def drain() -> dict:
+    """Tira uma cópia do registro e zera (usado pelos workers a cada job)."""
+    global _counters, _histograms
+    with _lock:
+        snapshot = {"counters": _counters, "histograms": _histograms}
+        _counters, _histograms = {}, {}
+    return snapshot
+
+
+def merge(snapshot: dict):
+    """Soma no registro local um snapshot vindo de ``drain`` em outro processo."""
+    if not snapshot:
+        return
+    with _lock:
+        for key, value in snapshot["counters"].items():
+            _counters[key] = _counters.get(key, 0) + value
+        for key, data in snapshot["histograms"].items():
+            current = _histograms.get(key)
+            if current is None:
+                _histograms[key] = list(data)
+            else:
+                for i, value in enumerate(data):
+                    current[i] += value
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (
+        f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render() -> str:
+    with _lock:
+        counters = sorted(_counters.items())
+        histograms = sorted(_histograms.items())
+
+    lines = []
+    seen = set()
+
+    def header(name, kind):
+        if name not in seen:
+            seen.add(name)
+            if name in HELP:
+                lines.append(f"# HELP {PREFIX}{name} {HELP[name]}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+    for (name, labels), value in counters:
+        header(name, "counter")
+        lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    for (name, labels), data in histograms:
+        header(name, "histogram")
+        buckets = BUCKETS.get(name, TIME_BUCKETS)
+        for bound, count in zip(buckets, data):
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', _format_value(bound)),))} {count}")
+        lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {data[-1]}")
+        lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(data[-2])}")
+        lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {data[-1]}")
+
+    return "\n".join(lines) + "\n"
@@ -1,14 +1,30 @@
 import os
+import codecs
 import re
 import hashlib
+import inspect
+import math
 import logging
 import time
+import threading
+from types import SimpleNamespace
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
 from zoneinfo import ZoneInfo
 from urllib.parse import urlparse
 
 import requests
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeout
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.builder import ParserRejectedMarkup
+from bs4.builder._htmlparser import BeautifulSoupHTMLParser, HTMLParserTreeBuilder
+from playwright.sync_api import TimeoutError as PlaywrightTimeout
+
+import metrics
+from browser_pool import get_browser_pool
+from monitor_store import TIERS, get_store
+from politeness import JINA_HOST, PoliteQueue, get_host_buckets, host_of
 
 LOCAL_TZ = ZoneInfo("America/Sao_Paulo")
 
@@ -17,62 +33,270 @@ LOCAL_TZ = ZoneInfo("America/Sao_Paulo")
 # PLAYWRIGHT
 # ---------------------------------------------------------------------------
 
-def create_context(playwright):
-    browser = playwright.chromium.launch(
-        headless=True,
-        executable_path=os.environ.get("CHROME_BIN", "/usr/bin/chromium"),
-        args=[
-            "--no-sandbox",
-            "--disable-dev-shm-usage",
-            "--disable-gpu",
-            "--disable-extensions",
-        ],
-    )
-    context = browser.new_context(
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+BROWSER_HEADERS = {
+    "Accept-Language": "pt-BR,pt;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
+
+@contextmanager
+def create_context():
+    """Contexto isolado no Chromium compartilhado (browser_pool), fechado ao sair."""
+    with get_browser_pool().context(
         viewport={"width": 1280, "height": 720},
-        user_agent=(
-            "Mozilla/5.0 (X11; Linux x86_64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
-        extra_http_headers={
-            "Accept-Language": "pt-BR,pt;q=0.9",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-        },
-    )
-    # Bloqueia apenas imagens, fontes e mídia — NÃO bloquear CSS pois
-    # alguns sites (ex: URBS) dependem de stylesheet para renderizar conteúdo
-    context.route(
-        "**/*",
-        lambda route: route.abort()
-        if route.request.resource_type in ("image", "font", "media")
-        else route.continue_(),
-    )
-    return browser, context
+        user_agent=USER_AGENT,
+        extra_http_headers=BROWSER_HEADERS,
+    ) as context:
+        # Bloqueia apenas imagens, fontes e mídia — NÃO bloquear CSS pois
+        # alguns sites (ex: URBS) dependem de stylesheet para renderizar conteúdo
+        context.route(
+            "**/*",
+            lambda route: route.abort()
+            if route.request.resource_type in ("image", "font", "media")
+            else route.continue_(),
+        )
+        yield context
+
+
+# Prontidão adaptativa: a página está pronta quando o conteúdo extraível
+# (títulos e linhas de tabela) fica estável por ``quiet_ms`` sem mutações
+# no DOM, respeitando ``min_ms`` e o teto ``max_ms`` (a espera fixa antiga).
+READINESS = {
+    "wait_until": "domcontentloaded",
+    "quiet_ms": 1_500,
+    "min_ms": 500,
+    "max_ms": 8_000,
+    "poll_ms": 250,
+}
+
+# Ajustes por site (trecho do domínio -> chaves de READINESS)
+SITE_READINESS = {
+    # URBS monta o conteúdo tarde, depois do CSS e de várias chamadas XHR
+    "urbs.curitiba.pr.gov.br": {"wait_until": "networkidle", "quiet_ms": 3_000, "max_ms": 15_000},
+}
+
+_OBSERVE_MUTATIONS_JS = """
+() => {
+    if (window.__monitorObserver) return;
+    window.__monitorLastMutation = performance.now();
+    window.__monitorObserver = new MutationObserver(() => {
+        window.__monitorLastMutation = performance.now();
+    });
+    window.__monitorObserver.observe(document, {childList: true, subtree: true, characterData: true});
+}
+"""
+
+# Extração barata do que o extract_content usa, mais a idade da última mutação
+_SIGNATURE_JS = """
+() => {
+    const heads = Array.from(document.querySelectorAll('h1,h2,h3'), h => h.innerText.trim()).join('\\n');
+    return {
+        signature: heads.length + ':' + document.querySelectorAll('tr').length + ':' + heads.slice(0, 4000),
+        quiet: performance.now() - (window.__monitorLastMutation || 0),
+    };
+}
+"""
+
+
+# Orçamento de tempo (``deadline_ms`` do /run-monitor). Os prazos são
+# instantes de time.monotonic(); None = sem prazo.
+
+class DeadlineExceeded(Exception):
+    """O orçamento acabou antes de algum tier conseguir verificar o site."""
+
+
+# Tempo mínimo (s) que sobra para valer a pena começar cada tier
+DEADLINE_MIN_TIER_SECONDS = {"static": 2, "playwright": 8, "jina": 5}
+# Reserva (s) para extrair o conteúdo depois da espera de prontidão
+DEADLINE_EXTRACT_RESERVE = 1
+
+
+def _token_deadline(deadline, tier: str = None):
+    """Até quando vale esperar um token de politeness: ainda sobrando o mínimo do tier.
+
+    Sem ``tier`` (a visita inteira do site) basta sobrar tempo para o GET
+    condicional, que sozinho já responde os sites que não mudaram.
+    """
+    if deadline is None:
+        return None
+    return deadline - (DEADLINE_MIN_TIER_SECONDS[tier] if tier else MONITOR_PRECHECK_MIN_SECONDS)
 
 
-def fetch_html(page, url: str) -> str:
+def _time_left(deadline, cap: float) -> float:
+    """``cap`` segundos, limitado ao que falta até ``deadline``."""
+    if deadline is None:
+        return cap
+    return max(0.0, min(cap, deadline - time.monotonic()))
+
+
+def readiness_for(url: str) -> dict:
+    settings = dict(READINESS)
+    host = urlparse(url).netloc.lower()
+    for domain, overrides in SITE_READINESS.items():
+        if domain in host:
+            settings.update(overrides)
+    return settings
+
+
+def wait_until_ready(page, settings: dict, cancelled=None) -> str:
+    """Espera o conteúdo estabilizar. Retorna o motivo: "stable", "ceiling" ou "cancelled".
+
+    ``cancelled`` (opcional) é consultado a cada sondagem; o hedging usa para
+    largar a página quando o Jina já respondeu.
+    """
+    quiet_s = settings["quiet_ms"] / 1000
+    start = time.monotonic()
+    min_deadline = start + settings["min_ms"] / 1000
+    deadline = start + settings["max_ms"] / 1000
+
+    last_signature, stable_since = None, start
+    while True:
+        if cancelled is not None and cancelled():
+            return "cancelled"
+        now = time.monotonic()
+        try:
+            page.evaluate(_OBSERVE_MUTATIONS_JS)
+            state = page.evaluate(_SIGNATURE_JS)
+        except Exception:
+            # navegação em andamento: conta como mudança
+            state = {"signature": None, "quiet": 0}
+
+        if state["signature"] != last_signature:
+            last_signature, stable_since = state["signature"], now
+        stable_for = now - stable_since
+        dom_quiet = state["quiet"] / 1000
+
+        # Estável e sem mutações; ou estável há o dobro da janela (carrosséis e
+        # relógios que nunca param de mexer no DOM mas não mudam os títulos)
+        if now >= min_deadline and last_signature is not None and (
+            (stable_for >= quiet_s and dom_quiet >= quiet_s) or stable_for >= 2 * quiet_s
+        ):
+            return "stable"
+        if now >= deadline:
+            return "ceiling"
+        page.wait_for_timeout(settings["poll_ms"])
+
+
+def load_page(page, url: str, cancelled=None, deadline=None):
+    """Navega até a URL e espera o conteúdo ficar pronto (sem ler o HTML).
+
+    Com ``deadline`` os timeouts encolhem para caber no prazo e a espera
+    adaptativa é pulada quando não sobra tempo nem para uma janela de silêncio.
+    """
+    settings = readiness_for(url)
+    start = time.monotonic()
     try:
-        # networkidle aguarda a rede ficar quieta — garante que JS terminou
-        page.goto(url, wait_until="networkidle", timeout=45_000)
+        with metrics.timer("page_goto_seconds", scraper="monitor"):
+            page.goto(url, wait_until=settings["wait_until"], timeout=_timeout_ms(deadline, 45))
     except PlaywrightTimeout:
         pass
 
     try:
-        page.wait_for_selector("body", timeout=15_000)
+        with metrics.timer("monitor_wait_seconds", phase="selector"):
+            page.wait_for_selector("body", timeout=_timeout_ms(deadline, 15))
     except PlaywrightTimeout:
         pass
 
-    page.wait_for_timeout(8_000)
+    ready_start = time.monotonic()
+    if deadline is not None:
+        # a reserva para extrair só vale com prazo; sem ele o teto é o configurado
+        budget_ms = (_time_left(deadline, settings["max_ms"] / 1000) - DEADLINE_EXTRACT_RESERVE) * 1000
+        settings["max_ms"] = min(settings["max_ms"], budget_ms)
+    if deadline is not None and settings["max_ms"] < settings["quiet_ms"]:
+        reason = "deadline"
+    else:
+        reason = wait_until_ready(page, settings, cancelled)
+    waited = time.monotonic() - ready_start
+    metrics.observe("monitor_wait_seconds", waited, phase="ready", reason=reason)
+    logging.info(
+        f"Pronto {site_name(url)} em {time.monotonic() - start:.1f}s "
+        f"(espera {waited:.1f}s de {settings['max_ms'] / 1000:.0f}s, {reason})"
+    )
 
     try:
         page.evaluate("window.stop()")
     except Exception:
         pass
 
+
+def _timeout_ms(deadline, cap: float) -> int:
+    """Timeout do Playwright em ms (0 lá significa "sem timeout", então nunca menos de 1)."""
+    return max(1, int(_time_left(deadline, cap) * 1000))
+
+
+def fetch_html(page, url: str) -> str:
+    load_page(page, url)
     return page.content()
 
 
+# Extração dentro da página: o mesmo que extract_content/_extract_metrocard
+# fazem, mas sobre o DOM vivo, num único page.evaluate. Em vez do HTML inteiro
+# (serializado, transferido pelo pipe do Playwright e re-parseado) volta só o
+# tamanho do HTML e os textos crus; o filtro e o formato final são os mesmos
+# do caminho por HTML (_join_titles/_join_rows).
+#
+# O DOM do Chromium não é idêntico à árvore do html.parser (ele fecha tags
+# implicitamente, por exemplo), então ligar este modo pode mudar o hash de
+# alguns sites uma vez.
+MONITOR_EXTRACT_IN_PAGE = os.getenv("MONITOR_EXTRACT_IN_PAGE", "0") == "1"
+
+_EXTRACT_JS = """
+(metrocard) => {
+    // strings que o get_text do bs4 ignora (Script, Stylesheet, TemplateString, RubyText...)
+    const HIDDEN = ['SCRIPT', 'STYLE', 'TEMPLATE', 'RT', 'RP'];
+    const SKIPPED = ['NAV', 'FOOTER', 'HEADER', 'ASIDE'];
+    const text = (root, rejected, separator) => {
+        const parts = [];
+        const walker = document.createTreeWalker(root, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+            acceptNode: node => node.nodeType === Node.TEXT_NODE ? NodeFilter.FILTER_ACCEPT
+                : rejected.includes(node.tagName) ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_SKIP,
+        });
+        for (let node = walker.nextNode(); node; node = walker.nextNode()) {
+            const value = node.nodeValue.trim();
+            if (value) parts.push(value);
+        }
+        return parts.join(separator);
+    };
+    const size = document.documentElement ? document.documentElement.outerHTML.length : 0;
+
+    if (metrocard) {
+        const rows = [];
+        for (const tr of document.querySelectorAll('table tr')) {
+            const cells = tr.querySelectorAll('td, th');
+            if (cells.length < 2) continue;
+            const link = tr.querySelector('a');
+            rows.push([text(cells[0], HIDDEN, ''), text(cells[1], HIDDEN, ''), link ? link.getAttribute('href') || '' : '']);
+        }
+        return {size, rows};
+    }
+
+    const titles = [];
+    for (const h of document.querySelectorAll('h1, h2, h3')) {
+        if (h.closest('script, style, nav, footer, header, aside')) continue;
+        titles.push(text(h, HIDDEN.concat(SKIPPED), ' '));
+    }
+    return {size, titles};
+}
+"""
+
+
+def extract_in_page(page, url: str) -> tuple:
+    """Extrai o conteúdo no próprio navegador. Retorna ``(tamanho do HTML, conteúdo)``."""
+    metrocard = _is_metrocard(url)
+    with metrics.timer("monitor_extract_seconds", where="page"):
+        data = page.evaluate(_EXTRACT_JS, metrocard)
+    content = _join_rows(data["rows"]) if metrocard else _join_titles(data["titles"])
+    return data["size"], content
+
+
+# O monitor aprende sozinho qual tier funciona em cada site (monitor_store).
+# As listas abaixo só forçam o Jina para quem nunca deve passar pelos outros.
+
 # Sites que devem usar SOMENTE Jina Reader (Playwright não funciona)
 JINA_ONLY_SITES = [
     # Adicione aqui URLs que o Playwright não consegue acessar
@@ -88,134 +312,157 @@ SELECTIVE_EXTRACT = [
 ]
 
 
+# Padrões do extract_meaningful, compilados uma vez só. Os da Fase 1 rodam
+# sobre as linhas com ### juntas por \n, então não podem atravessar quebras
+# de linha (equivalem a aplicar o padrão original linha a linha).
+_IMAGE = re.compile(r'!\[.*?\]\(.*?\)')
+_IMAGE_LINK = re.compile(r'\[!\[.*?\]\(.*?\)\]\(.*?\)')
+_LINK = re.compile(r'\[([^\]]*?)\]\([^)]*\)')
+_LINE_LINK = re.compile(r'\[([^\]\n]*?)\]\([^)\n]*\)')
+_LINE_BARE_URL = re.compile(r'http\S+')
+_LINE_LINK_TAIL = re.compile(r'\]\([^)\n]*\)')
+# Cada trecho depois de um #, ## ou ### até o próximo (ou o fim da linha)
+_LINE_HEADING_PART = re.compile(r'#{1,3}[^\S\n]+((?:(?!#{1,3}[^\S\n]).)*)')
+_LINE_VEJA_MAIS = re.compile(r'veja[^\S\n]*mais', re.IGNORECASE)
+_LINE_SPACES = re.compile(r'[^\S\n]+')
+_HEADING = re.compile(r'#{1,3}\s+(.+)')
+_QUERY = re.compile(r'\?[^\s)\]"><]+')
+_BLOB = re.compile(r'blob:https?://[^\s)\]"><]+')
+_VEJA_MAIS = re.compile(r'veja\s*mais', re.IGNORECASE)
+_COUNTER = re.compile(r'\b\d{2,}\b')
+# Frases completas de boilerplate (mais específico que palavras soltas)
+_BOILERPLATE = re.compile(
+    r'(feito\s+com|site\s+gr[aá]tis|comece\s+j[aá]|'
+    r'image\s*\d+\s*:|alboom\s*pro|www\.alboom|'
+    r'ir\s+para\s+o\s+topo|'
+    r'p[aá]gina\s+inicial\s+de)',
+    re.IGNORECASE,
+)
+
+
 def extract_meaningful(jina_markdown: str, url: str) -> str:
     """Extrai apenas os títulos do portfólio do markdown do Jina.
 
     Remove imagens, blob URLs, query params, contadores de views
     e outros ruídos que causam falsos positivos em sites como Alboom.
     Retorna string com títulos ordenados separados por | para hashear.
+
+    A Fase 1 trata de uma vez só todas as linhas com ###; a Fase 2 mantém as
+    substituições no documento inteiro, na mesma ordem, enquanto elas podem
+    atravessar linhas (links e "veja mais"). A saída é idêntica à da versão
+    linha a linha (conferida pelo bench_monitor.py).
     """
-    if not jina_markdown:
+    if not jina_markdown or '#' not in jina_markdown:
         return ""
 
-    # --- Fase 1: extrair do markdown original (antes de destruir os links) ---
-    nav_links = []
-    social = []
-    headings_raw = []
+    # --- Fase 1: títulos (###) do markdown original, antes de destruir os links ---
+    # Primeiro limpa as linhas (imagens, links, URLs nuas e artefatos)
+    clean = '\n'.join(line.strip() for line in jina_markdown.split('\n') if '###' in line)
+    clean = _IMAGE.sub('', clean)
+    clean = _LINE_LINK.sub(r'\1', clean)
+    clean = _LINE_BARE_URL.sub('', clean)
+    clean = _LINE_LINK_TAIL.sub('', clean)
+    # Divide por ### (o que vem antes do primeiro fica de fora), uma parte por linha
+    parts = '\n'.join(_LINE_HEADING_PART.findall(clean))
+    # Limpa boilerplate e números
+    parts = _LINE_VEJA_MAIS.sub('', parts)
+    parts = _COUNTER.sub('', parts)
+    parts = _LINE_SPACES.sub(' ', parts)
+    headings = {part.strip() for part in parts.split('\n')}
 
-    for line in jina_markdown.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
+    # --- Fase 2: limpar tudo para extrair só texto estrutural ---
+    md = _IMAGE_LINK.sub('', jina_markdown)
+    md = _IMAGE.sub('', md)
+    md = _LINK.sub(r'\1', md)           # [texto](url) -> texto
+    md = _QUERY.sub('', md)             # query params de URLs nuas
+    md = _BLOB.sub('', md)
+    md = _VEJA_MAIS.sub('', md)
+    # Daqui em diante nada atravessa linhas: basta tratar as que têm #
+    md = '\n'.join(line for line in md.split('\n') if '#' in line)
+    md = _COUNTER.sub('', md)           # contadores de views/fotos
+    md = md.replace('*', '')            # asteriscos de negrito
 
-        # Links de redes sociais — extrai só o nome da plataforma
-        social_match = re.findall(
-            r'\[.*?\]\((https?://(?:www\.)?(facebook|instagram|twitter|pinterest|youtube|linkedin|tiktok)\.com[^)]*)\)',
-            line, flags=re.IGNORECASE,
-        )
-        for _, platform in social_match:
-            social.append(platform.lower())
-
-        # Links com texto visível curto = navegação/categorias
-        for text in re.findall(r'\[([A-Za-z0-9][^\]]{1,40})\]\([^)]+\)', line):
-            text = text.strip()
-            if text and not re.search(r'http|\.jpg|\.png|\.gif|\.webp|image\s*\d', text, re.IGNORECASE):
-                nav_links.append(text)
-
-        # Títulos (###) — primeiro limpa a linha, depois divide por ###
-        if '###' in line:
-            clean = line
-            # Remove todas as imagens e links
-            clean = re.sub(r'!\[.*?\]\(.*?\)', '', clean)
-            clean = re.sub(r'\[([^\]]*?)\]\([^)]*\)', r'\1', clean)
-            # Remove URL nuas e artefatos
-            clean = re.sub(r'http\S+', '', clean)
-            clean = re.sub(r'\]\([^)]*\)', '', clean)
-            # Divide por ### e processa cada parte (pula a primeira, é anterior ao primeiro ###)
-            for part in re.split(r'#{1,3}\s+', clean)[1:]:
-                # Limpa boilerplate e números
-                part = re.sub(r'veja\s*mais', '', part, flags=re.IGNORECASE)
-                part = re.sub(r'\b\d{2,}\b', '', part)
-                part = re.sub(r'\s+', ' ', part).strip()
-                if len(part) >= 5:
-                    headings_raw.append(part)
+    for line in md.split('\n'):
+        h_match = _HEADING.search(line.strip())
+        if h_match:
+            headings.add(h_match.group(1).strip())
 
-    # --- Fase 2: limpar tudo para extrair só texto estrutural ---
-    md = jina_markdown
+    # --- Fase 3: filtrar boilerplate e ordenar ---
+    all_headings = sorted(
+        h for h in headings
+        if len(h) >= 5 and not _BOILERPLATE.search(h)
+    )
+    return '|'.join(all_headings)
 
-    # Remove imagens e links que contêm imagens
-    md = re.sub(r'\[!\[.*?\]\(.*?\)\]\(.*?\)', '', md)
-    md = re.sub(r'!\[.*?\]\(.*?\)', '', md)
 
-    # Converte links markdown em texto puro: [texto](url) -> texto
-    md = re.sub(r'\[([^\]]*?)\]\([^)]*\)', r'\1', md)
+def needs_selective_extract(url: str) -> bool:
+    """Verifica se a URL precisa de extração seletiva (vs. hash do conteúdo bruto)."""
+    return any(re.search(pattern, url, re.IGNORECASE) for pattern in SELECTIVE_EXTRACT)
 
-    # Remove query params de URLs nuas restantes
-    md = re.sub(r'\?[^\s)\]"><]+', '', md)
 
-    # Remove blob URLs
-    md = re.sub(r'blob:https?://[^\s)\]"><]+', '', md)
+# Sessão HTTP com pool de conexões para o tier estático (keep-alive entre sites)
+_http = requests.Session()
+_http.headers.update({"User-Agent": USER_AGENT, **BROWSER_HEADERS})
+_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=32))
+_http.mount("http://", requests.adapters.HTTPAdapter(pool_connections=32, pool_maxsize=32))
 
-    # Remove "Veja mais"
-    md = re.sub(r'veja\s*mais', '', md, flags=re.IGNORECASE)
 
-    # Remove números isolados (contadores de views/fotos)
-    md = re.sub(r'\b\d{2,}\b', '', md)
+def fetch_static(url: str, timeout: int = 15, validators: dict = None) -> requests.Response:
+    """GET simples do HTML servido pelo servidor, sem renderizar JavaScript.
 
-    # Remove caracteres de lista e asteriscos de negrito
-    md = re.sub(r'[*]{1,2}', '', md)
+    Com ``validators`` (ETag/Last-Modified da última vez) vira um GET
+    condicional e pode voltar 304.
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+    with metrics.timer("static_fetch_seconds", caller="monitor"):
+        resp = _http.get(url, timeout=timeout, headers=headers)
+    if resp.status_code != 304:
+        resp.raise_for_status()
+        resp.encoding = _html_encoding(resp)
+    return resp
 
-    # Extrai títulos (###) do texto limpo
-    headings = []
-    for line in md.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
-        h_match = re.search(r'#{1,3}\s+(.+)', line)
-        if h_match:
-            text = h_match.group(1).strip()
-            if len(text) >= 5:
-                headings.append(text)
-
-    # --- Fase 3: juntar, filtrar boilerplate e deduplicar ---
-    # Frases completas de boilerplate (mais específico que palavras soltas)
-    boilerplate = re.compile(
-        r'(feito\s+com|site\s+gr[aá]tis|comece\s+j[aá]|'
-        r'image\s*\d+\s*:|alboom\s*pro|www\.alboom|'
-        r'ir\s+para\s+o\s+topo|'
-        r'p[aá]gina\s+inicial\s+de)',
-        re.IGNORECASE,
-    )
-    nav_links = sorted(set(
-        n for n in nav_links
-        if not boilerplate.search(n)
-    ))
-    # Junta headings extraídos do raw (Fase 1) com os do texto limpo (Fase 2)
-    all_headings = headings_raw + headings
-    all_headings = sorted(set(
-        h for h in all_headings
-        if not boilerplate.search(h) and len(h.strip()) >= 5
-    ))
-    social = sorted(set(social))
-
-    if not all_headings:
-        return ""
-    return '|'.join(all_headings)
 
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
 
-def needs_selective_extract(url: str) -> bool:
-    """Verifica se a URL precisa de extração seletiva (vs. hash do conteúdo bruto)."""
-    return any(re.search(pattern, url, re.IGNORECASE) for pattern in SELECTIVE_EXTRACT)
 
+def _html_encoding(resp: requests.Response) -> str:
+    """Encoding do corpo: charset do header, senão o ``<meta charset>``, senão detecção.
 
-def fetch_via_jina(url: str, timeout: int = 30, verify_ssl: bool = True) -> str:
-    """Busca o conteúdo via Jina Reader API (r.jina.ai). Retorna markdown limpo."""
+    Sem charset no header o requests assume ISO-8859-1 para text/html, e os
+    títulos acentuados viravam mojibake (com hash diferente do Playwright).
+    """
+    if "charset" in resp.headers.get("Content-Type", "").lower():
+        return resp.encoding
+    match = _META_CHARSET.search(resp.content[:4096])
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name
+        except LookupError:
+            pass
+    return resp.apparent_encoding
+
+
+def fetch_via_jina(url: str, timeout: int = 30, verify_ssl: bool = True, deadline=None) -> str:
+    """Busca o conteúdo via Jina Reader API (r.jina.ai). Retorna markdown limpo.
+
+    Com ``deadline``, se o token do Jina só sair tarde demais levanta
+    ``DeadlineExceeded`` sem gastar o token; o timeout é medido depois da espera.
+    """
     jina_url = f"https://r.jina.ai/{url}"
     headers = {
         "Accept": "text/markdown",
         "User-Agent": "Mozilla/5.0 (compatible; Monitor/1.0)",
     }
-    resp = requests.get(jina_url, headers=headers, timeout=timeout, verify=verify_ssl)
+    if not get_host_buckets().wait(JINA_HOST, _token_deadline(deadline, "jina")):
+        raise DeadlineExceeded("prazo esgotado esperando o token do Jina")
+    timeout = _time_left(deadline, timeout)
+    with metrics.timer("jina_fetch_seconds", caller="monitor"):
+        resp = requests.get(jina_url, headers=headers, timeout=timeout, verify=verify_ssl)
     resp.raise_for_status()
     return resp.text
 
@@ -224,43 +471,244 @@ def fetch_via_jina(url: str, timeout: int = 30, verify_ssl: bool = True) -> str:
 # EXTRAÇÃO DE CONTEÚDO
 # ---------------------------------------------------------------------------
 
+# Em vez de montar a árvore inteira do BeautifulSoup (lento em páginas de
+# vários MB) e depois jogar quase tudo fora, o tokenizador do próprio bs4
+# (html.parser) alimenta um coletor que só acompanha a pilha de tags abertas
+# e guarda o texto que interessa. Como o tokenizador, as entidades, as tags
+# vazias e o fechamento de tags são os mesmos do BeautifulSoup, a saída é
+# idêntica à da versão que monta a árvore (ver bench_monitor.py).
+
+_SKIPPED_TAGS = frozenset(["script", "style", "nav", "footer", "header", "aside"])
+_TITLE_TAGS = frozenset(["h1", "h2", "h3"])
+_CELL_TAGS = frozenset(["td", "th"])
+
+
+def _text_string_types() -> frozenset:
+    """Tipos de string que o ``get_text`` de um h1/td considera (varia com a versão do bs4)."""
+    tag = BeautifulSoup("<td></td>", "html.parser").td
+    types = getattr(tag, "interesting_string_types", None) or getattr(Tag, "MAIN_CONTENT_STRING_TYPES", NavigableString)
+    return frozenset([types]) if isinstance(types, type) else frozenset(types)
+
+
+_TEXT_TYPES = _text_string_types()
+
+
+class _VoidTagCounter(Counter):
+    """Multiconjunto com a interface de lista usada pelo parser do bs4."""
+
+    def append(self, name):
+        self[name] += 1
+
+    def remove(self, name):
+        self[name] -= 1
+
+    def __contains__(self, name):
+        return self[name] > 0
+
+
+class _StreamParser(BeautifulSoupHTMLParser):
+    """Parser do bs4 com ``already_closed_empty_element`` em multiconjunto.
+
+    Na versão original é uma lista que ganha um item a cada ``<br>``/``<img>``
+    e é percorrida em todo fechamento de tag, o que fica quadrático em
+    páginas grandes. A semântica (``in``/``remove`` por nome) é a mesma.
+    """
+
+    @property
+    def already_closed_empty_element(self):
+        return self._closed_void
+
+    @already_closed_empty_element.setter
+    def already_closed_empty_element(self, value):
+        self._closed_void = _VoidTagCounter(value)
+
+
+# A partir do bs4 4.13 o parser recebe o "soup" no construtor
+_PARSER_TAKES_SOUP = "soup" in inspect.signature(BeautifulSoupHTMLParser.__init__).parameters
+
+
+class _StreamCollector:
+    """Faz o papel do objeto BeautifulSoup para o parser do bs4, sem criar a árvore.
+
+    Reproduz só a parte do BeautifulSoup que decide a estrutura: a pilha de
+    tags abertas (``_popToTag``), o tipo de cada string (script, style,
+    template...) e o descarte de strings vazias. As subclasses recebem
+    ``opened``, ``closed`` e ``text``; pela disciplina de pilha, qualquer
+    contador lido em ``closed`` tem o mesmo valor que tinha em ``opened``.
+    """
+    _VOID = SimpleNamespace(is_empty_element=True)
+    _ELEMENT = SimpleNamespace(is_empty_element=False)
+
+    def __init__(self):
+        self.builder = HTMLParserTreeBuilder()
+        # lidos pelo handle_charref (original_encoding até o bs4 4.12, o outro
+        # a partir do 4.13); a entrada já é str, como no BeautifulSoup(html)
+        self.original_encoding = None
+        self.contains_replacement_characters = False
+        self._data = []
+        self._stack = []
+        self._open = Counter()
+        self._containers = []  # profundidade das tags com string especial abertas
+
+    def parse(self, html: str):
+        """Mesmo fluxo de ``HTMLParserTreeBuilder.feed`` + ``BeautifulSoup._feed``."""
+        self.builder.initialize_soup(self)
+        args, kwargs = self.builder.parser_args
+        if _PARSER_TAKES_SOUP:
+            parser = _StreamParser(self, *args, **kwargs)
+        else:
+            parser = _StreamParser(*args, **kwargs)
+            parser.soup = self
+        try:
+            parser.feed(html)
+            parser.close()
+        except AssertionError as e:
+            raise ParserRejectedMarkup(e)
+        self.endData()
+        while self._stack:
+            self._pop()
+        return self
+
+    # -- interface usada por BeautifulSoupHTMLParser --------------------------
+
+    def handle_starttag(self, name, namespace, nsprefix, attrs, sourceline=None, sourcepos=None, namespaces=None):
+        self.endData()
+        self._stack.append(name)
+        self._open[name] += 1
+        if name in self.builder.string_containers:
+            self._containers.append(len(self._stack))
+        self.opened(name, attrs)
+        return self._VOID if self.builder.can_be_empty_element(name) else self._ELEMENT
+
+    def handle_endtag(self, name, nsprefix=None):
+        self.endData()
+        if self._open[name]:
+            while self._pop() != name:
+                pass
+
+    def handle_data(self, data):
+        self._data.append(data)
+
+    def endData(self, containerClass=None):
+        if not self._data:
+            return
+        text = "".join(self._data).strip()
+        self._data = []
+        if not text:
+            return
+        if containerClass is None and self._containers:
+            containerClass = self.builder.string_containers[self._stack[self._containers[-1] - 1]]
+        if (containerClass or NavigableString) in _TEXT_TYPES:
+            self.text(text)
+
+    def _pop(self) -> str:
+        name = self._stack.pop()
+        self._open[name] -= 1
+        if self._containers and self._containers[-1] > len(self._stack):
+            self._containers.pop()
+        self.closed(name)
+        return name
+
+
+class _TitleCollector(_StreamCollector):
+    """h1-h3 fora de script/style/nav/footer/header/aside, como ``get_text(" ", strip=True)``."""
+
+    def __init__(self):
+        super().__init__()
+        self.titles = []
+        self._skipped = 0
+        self._headings = []  # partes de texto dos títulos abertos
+
+    def opened(self, name, attrs):
+        if name in _SKIPPED_TAGS:
+            self._skipped += 1
+        elif name in _TITLE_TAGS and not self._skipped:
+            self._headings.append([])
+
+    def closed(self, name):
+        if name in _SKIPPED_TAGS:
+            self._skipped -= 1
+        elif name in _TITLE_TAGS and not self._skipped:
+            self.titles.append(" ".join(self._headings.pop()))
+
+    def text(self, text):
+        if not self._skipped:
+            for parts in self._headings:
+                parts.append(text)
+
+
+class _TableRowCollector(_StreamCollector):
+    """Linhas ``table tr``: células td/th (``get_text(strip=True)``) e o href do primeiro link."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self._tables = 0
+        self._rows = []   # [células, href] das linhas abertas
+        self._cells = []  # partes de texto das células abertas
+
+    def opened(self, name, attrs):
+        if name == "table":
+            self._tables += 1
+        elif name == "tr":
+            if self._tables:
+                self._rows.append([[], None])
+        elif name in _CELL_TAGS:
+            if self._rows:
+                cell = []
+                for row in self._rows:
+                    row[0].append(cell)
+                self._cells.append(cell)
+        elif name == "a":
+            for row in self._rows:
+                if row[1] is None:
+                    row[1] = attrs.get("href", "")
+
+    def closed(self, name):
+        if name == "table":
+            self._tables -= 1
+        elif name == "tr":
+            if self._tables:
+                cells, href = self._rows.pop()
+                if len(cells) >= 2:
+                    self.rows.append(("".join(cells[0]), "".join(cells[1]), href or ""))
+        elif name in _CELL_TAGS:
+            if self._rows:
+                self._cells.pop()
+
+    def text(self, text):
+        for cell in self._cells:
+            cell.append(text)
+
+
+def _join_titles(titles) -> str:
+    """Formato final do extract_content: títulos com 10+ caracteres, únicos e ordenados."""
+    return "\n".join(sorted(set(t for t in titles if len(t) >= 10)))
+
+
+def _join_rows(rows) -> str:
+    """Formato final do metrocard: ``tipo-linha-href`` por linha, únicos e ordenados."""
+    results = (f"{tipo or 'N/A'}-{linha or 'N/A'}-{href}".strip() for tipo, linha, href in rows)
+    return "\n".join(sorted(set(r for r in results if r)))
+
+
+def _is_metrocard(url: str) -> bool:
+    return "cartaometrocard.com.br" in url
+
+
 def extract_content(html: str, url: str) -> str:
     if not html:
         return ""
 
-    if "cartaometrocard.com.br" in url:
+    if _is_metrocard(url):
         return _extract_metrocard(html)
 
-    soup = BeautifulSoup(html, "html.parser")
-    for tag in soup(["script", "style", "nav", "footer", "header", "aside"]):
-        tag.decompose()
-
-    titles = []
-    for h in soup.find_all(["h1", "h2", "h3"]):
-        text = h.get_text(" ", strip=True)
-        if len(text) >= 10:
-            titles.append(text)
-
-    return "\n".join(sorted(set(titles)))
+    return _join_titles(_TitleCollector().parse(html).titles)
 
 
 def _extract_metrocard(html: str) -> str:
     try:
-        soup = BeautifulSoup(html, "html.parser")
-        rows = soup.select("table tbody tr, table tr")
-
-        results = []
-        for row in rows:
-            cells = row.find_all(["td", "th"])
-            if len(cells) >= 2:
-                tipo = cells[0].get_text(strip=True) or "N/A"
-                linha = cells[1].get_text(strip=True) or "N/A"
-                link = row.find("a")
-                href = link.get("href", "") if link else ""
-                results.append(f"{tipo}-{linha}-{href}")
-
-        lines = sorted(set(r.strip() for r in results if r.strip()))
-        return "\n".join(lines)
+        return _join_rows(_TableRowCollector().parse(html).rows)
 
     except Exception as e:
         logging.error(f"Erro ao extrair metrocard: {e}")
@@ -280,105 +728,702 @@ def site_name(url: str) -> str:
 # FUNÇÃO PRINCIPAL
 # ---------------------------------------------------------------------------
 
-def _process_site_playwright(page, url: str) -> str:
-    """Tenta obter conteúdo via Playwright. Levanta exceção se falhar."""
-    html = fetch_html(page, url)
-    if len(html) < 5000:
-        raise ValueError(f"HTML muito pequeno ({len(html)} bytes)")
-    content = extract_content(html, url)
+def _validate_html(html: str, url: str) -> str:
+    """Extrai o conteúdo do HTML, levantando exceção se ele não for válido."""
+    _validate_size(len(html))
+    return _validate_content(extract_content(html, url))
+
+
+def _validate_size(size: int):
+    if size < 5000:
+        raise ValueError(f"HTML muito pequeno ({size} bytes)")
+
+
+def _validate_content(content: str) -> str:
     if not content or len(content) < 50:
         raise ValueError(f"Conteudo invalido ({len(content)} chars)")
     return content
 
 
-def _process_site_jina(url: str) -> str:
+def _precheck_html(precheck) -> bool:
+    """A pré-checagem já trouxe o HTML (200)."""
+    return precheck is not None and precheck.error is None and precheck.response.status_code == 200
+
+
+def _process_site_static(url: str, precheck=None, deadline=None) -> str:
+    """Tenta obter conteúdo com um GET simples. Levanta exceção se falhar.
+
+    Reaproveita a resposta da pré-checagem quando ela trouxe o HTML (200).
+    """
+    if precheck is not None:
+        if precheck.error is not None:
+            raise precheck.error
+        if _precheck_html(precheck):
+            return _validate_html(precheck.response.text, url)
+    return _validate_html(fetch_static(url, timeout=_time_left(deadline, 15)).text, url)
+
+
+class HedgeLost(Exception):
+    """O Jina do hedging deu conteúdo antes e a página foi abandonada."""
+
+
+def _process_site_playwright(page, url: str, cancelled=None, deadline=None) -> str:
+    """Tenta obter conteúdo via Playwright. Levanta exceção se falhar.
+
+    ``cancelled`` é checado entre as etapas (o ``page.goto`` em andamento não
+    tem como ser interrompido de outra thread no Playwright síncrono).
+    """
+    if page is None:
+        raise RuntimeError("navegador indisponivel")
+    start = time.monotonic()
+    load_page(page, url, cancelled, deadline)
+    if cancelled is not None and cancelled():
+        raise HedgeLost("Jina respondeu primeiro")
+    if MONITOR_EXTRACT_IN_PAGE:
+        size, content = extract_in_page(page, url)
+        _validate_size(size)
+        content = _validate_content(content)
+    else:
+        content = _validate_html(page.content(), url)
+    _remember_timing(url, "playwright", time.monotonic() - start)
+    return content
+
+
+def _process_site_jina(url: str, deadline=None) -> str:
     """Obtém conteúdo via Jina Reader. Levanta exceção se falhar."""
-    content = fetch_via_jina(url)
+    content = fetch_via_jina(url, deadline=deadline)
     if not content or len(content) < 50:
         raise ValueError(f"Jina: conteudo invalido ({len(content)} chars)")
     return content
 
 
-def run_monitor(sites: list) -> list:
+def _uses_jina_only(url: str) -> bool:
+    return url in JINA_ONLY_SITES or any(kw in url.lower() for kw in JINA_KEYWORDS)
+
+
+def plan_tiers(url: str) -> list:
+    """Tiers a tentar para a URL, começando pelo que funcionou da última vez."""
+    if _uses_jina_only(url):
+        # Usa Jina Reader diretamente para sites problemáticos
+        return ["jina"]
+    try:
+        return get_store().plan(url)
+    except Exception as e:
+        logging.warning(f"Memoria do monitor indisponivel: {e}")
+        return list(TIERS)
+
+
+def _remember_strategy(url: str, planned: list, tier, failed: list, duration: float):
+    try:
+        get_store().record(url, planned, tier, failed, duration)
+    except Exception as e:
+        logging.warning(f"Falha ao gravar memoria do monitor: {e}")
+
+
+def _remember_timing(url: str, tier: str, seconds: float):
+    try:
+        get_store().add_timing(url, tier, seconds)
+    except Exception as e:
+        logging.warning(f"Falha ao gravar tempo do monitor: {e}")
+
+
+def _fetch_by_tiers(url: str, tiers: list, pages, failed: list, precheck=None, hedge=None, deadline=None):
+    """Percorre os tiers até um dar conteúdo válido. Retorna (conteúdo, tier).
+
+    Com ``hedge`` (dict), Playwright e Jina viram um passo só (``_fetch_hedged``)
+    e o dict recebe o relatório do hedging. Tiers que não cabem mais no
+    ``deadline`` são pulados; se nenhum tier chegou a dar certo por falta de
+    tempo, levanta ``DeadlineExceeded``.
     """
-    Processa cada site e retorna lista com resultado por URL.
+    name = site_name(url)
+    remaining = list(tiers)
+    while remaining:
+        tier = remaining.pop(0)
+        # o estático com o HTML já trazido pela pré-checagem não custa nada
+        minimum = 0 if tier == "static" and _precheck_html(precheck) else DEADLINE_MIN_TIER_SECONDS[tier]
+        if _time_left(deadline, minimum) < minimum:
+            logging.warning(f"Sem tempo para o tier {tier} em {name}, pulando")
+            if not remaining:
+                raise DeadlineExceeded(f"prazo esgotado antes do tier {tier}")
+            continue
+        try:
+            if tier == "static":
+                content = _process_site_static(url, precheck, deadline)
+            elif tier == "playwright" and hedge is not None and "jina" in remaining:
+                # o passo combinado registra as próprias falhas em ``failed``
+                remaining.remove("jina")
+                tier = None
+                content, tier = _fetch_hedged(url, pages, failed, hedge, deadline)
+            elif tier == "playwright":
+                content = _render(pages, url, deadline=deadline)
+            else:
+                content = _process_site_jina(url, deadline)
+            logging.info(f"OK {name} via {tier} ({len(content)} chars)")
+            return content, tier
+        except Exception as tier_err:
+            if tier is not None:
+                failed.append(tier)
+            if not remaining:
+                raise
+            logging.warning(f"Tier {tier} falhou para {name}, tentando {remaining[0]}: {tier_err}")
+
+
+# Depois de quanto tempo (s) a pré-checagem deixa de confiar nos validadores
+# e força uma verificação completa (o 304 do HTML não cobre conteúdo via XHR)
+MONITOR_PRECHECK_MAX_AGE = int(os.getenv("MONITOR_PRECHECK_MAX_AGE", str(6 * 3600)))
+
+
+class _Precheck:
+    def __init__(self, response=None, error=None):
+        self.response = response
+        self.error = error
+
+
+# Abaixo disso (s) a pré-checagem é pulada para não gastar o que resta do prazo
+MONITOR_PRECHECK_MIN_SECONDS = 1
+
+
+def _precheck(url: str, tiers: list, validators, deadline=None):
+    """GET condicional antes de renderizar. None quando não se aplica."""
+    if validators is None and "static" not in tiers:
+        return None
+    timeout = _time_left(deadline, 15)
+    if timeout < MONITOR_PRECHECK_MIN_SECONDS:
+        return None
+    try:
+        return _Precheck(response=fetch_static(url, timeout=timeout, validators=validators))
+    except Exception as e:
+        return _Precheck(error=e)
 
-    Retorna:
-    [
-      {"url": "https://...", "name": "SITE", "hash": "abc123", "ok": True,  "error": None},
-    ]
 
-    O n8n compara o hash com o salvo no Supabase e decide se houve mudança.
+def _unchanged(validators, precheck) -> str:
+    """Motivo pelo qual a origem não mudou ("not_modified"/"same_body") ou None."""
+    if validators is None or precheck is None or precheck.error is not None:
+        return None
+    if time.time() - validators["checked_at"] > MONITOR_PRECHECK_MAX_AGE:
+        return None
+    if precheck.response.status_code == 304:
+        return "not_modified"
+    if validators["body_hash"] and calculate_hash(precheck.response.text) == validators["body_hash"]:
+        return "same_body"
+    return None
+
+
+def _load_validators(url: str):
+    try:
+        return get_store().validators(url)
+    except Exception as e:
+        logging.warning(f"Memoria do monitor indisponivel: {e}")
+        return None
+
+
+def _save_validators(url: str, validators, precheck, result: dict):
+    try:
+        if not result["ok"]:
+            get_store().forget_validators(url)
+        elif precheck is not None and precheck.error is None:
+            response = precheck.response
+            if response.status_code == 304:
+                etag, last_modified, body_hash = validators["etag"], validators["last_modified"], validators["body_hash"]
+            else:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                body_hash = calculate_hash(response.text)
+            get_store().save_validators(url, etag, last_modified, body_hash, result)
+    except Exception as e:
+        logging.warning(f"Falha ao gravar validadores do monitor: {e}")
+
+
+def _check_site(url: str, tiers: list, pages=None, hedge: bool = False, deadline=None) -> dict:
+    """Verifica um site e devolve o dict de resultado (nunca levanta exceção).
+
+    Tenta ``tiers`` em ordem (GET estático, Playwright, Jina) e grava na
+    memória do monitor qual funcionou. ``pages`` é a página do Playwright da
+    faixa (``_LanePage``) ou None quando o site não passa pelo navegador.
+    ``hedge`` liga o Jina em paralelo quando o Playwright demora.
+    ``deadline`` (time.monotonic()) é o prazo do site: o que não couber nele
+    volta com ``skipped_deadline``.
     """
-    results = []
+    name = site_name(url)
+    logging.info(f"Verificando {name}: {url} (tiers: {', '.join(tiers)})")
+
+    start = time.monotonic()
+    validators = _load_validators(url)
+    precheck = _precheck(url, tiers, validators, deadline)
+    reason = _unchanged(validators, precheck)
+    if reason:
+        # A origem diz que nada mudou: devolve o último resultado sem renderizar
+        metrics.inc("monitor_precheck_total", outcome=reason)
+        logging.info(f"OK {name} sem mudancas na origem ({reason}), usando hash anterior")
+        result = {**validators["result"], "cached": True, "hedge": None, "skipped_deadline": False}
+        content = None
+    else:
+        if precheck is not None:
+            metrics.inc("monitor_precheck_total", outcome="error" if precheck.error is not None else "changed")
+        result, content = _check_site_tiers(url, name, tiers, pages, precheck, hedge, deadline)
+        if not result["skipped_deadline"]:
+            # falta de tempo não diz nada sobre o site: mantém os validadores
+            _save_validators(url, validators, precheck, result)
+
+    result.update(_record_history(url, result, content, time.monotonic() - start))
+    return result
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, LOCAL_TZ).isoformat(timespec="seconds") if ts is not None else None
+
+
+def _record_history(url: str, result: dict, content, duration: float) -> dict:
+    """Grava o snapshot no histórico e diz se o hash mudou desde a última verificação."""
+    try:
+        store = get_store()
+        if result["ok"]:
+            items = None
+            if content is not None:
+                items = content.split('|') if needs_selective_extract(url) else content.split('\n')
+            change = store.add_snapshot(url, result["hash"], items, result["tier"], duration, result["cached"])
+        else:
+            head = store.head(url)
+            change = {
+                "changed": False,
+                "previous_hash": head["hash"] if head else None,
+                "last_changed_at": head["last_changed_at"] if head else None,
+            }
+    except Exception as e:
+        logging.warning(f"Falha ao gravar historico do monitor: {e}")
+        change = {"changed": None, "previous_hash": None, "last_changed_at": None}
+
+    if change["changed"]:
+        logging.info(f"Mudanca detectada em {site_name(url)}")
+    change["last_changed_at"] = _iso(change["last_changed_at"])
+    return change
 
-    with sync_playwright() as playwright:
-        browser, context = create_context(playwright)
 
+def _check_site_tiers(url: str, name: str, tiers: list, pages, precheck, hedge: bool = False,
+                      deadline=None) -> tuple:
+    """Verificação completa pelos tiers. Retorna (resultado, conteúdo extraído ou None)."""
+    report = {} if hedge else None
+    skipped = False
+    try:
+        start = time.monotonic()
+        failed, tier = [], None
+        try:
+            content, tier = _fetch_by_tiers(url, tiers, pages, failed, precheck, report, deadline)
+        except DeadlineExceeded:
+            skipped = True
+            raise
+        finally:
+            if not skipped:
+                _remember_strategy(url, tiers, tier, failed, time.monotonic() - start)
+
+        # Extração seletiva para sites dinâmicos (ex: Alboom via Jina)
+        if needs_selective_extract(url):
+            raw_len = len(content)
+            content = extract_meaningful(content, url)
+            items = content.split('|') if content else []
+            logging.info(
+                f"Seletivo {name}: {raw_len} -> {len(content)} chars, "
+                f"{len(items)} itens"
+            )
+
+        return {
+            "url":   url,
+            "name":  name,
+            "hash":  calculate_hash(content),
+            "ok":    True,
+            "error": None,
+            # Debug: mostra o que foi extraído (truncado para 500 chars)
+            "preview": (content[:500] + "...") if len(content) > 500 else content,
+            "items":  len(content.split('|')) if content else 0,
+            "tier":  tier,
+            "cached": False,
+            "hedge": report or None,
+            "skipped_deadline": False,
+        }, content
+
+    except Exception as e:
+        logging.error(f"Erro em {name}: {e}")
+        return _failed_result(url, name, e, report, skipped), None
+
+
+def _failed_result(url: str, name: str, error, report=None, skipped: bool = False) -> dict:
+    return {
+        "url":    url,
+        "name":   name,
+        "hash":   None,
+        "ok":     False,
+        "error":  "skipped_deadline" if skipped else str(error),
+        "preview": "",
+        "items":  0,
+        "tier":   None,
+        "cached": False,
+        "hedge":  report or None,
+        "skipped_deadline": skipped,
+    }
+
+
+def _skipped_site(url: str) -> dict:
+    """Resultado de um site que nem começou: o prazo acabou antes do token do host."""
+    name = site_name(url)
+    logging.warning(f"Sem tempo para verificar {name}, pulando")
+    result = _failed_result(url, name, None, skipped=True)
+    result.update(_record_history(url, result, None, 0.0))
+    return result
+
+
+# Páginas renderizando ao mesmo tempo (padrão e teto do "concurrency" do body)
+MONITOR_CONCURRENCY = int(os.getenv("MONITOR_CONCURRENCY", "4"))
+MONITOR_MAX_CONCURRENCY = int(os.getenv("MONITOR_MAX_CONCURRENCY", "8"))
+
+# Executores persistentes: cada thread mantém a própria conexão CDP com o
+# Chromium compartilhado (o Playwright síncrono não troca de thread)
+_browser_executor = ThreadPoolExecutor(max_workers=MONITOR_MAX_CONCURRENCY, thread_name_prefix="monitor-page")
+_jina_executor = ThreadPoolExecutor(max_workers=MONITOR_MAX_CONCURRENCY, thread_name_prefix="monitor-jina")
+
+
+# -- hedging Playwright x Jina ----------------------------------------------
+#
+# Em sites onde o Playwright costuma demorar, esperar ele falhar para só então
+# chamar o Jina soma as duas latências. Com o hedging ligado, se o Playwright
+# não der conteúdo válido em ``_hedge_delay`` segundos (percentil dos tempos
+# do Playwright no site), o Jina começa em paralelo e vale o que chegar
+# primeiro. A página é largada na próxima checagem; a requisição do Jina já
+# enviada não tem como ser abortada, só tem o resultado descartado.
+
+MONITOR_HEDGE = os.getenv("MONITOR_HEDGE", "0") == "1"
+MONITOR_HEDGE_PERCENTILE = float(os.getenv("MONITOR_HEDGE_PERCENTILE", "90"))
+# Atraso usado enquanto o site não tem medições suficientes (s)
+MONITOR_HEDGE_DELAY = float(os.getenv("MONITOR_HEDGE_DELAY", "15"))
+MONITOR_HEDGE_MIN_DELAY = float(os.getenv("MONITOR_HEDGE_MIN_DELAY", "2"))
+HEDGE_MIN_SAMPLES = 5
+
+# Uma thread por página no máximo: cada uma espera o atraso e talvez chame o Jina
+_hedge_executor = ThreadPoolExecutor(max_workers=MONITOR_MAX_CONCURRENCY, thread_name_prefix="monitor-hedge")
+
+
+def _hedge_delay(url: str) -> float:
+    try:
+        samples = sorted(get_store().timings(url, "playwright"))
+    except Exception as e:
+        logging.warning(f"Memoria do monitor indisponivel: {e}")
+        samples = []
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return MONITOR_HEDGE_DELAY
+    rank = max(0, math.ceil(MONITOR_HEDGE_PERCENTILE / 100 * len(samples)) - 1)
+    return max(MONITOR_HEDGE_MIN_DELAY, samples[rank])
+
+
+class _Hedge:
+    """Jina de reserva: dispara depois de ``delay`` segundos se o Playwright não tiver terminado."""
+
+    def __init__(self, url: str, delay: float, deadline=None):
+        self.url = url
+        self.deadline = deadline
+        self.playwright_done = threading.Event()
+        self.won = threading.Event()
+        self.started_at = self.won_at = None
+        self.content = self.error = None
+        self.future = _hedge_executor.submit(self._run, delay)
+
+    def _run(self, delay: float):
+        if self.playwright_done.wait(delay):
+            return
+        if _time_left(self.deadline, DEADLINE_MIN_TIER_SECONDS["jina"]) < DEADLINE_MIN_TIER_SECONDS["jina"]:
+            return
+        self.started_at = time.monotonic()
+        logging.info(f"Hedge {site_name(self.url)}: Playwright passou de {delay:.1f}s, disparando Jina")
+        try:
+            self.content = _process_site_jina(self.url, self.deadline)
+            self.won_at = time.monotonic()
+            self.won.set()
+        except Exception as e:
+            self.error = e
+
+
+def _fetch_hedged(url: str, pages, failed: list, report: dict, deadline=None):
+    """Playwright com o Jina de reserva. Retorna (conteúdo, tier) e preenche ``report``.
+
+    ``report``: ``delay`` (s), ``started`` (o Jina chegou a ser chamado),
+    ``winner`` e ``cost_seconds`` (tempo gasto pelo perdedor, o custo do hedging).
+    """
+    name = site_name(url)
+    delay = _hedge_delay(url)
+    hedge = _Hedge(url, delay, deadline)
+    start = time.monotonic()
+    content = error = None
+    try:
+        content = _render(pages, url, cancelled=hedge.won.is_set, deadline=deadline)
+    except Exception as e:
+        error = e
+    finally:
+        hedge.playwright_done.set()
+    end = time.monotonic()
+
+    winner, cost = None, 0.0
+    try:
+        if content is not None and not (hedge.won.is_set() and hedge.won_at <= end):
+            winner = "playwright"
+            cost = end - hedge.started_at if hedge.started_at is not None else 0.0
+        elif hedge.won.is_set() and (content is not None or isinstance(error, HedgeLost)):
+            # Jina chegou primeiro: o tempo do Playwright foi o custo do hedging
+            winner, content, cost = "jina", hedge.content, end - start
+        else:
+            # Playwright falhou de verdade: o Jina é o fallback normal (já em voo ou agora)
+            failed.append("playwright")
+            hedge.future.result()
+            if hedge.started_at is not None:
+                if not hedge.won.is_set():
+                    failed.append("jina")
+                    raise hedge.error
+                content = hedge.content
+            else:
+                if _time_left(deadline, DEADLINE_MIN_TIER_SECONDS["jina"]) < DEADLINE_MIN_TIER_SECONDS["jina"]:
+                    raise DeadlineExceeded("prazo esgotado antes do tier jina")
+                logging.warning(f"Tier playwright falhou para {name}, tentando jina: {error}")
+                try:
+                    content = _process_site_jina(url, deadline)
+                except Exception:
+                    failed.append("jina")
+                    raise
+            winner = "jina"
+        return content, winner
+    finally:
+        started = hedge.started_at is not None
+        report.update(delay=round(delay, 2), started=started, winner=winner, cost_seconds=round(cost, 2))
+        metrics.inc("monitor_hedge_total", outcome=(winner or "failed") if started else "not_started")
+        if started:
+            metrics.observe("monitor_hedge_cost_seconds", cost)
+            logging.info(f"Hedge {name}: venceu {winner or 'ninguem'} (atraso {delay:.1f}s, custo {cost:.1f}s)")
+
+
+# -- página da faixa do navegador -------------------------------------------
+#
+# Cada faixa reaproveita a mesma página entre sites, mas troca o contexto
+# (página nova, sem listeners, caches e service workers acumulados) a cada
+# MONITOR_PAGE_MAX_SITES sites ou quando o heap JS do renderer passa de
+# MONITOR_PAGE_MAX_HEAP_MB. Se a página ou o Chromium cair no meio de um site,
+# o contexto é reaberto (o pool relança o navegador se preciso) e o site é
+# tentado de novo uma vez, em vez de todos os seguintes falharem juntos.
+
+MONITOR_PAGE_MAX_SITES = int(os.getenv("MONITOR_PAGE_MAX_SITES", "25"))
+MONITOR_PAGE_MAX_HEAP_MB = int(os.getenv("MONITOR_PAGE_MAX_HEAP_MB", "512"))
+
+_HEAP_JS = "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+
+
+class _LanePage:
+    """Página do Playwright de uma faixa, aberta sob demanda e trocada quando envelhece ou quebra."""
+
+    def __init__(self):
+        self.page = None
+        self.broken = False
+        self._stack = None
+        self._sites = 0
+        self._crashed = False
+
+    def get(self):
+        if self.page is None and not self.broken:
+            stack = ExitStack()
+            try:
+                self.page = stack.enter_context(create_context()).new_page()
+            except Exception as e:
+                # Sem navegador: os sites seguem pelos outros tiers
+                stack.close()
+                self.broken = True
+                logging.error(f"Falha no navegador do monitor: {e}")
+                return None
+            self._stack, self._sites, self._crashed = stack, 0, False
+            self.page.on("crash", self._on_crash)
+        return self.page
+
+    def _on_crash(self, *_):
+        self._crashed = True
+
+    def healthy(self) -> bool:
+        if self.page is None:
+            return True
         try:
-            page = context.new_page()
+            browser = self.page.context.browser
+            return (not self._crashed and not self.page.is_closed()
+                    and (browser is None or browser.is_connected()))
+        except Exception:
+            return False
+
+    def rotate(self, reason: str):
+        """Fecha o contexto atual; o próximo ``get`` abre um novo."""
+        if self._stack is not None:
+            logging.info(f"Trocando pagina do monitor apos {self._sites} sites ({reason})")
+            metrics.inc("monitor_page_rotations_total", reason=reason)
+            try:
+                self._stack.close()
+            except Exception as e:
+                logging.debug(f"Falha ao fechar contexto do monitor: {e}")
+        self.page, self._stack = None, None
+
+    def run(self, fn, deadline=None):
+        """Executa ``fn(page)``; se a página caiu no meio, reabre e tenta de novo uma vez."""
+        page = self.get()
+        try:
+            return fn(page)
+        except Exception as e:
+            if page is None or self.healthy():
+                raise
+            if _time_left(deadline, DEADLINE_MIN_TIER_SECONDS["playwright"]) < DEADLINE_MIN_TIER_SECONDS["playwright"]:
+                self.rotate("crash")
+                raise
+            logging.warning(f"Pagina do monitor caiu ({e}), reabrindo e repetindo o site")
+            self.rotate("crash")
+            return fn(self.get())
+        finally:
+            self._sites += page is not None
+
+    def site_done(self):
+        """Chamado entre sites: troca a página se quebrou, envelheceu ou cresceu demais."""
+        if self.page is None:
+            return
+        if not self.healthy():
+            self.rotate("crash")
+        elif self._sites >= MONITOR_PAGE_MAX_SITES:
+            self.rotate("sites")
+        elif MONITOR_PAGE_MAX_HEAP_MB > 0:
+            try:
+                heap = self.page.evaluate(_HEAP_JS)
+            except Exception:
+                self.rotate("crash")
+                return
+            if heap > MONITOR_PAGE_MAX_HEAP_MB * 1024 * 1024:
+                self.rotate("heap")
+
+    def close(self):
+        if self._stack is not None:
+            self._stack.close()
+        self.page, self._stack = None, None
+
+
+def _render(pages, url: str, cancelled=None, deadline=None) -> str:
+    """Tier Playwright na página da faixa (com troca e nova tentativa se ela cair)."""
+    if pages is None:
+        return _process_site_playwright(None, url, cancelled, deadline)
+    return pages.run(lambda page: _process_site_playwright(page, url, cancelled, deadline), deadline)
+
+
+def _site_deadline(deadline, waiting: int, lanes: int, tiers: list):
+    """Prazo do próximo site: o tempo que resta dividido pelas rodadas que faltam.
+
+    Recalculado a cada site, então o que um site rápido economiza fica para os
+    seguintes (e um lento não come o orçamento de todos). A fatia nunca fica
+    abaixo do mínimo do primeiro tier do site (limitada ao prazo total): uma
+    fatia menor pularia o site na hora mesmo com tempo sobrando no orçamento.
+    """
+    if deadline is None:
+        return None
+    now = time.monotonic()
+    rounds = math.ceil((waiting + 1) / lanes)
+    share = max(max(0.0, deadline - now) / rounds, DEADLINE_MIN_TIER_SECONDS[tiers[0]])
+    return min(deadline, now + share)
 
-            for url in sites:
-                name = site_name(url)
-                logging.info(f"Verificando {name}: {url}")
 
+def _browser_lane(pending: PoliteQueue, finish, hedge: bool = False, deadline=None, lanes: int = 1):
+    """Processa sites da fila até ela esvaziar, abrindo a página só se algum precisar.
+
+    A fila entrega cada site já com o token do host (politeness), então não
+    há pausa entre um site e outro; o host fica ocupado até a visita acabar.
+    """
+    pages = _LanePage()
+    # uma conexão Playwright para a faixa inteira (as trocas de página reabrem só o contexto)
+    with get_browser_pool().session():
+        try:
+            while True:
+                got = pending.get(_token_deadline(deadline))
+                if got is None:
+                    return
+                (index, url, tiers), late = got
+                if late:
+                    # o host só liberaria depois do prazo: nem reserva o token
+                    finish(index, _skipped_site(url))
+                    continue
+                site_deadline = _site_deadline(deadline, pending.qsize(), lanes, tiers)
                 try:
-                    usar_jina = url in JINA_ONLY_SITES or any(
-                        kw in url.lower() for kw in JINA_KEYWORDS
-                    )
-                    if usar_jina:
-                        # Usa Jina Reader diretamente para sites problemáticos
-                        content = _process_site_jina(url)
-                        logging.info(f"OK {name} via Jina ({len(content)} chars)")
-                    else:
-                        try:
-                            content = _process_site_playwright(page, url)
-                            logging.info(f"OK {name} via Playwright ({len(content)} chars)")
-                        except Exception as pw_err:
-                            logging.warning(
-                                f"Playwright falhou para {name}, "
-                                f"tentando Jina Reader: {pw_err}"
-                            )
-                            content = _process_site_jina(url)
-                            logging.info(f"OK {name} via Jina fallback ({len(content)} chars)")
-
-                    # Extração seletiva para sites dinâmicos (ex: Alboom via Jina)
-                    if needs_selective_extract(url):
-                        raw_len = len(content)
-                        content = extract_meaningful(content, url)
-                        items = content.split('|') if content else []
-                        logging.info(
-                            f"Seletivo {name}: {raw_len} -> {len(content)} chars, "
-                            f"{len(items)} itens"
-                        )
-
-                    results.append({
-                        "url":   url,
-                        "name":  name,
-                        "hash":  calculate_hash(content),
-                        "ok":    True,
-                        "error": None,
-                        # Debug: mostra o que foi extraído (truncado para 500 chars)
-                        "preview": (content[:500] + "...") if len(content) > 500 else content,
-                        "items":  len(content.split('|')) if content else 0,
-                    })
-
-                    time.sleep(2)
-
-                except Exception as e:
-                    logging.error(f"Erro em {name}: {e}")
-                    results.append({
-                        "url":    url,
-                        "name":   name,
-                        "hash":   None,
-                        "ok":     False,
-                        "error":  str(e),
-                        "preview": "",
-                        "items":  0,
-                    })
+                    result = _check_site(url, tiers, pages, hedge, site_deadline)
+                finally:
+                    pending.release(url)
+                finish(index, result)
+                pages.site_done()
+        finally:
+            pages.close()
+
+
+def run_monitor(sites: list, on_result=None, concurrency: int = None, hedge: bool = None,
+                keep_results: bool = True, deadline_ms: int = None) -> list:
+    """
+    Processa os sites em paralelo e retorna lista com resultado por URL, na ordem de ``sites``.
+    ``on_result`` (opcional) é chamado com o dict de cada site assim que ele termina.
+    ``concurrency`` limita quantas páginas renderizam ao mesmo tempo (padrão MONITOR_CONCURRENCY).
+    ``hedge`` dispara o Jina em paralelo quando o Playwright demora (padrão MONITOR_HEDGE).
+    ``keep_results`` False não acumula a lista (quem chama consome via ``on_result``) e retorna None.
+    ``deadline_ms`` é o orçamento total da chamada: ele é repartido entre os
+    sites que faltam à medida que a fila anda, os tiers que não cabem mais
+    (Jina de reserva, espera de prontidão) são pulados e os sites sem tempo
+    voltam com ``skipped_deadline`` True. O orçamento conta a partir desta
+    chamada: a espera pelo slot da admissão (no máximo ADMISSION_QUEUE_TIMEOUT
+    nas rotas síncronas) fica de fora.
 
+    Retorna:
+    [
+      {"url": "https://...", "name": "SITE", "hash": "abc123", "ok": True,  "error": None,
+       "tier": "static" | "playwright" | "jina", "cached": False,
+       "hedge": {"delay": 12.5, "started": True, "winner": "jina", "cost_seconds": 3.1} | None,
+       "skipped_deadline": False,
+       "changed": False, "previous_hash": "...", "last_changed_at": "2024-01-01T10:00:00-03:00"},
+    ]
+
+    ``cached`` True indica que a origem respondeu 304 (ou o mesmo HTML) e o
+    hash é o da última verificação completa, sem renderizar de novo.
+
+    ``changed``/``previous_hash``/``last_changed_at`` vêm do histórico local
+    (monitor_store), então quem chama não precisa guardar os hashes.
+    """
+    concurrency = max(1, min(concurrency or MONITOR_CONCURRENCY, MONITOR_MAX_CONCURRENCY))
+    hedge = MONITOR_HEDGE if hedge is None else hedge
+    deadline = time.monotonic() + deadline_ms / 1000 if deadline_ms else None
+    results = [None] * len(sites) if keep_results else None
+    lock = threading.Lock()
+
+    def finish(index, result):
+        with lock:
+            if results is not None:
+                results[index] = result
+            if on_result:
+                on_result(result)
+
+    def check_jina(index, url, tiers):
+        # a visita ainda pode fazer o GET condicional no próprio site
+        host = host_of(url)
+        if not buckets.acquire(host, _token_deadline(deadline)):
+            finish(index, _skipped_site(url))
+            return
+        try:
+            result = _check_site(url, tiers, deadline=deadline)
         finally:
-            context.close()
-            browser.close()
+            buckets.release(host)
+        finish(index, result)
+
+    buckets = get_host_buckets()
+    pending = PoliteQueue(buckets)
+    futures = []
+    for index, url in enumerate(sites):
+        tiers = plan_tiers(url)
+        if tiers == ["jina"]:
+            # Jina não precisa de página: roda ao lado das filas do navegador
+            futures.append(_jina_executor.submit(check_jina, index, url, tiers))
+        else:
+            pending.put(url, (index, url, tiers))
+
+    lanes = min(concurrency, pending.qsize())
+    for _ in range(lanes):
+        futures.append(_browser_executor.submit(_browser_lane, pending, finish, hedge, deadline, lanes))
+
+    for future in futures:
+        future.result()
 
     return results
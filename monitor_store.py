@@ -0,0 +1,398 @@
+"""
+Memória local do monitor em SQLite.
+
+Guarda, por URL, qual tier de busca funcionou da última vez (estático,
+Playwright ou Jina), quanto tempo levou e as sequências de falhas. As próximas
+execuções começam direto pelo tier que funcionou e só re-sondam os tiers mais
+baratos de vez em quando, em vez de pagar o timeout do Playwright em todo run
+para sites que sempre caem no Jina.
+
+Também guarda os validadores HTTP (ETag, Last-Modified e hash do HTML
+estático) da última verificação completa, usados na pré-checagem condicional,
+e o histórico de hashes de cada URL (para o /run-monitor dizer se o site mudou).
+
+Os tempos de cada tier bem-sucedido ficam em ``timings``, de onde sai o atraso
+do hedging (percentil do tempo do Playwright no site).
+
+Os sites do monitoramento agendado (scheduler.py) ficam em ``schedule``, com o
+intervalo, o webhook, a próxima execução e o último resultado de cada um.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+# Dados que precisam sobreviver a um rebuild do container (volume em /app/data)
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+MONITOR_DB = os.getenv("MONITOR_DB", os.path.join(DATA_DIR, "monitor.db"))
+# A cada quantas execuções pulando tiers a cadeia completa é testada de novo
+MONITOR_REPROBE_EVERY = int(os.getenv("MONITOR_REPROBE_EVERY", "20"))
+
+TIERS = ["static", "playwright", "jina"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strategy (
+    url          TEXT PRIMARY KEY,
+    domain       TEXT NOT NULL,
+    tier         TEXT,                       -- último tier que funcionou
+    duration     REAL,                       -- segundos gastos no site na última vez
+    failures     INTEGER NOT NULL DEFAULT 0, -- execuções seguidas sem nenhum tier funcionar
+    streaks      TEXT NOT NULL DEFAULT '{}', -- falhas seguidas por tier
+    skipped_runs INTEGER NOT NULL DEFAULT 0, -- execuções desde a última sondagem completa
+    updated_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS strategy_domain ON strategy (domain, updated_at);
+
+CREATE TABLE IF NOT EXISTS validators (
+    url           TEXT PRIMARY KEY,
+    etag          TEXT,
+    last_modified TEXT,
+    body_hash     TEXT,                      -- sha256 do HTML estático
+    result        TEXT NOT NULL,             -- último resultado completo (json)
+    checked_at    REAL NOT NULL              -- quando foi a última verificação completa
+);
+
+CREATE TABLE IF NOT EXISTS history (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    url        TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    hash       TEXT NOT NULL,
+    items      TEXT,                         -- lista json; só quando o hash mudou
+    tier       TEXT,
+    duration   REAL,
+    changed    INTEGER NOT NULL,
+    cached     INTEGER NOT NULL,
+    basis      TEXT                          -- de onde saiu o hash (ver content_basis)
+);
+CREATE INDEX IF NOT EXISTS history_url_time ON history (url, checked_at);
+CREATE INDEX IF NOT EXISTS history_time ON history (checked_at);
+
+CREATE TABLE IF NOT EXISTS timings (
+    id         INTEGER PRIMARY KEY AUTOINCREMENT,
+    url        TEXT NOT NULL,
+    tier       TEXT NOT NULL,
+    seconds    REAL NOT NULL,                -- tempo até conteúdo válido
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS timings_url_tier ON timings (url, tier, id);
+
+-- último snapshot de cada URL e base do hash, para responder changed/last_changed_at
+-- sem varrer o histórico
+CREATE TABLE IF NOT EXISTS history_head (
+    url             TEXT NOT NULL,
+    basis           TEXT NOT NULL,
+    hash            TEXT NOT NULL,
+    last_changed_at REAL NOT NULL,
+    checked_at      REAL NOT NULL,
+    PRIMARY KEY (url, basis)
+);
+
+CREATE TABLE IF NOT EXISTS schedule (
+    url         TEXT PRIMARY KEY,
+    interval    REAL NOT NULL,               -- segundos entre verificações
+    webhook     TEXT,                        -- recebe um POST quando o site muda
+    next_run_at REAL NOT NULL,
+    last_run_at REAL,
+    last_result TEXT,                        -- último resultado (json)
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS schedule_next_run ON schedule (next_run_at);
+"""
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 500
+# Quantas medições por URL/tier entram no cálculo dos percentis
+TIMINGS_WINDOW = 50
+
+
+def content_basis(tier: str) -> str:
+    """De onde sai o hash: títulos/tabelas do HTML (estático e Playwright) ou o markdown do Jina.
+
+    Hashes de bases diferentes nunca são iguais, então só se compara igual com igual.
+    """
+    return "markdown" if tier == "jina" else "html"
+
+
+def domain_of(url: str) -> str:
+    return urlparse(url).netloc.lower().replace("www.", "")
+
+
+class MonitorStore:
+    def __init__(self, path: str = MONITOR_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._migrate()
+
+    def _migrate(self):
+        """Bancos de antes da coluna ``basis`` (história e cabeça por URL só)."""
+        if "basis" not in self._columns("history"):
+            self._conn.execute("ALTER TABLE history ADD COLUMN basis TEXT")
+            self._conn.execute("UPDATE history SET basis = CASE WHEN tier = 'jina' THEN 'markdown' ELSE 'html' END")
+        if "basis" not in self._columns("history_head"):
+            self._conn.execute("ALTER TABLE history_head RENAME TO history_head_old")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(
+                "INSERT INTO history_head (url, basis, hash, last_changed_at, checked_at) "
+                "SELECT h.url, COALESCE((SELECT basis FROM history WHERE url = h.url ORDER BY id DESC LIMIT 1), 'html'), "
+                "h.hash, h.last_changed_at, h.checked_at FROM history_head_old h"
+            )
+            self._conn.execute("DROP TABLE history_head_old")
+
+    def _columns(self, table: str) -> set:
+        return {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+
+    def _strategy(self, url: str):
+        row = self._conn.execute("SELECT * FROM strategy WHERE url = ?", (url,)).fetchone()
+        if row is not None:
+            return row, True
+        # URL nova: aproveita o que se aprendeu com outras páginas do domínio
+        row = self._conn.execute(
+            "SELECT * FROM strategy WHERE domain = ? AND tier IS NOT NULL ORDER BY updated_at DESC LIMIT 1",
+            (domain_of(url),),
+        ).fetchone()
+        return row, False
+
+    def plan(self, url: str) -> list:
+        """Tiers a tentar, em ordem, começando pelo que funcionou da última vez."""
+        with self._lock:
+            row, own = self._strategy(url)
+        if row is None or row["tier"] is None or row["failures"]:
+            return list(TIERS)
+        if own and row["skipped_runs"] >= MONITOR_REPROBE_EVERY:
+            return list(TIERS)
+        return TIERS[TIERS.index(row["tier"]):]
+
+    def record(self, url: str, planned: list, tier: str, failed: list, duration: float):
+        """Registra o resultado de uma verificação (``tier`` None = todos falharam)."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM strategy WHERE url = ?", (url,)).fetchone()
+            streaks = json.loads(row["streaks"]) if row is not None else {}
+            for name in failed:
+                streaks[name] = streaks.get(name, 0) + 1
+            if tier is not None:
+                streaks.pop(tier, None)
+
+            full_probe = planned[:1] == TIERS[:1]
+            skipped_runs = 0 if full_probe or row is None else row["skipped_runs"] + 1
+            failures = 0 if tier is not None else (row["failures"] + 1 if row is not None else 1)
+            learned = tier if tier is not None else (row["tier"] if row is not None else None)
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO strategy "
+                "(url, domain, tier, duration, failures, streaks, skipped_runs, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, domain_of(url), learned, duration, failures, json.dumps(streaks),
+                 skipped_runs, time.time()),
+            )
+
+    # -- validadores HTTP (pré-checagem condicional) -------------------------
+
+    def validators(self, url: str):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM validators WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        data = dict(row)
+        data["result"] = json.loads(data["result"])
+        return data
+
+    def save_validators(self, url: str, etag: str, last_modified: str, body_hash: str, result: dict):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO validators "
+                "(url, etag, last_modified, body_hash, result, checked_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, body_hash, json.dumps(result), time.time()),
+            )
+
+    def forget_validators(self, url: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM validators WHERE url = ?", (url,))
+
+    # -- tempos por tier -----------------------------------------------------
+
+    def add_timing(self, url: str, tier: str, seconds: float):
+        """Grava uma medição e descarta as que já saíram da janela (TIMINGS_WINDOW)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO timings (url, tier, seconds, checked_at) VALUES (?, ?, ?, ?)",
+                (url, tier, seconds, time.time()),
+            )
+            self._conn.execute(
+                "DELETE FROM timings WHERE url = ? AND tier = ? AND id <= ("
+                "SELECT id FROM timings WHERE url = ? AND tier = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (url, tier, url, tier, TIMINGS_WINDOW),
+            )
+
+    def timings(self, url: str, tier: str, limit: int = TIMINGS_WINDOW) -> list:
+        """Últimas ``limit`` medições (segundos) do tier na URL, da mais recente para a mais antiga."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seconds FROM timings WHERE url = ? AND tier = ? ORDER BY id DESC LIMIT ?",
+                (url, tier, limit),
+            ).fetchall()
+        return [row["seconds"] for row in rows]
+
+    # -- histórico de hashes -------------------------------------------------
+
+    def head(self, url: str):
+        """Último snapshot da URL (de qualquer base)."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM history_head WHERE url = ? ORDER BY checked_at DESC LIMIT 1", (url,),
+            ).fetchone()
+        return dict(row) if row is not None else None
+
+    def add_snapshot(self, url: str, hash: str, items: list, tier: str, duration: float, cached: bool) -> dict:
+        """Grava um snapshot e retorna ``{changed, previous_hash, last_changed_at}``.
+
+        A comparação é com o último snapshot da mesma base (``content_basis``):
+        um site que alterna entre Playwright e Jina não "muda" só por isso.
+        """
+        now = time.time()
+        basis = content_basis(tier)
+        with self._lock, self._conn:
+            head = self._conn.execute(
+                "SELECT * FROM history_head WHERE url = ? AND basis = ?", (url, basis),
+            ).fetchone()
+            previous_hash = head["hash"] if head is not None else None
+            changed = previous_hash is not None and previous_hash != hash
+            last_changed_at = now if head is None or changed else head["last_changed_at"]
+
+            self._conn.execute(
+                "INSERT INTO history (url, checked_at, hash, items, tier, duration, changed, cached, basis) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, now, hash, json.dumps(items) if hash != previous_hash and items is not None else None,
+                 tier, duration, int(changed), int(cached), basis),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO history_head (url, basis, hash, last_changed_at, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, basis, hash, last_changed_at, now),
+            )
+        return {"changed": changed, "previous_hash": previous_hash, "last_changed_at": last_changed_at}
+
+    def history(self, url: str, limit: int = HISTORY_PAGE_SIZE, before: float = None) -> list:
+        """Snapshots da URL, do mais recente para o mais antigo (paginação por ``checked_at``)."""
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        query = "SELECT * FROM history WHERE url = ?"
+        params = [url]
+        if before is not None:
+            query += " AND checked_at < ?"
+            params.append(before)
+        query += " ORDER BY checked_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        snapshots = []
+        for row in rows:
+            data = dict(row)
+            data.pop("id")
+            data["items"] = json.loads(data["items"]) if data["items"] is not None else None
+            data["changed"] = bool(data["changed"])
+            data["cached"] = bool(data["cached"])
+            snapshots.append(data)
+        return snapshots
+
+
+    def changes(self, since: float = None, limit: int = HISTORY_PAGE_SIZE) -> list:
+        """Snapshots em que o hash mudou, do mais antigo para o mais novo (cursor ``since``)."""
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM history WHERE changed = 1 AND checked_at > ? ORDER BY checked_at LIMIT ?",
+                (since or 0, limit),
+            ).fetchall()
+        changes = []
+        for row in rows:
+            data = dict(row)
+            data.pop("id")
+            data.pop("changed")
+            data["items"] = json.loads(data["items"]) if data["items"] is not None else None
+            data["cached"] = bool(data["cached"])
+            changes.append(data)
+        return changes
+
+    # -- monitoramento agendado ----------------------------------------------
+
+    def schedule(self, url: str, interval: float, webhook: str, next_run_at: float):
+        """Cadastra ou atualiza um site agendado (mantém o último resultado).
+
+        Num site já cadastrado a próxima execução só é antecipada, nunca adiada.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO schedule (url, interval, webhook, next_run_at, created_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET interval = excluded.interval, webhook = excluded.webhook, "
+                "next_run_at = MIN(next_run_at, excluded.next_run_at)",
+                (url, interval, webhook, next_run_at, time.time()),
+            )
+
+    def unschedule(self, url: str) -> bool:
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM schedule WHERE url = ?", (url,)).rowcount > 0
+
+    def scheduled(self) -> list:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM schedule ORDER BY next_run_at").fetchall()
+        return [self._schedule_row(row) for row in rows]
+
+    def claim_due(self, now: float, limit: int, lease: float) -> list:
+        """Pega os sites vencidos até ``now`` (os mais atrasados primeiro).
+
+        Na mesma transação o ``next_run_at`` deles passa para ``now + lease``,
+        então outro processo com a mesma base não pega o mesmo lote; o
+        ``finish_scheduled`` grava o próximo horário de verdade. As linhas
+        voltam com o ``next_run_at`` de antes da reserva.
+        """
+        with self._lock, self._conn:
+            # IMMEDIATE: a trava de escrita vem antes do SELECT, não no UPDATE
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT * FROM schedule WHERE next_run_at <= ? ORDER BY next_run_at LIMIT ?", (now, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE schedule SET next_run_at = ? WHERE url = ?", [(now + lease, row["url"]) for row in rows],
+            )
+        return [self._schedule_row(row) for row in rows]
+
+    def next_due(self):
+        """Instante da próxima execução agendada (None sem sites)."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(next_run_at) AS next_run_at FROM schedule").fetchone()
+        return row["next_run_at"]
+
+    def finish_scheduled(self, url: str, result: dict, next_run_at: float):
+        """Grava o resultado da execução agendada (ignora site removido no meio)."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE schedule SET last_run_at = ?, last_result = ?, next_run_at = ? WHERE url = ?",
+                (time.time(), json.dumps(result), next_run_at, url),
+            )
+
+    @staticmethod
+    def _schedule_row(row) -> dict:
+        data = dict(row)
+        data["last_result"] = json.loads(data["last_result"]) if data["last_result"] is not None else None
+        return data
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MonitorStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MonitorStore()
+        return _store
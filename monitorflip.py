@@ -5,6 +5,8 @@ import sys
 import re
 from datetime import datetime
 
+import metrics
+
 AIRLINES = {
     "LA": "LATAM",
     "G3": "Gol",
@@ -64,8 +66,9 @@ def fetch_flipmilhas(date, origin, destiny):
         },
     )
 
-    with urllib.request.urlopen(req, timeout=120) as resp:
-        body = resp.read().decode("utf-8")
+    with metrics.timer("jina_fetch_seconds", caller="monitorflip"):
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            body = resp.read().decode("utf-8")
 
     # Companhia: busca especificamente em /airlines/static/images/XX.png
     image_match = re.search(r"https?://[^)]+/airlines/static/images/[A-Z0-9]+\.[a-z]+", body, re.IGNORECASE)
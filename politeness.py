@@ -0,0 +1,244 @@
+"""
+Politeness por host para o monitor.
+
+Cada origem tem um token bucket (taxa e rajada configuráveis) e o r.jina.ai
+tem o próprio orçamento, separado dos sites. Uma visita a um site gasta um
+token do host; requisições para hosts diferentes seguem em sequência ou em
+paralelo, sem a pausa fixa de 2 s que o monitor fazia depois de cada site.
+
+Um host nunca tem duas visitas ao mesmo tempo: ele fica ocupado do token até
+o fim da visita (``release``), e o intervalo até a próxima conta a partir daí.
+O padrão (1 visita a cada 2 s por host, sem rajada) dá a cada origem o mesmo
+ritmo de antes: uma renderização por vez e 2 s depois de cada uma.
+"""
+import os
+import time
+import threading
+from urllib.parse import urlparse
+
+import metrics
+
+# Visitas por segundo e rajada de cada host
+HOST_RATE = float(os.getenv("MONITOR_HOST_RATE", "0.5"))
+HOST_BURST = int(os.getenv("MONITOR_HOST_BURST", "1"))
+
+# Orçamento próprio do Jina Reader (sem chave ele aceita ~20 requisições/min)
+JINA_HOST = "r.jina.ai"
+JINA_RATE = float(os.getenv("MONITOR_JINA_RATE", str(20 / 60)))
+JINA_BURST = int(os.getenv("MONITOR_JINA_BURST", "5"))
+
+
+def host_of(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+class TokenBucket:
+    """Token bucket com reserva: quem pega um token sabe quanto esperar por ele.
+
+    Os tokens podem ficar negativos, o que enfileira as reservas em ordem de
+    chegada sem ninguém precisar ficar consultando o bucket. ``rate`` <= 0
+    desliga o limite.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, now: float = None) -> float:
+        """Segundos até um token ficar livre, sem reservar."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(max(now or time.monotonic(), self._updated))
+            return max(0.0, (1 - self._tokens) / self.rate)
+
+    def reserve(self, max_delay: float = None) -> float:
+        """Reserva um token e retorna quantos segundos esperar até poder usá-lo.
+
+        Com ``max_delay``, se a espera passar disso não reserva nada e retorna None.
+        """
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            delay = max(0.0, (1 - self._tokens) / self.rate)
+            if max_delay is not None and delay > max_delay:
+                return None
+            self._tokens -= 1
+            return delay
+
+    def rearm(self):
+        """Fim da visita: o tempo que ela levou não rende token, o intervalo recomeça agora."""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, self.burst - 1)
+
+
+def _budget(host: str) -> str:
+    return "jina" if host == JINA_HOST else "site"
+
+
+def _max_delay(deadline):
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+
+class HostBuckets:
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        # hosts com visita em andamento; avisa quem espera quando um libera
+        self._busy = set()
+        self.visits = threading.Condition()
+
+    def bucket(self, host: str) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                if host == JINA_HOST:
+                    bucket = TokenBucket(JINA_RATE, JINA_BURST)
+                else:
+                    bucket = TokenBucket(HOST_RATE, HOST_BURST)
+                self._buckets[host] = bucket
+            return bucket
+
+    def wait(self, host: str, deadline: float = None) -> bool:
+        """Bloqueia até o host ter um token livre (e consome o token).
+
+        Com ``deadline`` (time.monotonic()), se o token só sair depois dele
+        retorna False na hora, sem reservar nem dormir.
+        """
+        delay = self.bucket(host).reserve(_max_delay(deadline))
+        if delay is None:
+            metrics.inc("politeness_deadline_skips_total", budget=_budget(host))
+            return False
+        self.sleep(host, delay)
+        return True
+
+    def acquire(self, host: str, deadline: float = None) -> bool:
+        """Como ``wait``, mas para uma visita: espera o host ficar livre e o deixa ocupado.
+
+        Quem recebe True chama ``release`` ao terminar. Com ``deadline``, se o
+        host seguir ocupado até o prazo ou o token só sair depois dele,
+        retorna False sem ocupar nada.
+        """
+        with self.visits:
+            while host in self._busy:
+                remaining = _max_delay(deadline)
+                if remaining == 0:
+                    metrics.inc("politeness_deadline_skips_total", budget=_budget(host))
+                    return False
+                self.visits.wait(remaining)
+            delay = self.bucket(host).reserve(_max_delay(deadline))
+            if delay is None:
+                metrics.inc("politeness_deadline_skips_total", budget=_budget(host))
+                return False
+            self._busy.add(host)
+        self.sleep(host, delay)
+        return True
+
+    def busy(self, host: str) -> bool:
+        """Host com visita em andamento (chamar com ``visits`` travado)."""
+        return host in self._busy
+
+    def occupy(self, host: str):
+        """Marca a visita como iniciada (chamar com ``visits`` travado)."""
+        self._busy.add(host)
+
+    def release(self, host: str):
+        """Fim da visita ao host: libera para a próxima, a um intervalo a partir de agora."""
+        with self.visits:
+            self._busy.discard(host)
+            self.bucket(host).rearm()
+            self.visits.notify_all()
+
+    def sleep(self, host: str, delay: float):
+        metrics.observe("politeness_wait_seconds", delay, budget=_budget(host))
+        if delay:
+            time.sleep(delay)
+
+
+class PoliteQueue:
+    """Fila de visitas que entrega primeiro a que tem o host livre mais cedo.
+
+    Em vez de esperar a vez do host do próximo item da fila enquanto sites de
+    outros hosts estão prontos, ``get`` escolhe o item de menor espera (na
+    ordem de chegada em caso de empate), reserva o token e dorme só o que falta.
+    Hosts com visita em andamento (desta fila ou de outra) ficam de fora até
+    o ``release``.
+    """
+
+    def __init__(self, buckets: HostBuckets):
+        self._buckets = buckets
+        self._items = []
+        # a mesma trava dos hosts ocupados: a escolha e a ocupação são atômicas
+        self._lock = buckets.visits
+
+    def put(self, url: str, item):
+        with self._lock:
+            self._items.append((host_of(url), item))
+
+    def qsize(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def get(self, deadline: float = None):
+        """Próximo ``(item, late)``, já com o token do host; None quando a fila acabou.
+
+        O host do item fica ocupado até ``release(url)``. Com ``deadline``
+        (time.monotonic()), um item cujo host só libera depois do prazo sai na
+        hora com ``late`` True, sem reservar token nem ocupar o host.
+        """
+        with self._lock:
+            while True:
+                if not self._items:
+                    return None
+                # o mesmo "agora" para todos, senão o empate sai da ordem de chegada
+                now = time.monotonic()
+                free = [(self._buckets.bucket(host).delay(now), index)
+                        for index, (host, _) in enumerate(self._items) if not self._buckets.busy(host)]
+                if free:
+                    host, item = self._items.pop(min(free)[1])
+                    delay = self._buckets.bucket(host).reserve(_max_delay(deadline))
+                    if delay is not None:
+                        self._buckets.occupy(host)
+                    break
+                # todos os hosts da fila estão com visita em andamento
+                remaining = _max_delay(deadline)
+                if remaining == 0:
+                    host, item = self._items.pop(0)
+                    delay = None
+                    break
+                self._lock.wait(remaining)
+        if delay is None:
+            metrics.inc("politeness_deadline_skips_total", budget=_budget(host))
+            return item, True
+        self._buckets.sleep(host, delay)
+        return item, False
+
+    def release(self, url: str):
+        """Fim da visita de um item entregue por ``get`` (sem ``late``)."""
+        self._buckets.release(host_of(url))
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_host_buckets() -> HostBuckets:
+    global _buckets
+    with _buckets_lock:
+        if _buckets is None:
+            _buckets = HostBuckets()
+        return _buckets
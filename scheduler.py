@@ -0,0 +1,144 @@
+"""
+Monitoramento agendado dentro do serviço.
+
+Em vez do n8n chamar o /run-monitor num cron com a lista inteira, os sites
+são cadastrados com um intervalo próprio (``POST /monitor/schedule``) e ficam
+na memória do monitor (tabela ``schedule``). Uma thread de fundo pega os
+sites vencidos em lotes pequenos e roda o ``run_monitor`` com eles, no mesmo
+Chromium compartilhado; o histórico fica no monitor_store (``/monitor/changes``
+e ``/monitor/history``) e, quando um site muda, o webhook dele recebe o
+resultado.
+
+O jitter espalha as execuções: a primeira cai num ponto aleatório do início
+do intervalo e cada próxima varia ±MONITOR_SCHEDULE_JITTER do intervalo, então
+os sites não vencem todos juntos e a CPU/memória não sobem em picos.
+"""
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from monitor import run_monitor, MONITOR_CONCURRENCY
+from monitor_store import get_store
+from jobs import post_with_retries
+
+# Liga a thread do agendador (o cadastro pela API funciona de qualquer jeito)
+MONITOR_SCHEDULER = os.getenv("MONITOR_SCHEDULER", "1") == "1"
+# Menor intervalo aceito no cadastro (s)
+MONITOR_SCHEDULE_MIN_INTERVAL = int(os.getenv("MONITOR_SCHEDULE_MIN_INTERVAL", "300"))
+# Variação aleatória de cada próximo agendamento, em fração do intervalo
+MONITOR_SCHEDULE_JITTER = float(os.getenv("MONITOR_SCHEDULE_JITTER", "0.1"))
+# Janela (s) em que caem as primeiras execuções de sites recém-cadastrados
+MONITOR_SCHEDULE_SPREAD = int(os.getenv("MONITOR_SCHEDULE_SPREAD", "300"))
+# Sites por execução do run_monitor (uma rodada das faixas do navegador)
+MONITOR_SCHEDULE_BATCH = int(os.getenv("MONITOR_SCHEDULE_BATCH", str(MONITOR_CONCURRENCY)))
+# Por quanto tempo (s) um lote pego fica reservado: outro worker não pega os
+# mesmos sites e, se este cair no meio, eles voltam a vencer depois disso
+MONITOR_SCHEDULE_LEASE = int(os.getenv("MONITOR_SCHEDULE_LEASE", "600"))
+# Maior intervalo (s) entre duas consultas à tabela quando não há nada vencido
+MONITOR_SCHEDULE_IDLE = 60
+
+
+def _next_run(interval: float) -> float:
+    return time.time() + interval * random.uniform(1 - MONITOR_SCHEDULE_JITTER, 1 + MONITOR_SCHEDULE_JITTER)
+
+
+class MonitorScheduler:
+    def __init__(self):
+        self.admission = None
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._webhooks = ThreadPoolExecutor(max_workers=2, thread_name_prefix="monitor-webhook")
+
+    def start(self, admission=None):
+        """Sobe a thread do agendador (uma vez por processo).
+
+        Com ``admission`` cada lote ocupa um slot do kind monitor, dividindo o
+        navegador com o /run-monitor em vez de competir com ele (as requisições
+        têm prioridade na fila).
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.admission = admission
+            self._thread = threading.Thread(target=self._loop, name="monitor-scheduler", daemon=True)
+            self._thread.start()
+        logging.info("Agendador do monitor iniciado")
+
+    def register(self, sites: list, interval: int, webhook: str = None) -> list:
+        """Cadastra (ou atualiza) os sites com o intervalo e o webhook dados."""
+        store = get_store()
+        spread = min(interval, MONITOR_SCHEDULE_SPREAD)
+        for url in sites:
+            store.schedule(url, interval, webhook, time.time() + random.uniform(0, spread))
+        self._wake.set()
+        return [entry for entry in store.scheduled() if entry["url"] in set(sites)]
+
+    def unregister(self, url: str) -> bool:
+        return get_store().unschedule(url)
+
+    def _loop(self):
+        while True:
+            # limpa antes de consultar: um cadastro durante o lote acorda a próxima espera
+            self._wake.clear()
+            try:
+                wait = self._run_due()
+            except Exception:
+                logging.exception("Falha no agendador do monitor")
+                wait = MONITOR_SCHEDULE_IDLE
+            if wait > 0:
+                self._wake.wait(wait)
+
+    def _run_due(self) -> float:
+        """Roda um lote de sites vencidos. Retorna quanto esperar até o próximo."""
+        store = get_store()
+        now = time.time()
+        due = store.claim_due(now, MONITOR_SCHEDULE_BATCH, MONITOR_SCHEDULE_LEASE)
+        if not due:
+            next_run_at = store.next_due()
+            return MONITOR_SCHEDULE_IDLE if next_run_at is None else min(MONITOR_SCHEDULE_IDLE, next_run_at - now)
+
+        entries = {entry["url"]: entry for entry in due}
+        for entry in due:
+            metrics.observe("monitor_schedule_lag_seconds", now - entry["next_run_at"])
+
+        def on_result(result):
+            entry = entries[result["url"]]
+            store.finish_scheduled(result["url"], result, _next_run(entry["interval"]))
+            metrics.inc("monitor_schedule_runs_total", outcome="ok" if result["ok"] else "failed")
+            if result.get("changed") and entry["webhook"]:
+                self._webhooks.submit(self._notify, entry["webhook"], result)
+
+        logging.info(f"Agendador: verificando {len(due)} site(s) vencido(s)")
+        if self.admission is None:
+            run_monitor(list(entries), on_result=on_result, keep_results=False)
+        else:
+            # de fundo: quem chama o /run-monitor passa na frente; o slot é
+            # devolvido a cada lote, então uma requisição espera no máximo um lote
+            with self.admission.slot("monitor", background=True):
+                run_monitor(list(entries), on_result=on_result, keep_results=False)
+        return 0
+
+    def _notify(self, webhook: str, result: dict):
+        """POST do resultado no webhook do site (mesmas tentativas do callback dos jobs)."""
+        body = {"event": "changed", "url": result["url"], "result": result}
+        outcome = post_with_retries(webhook, body)
+        metrics.inc("monitor_schedule_webhooks_total", outcome="ok" if outcome["ok"] else "failed")
+        if not outcome["ok"]:
+            logging.warning(f"Webhook do monitor falhou para {result['url']}: {outcome}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> MonitorScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = MonitorScheduler()
+        return _scheduler
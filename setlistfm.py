@@ -1,17 +1,76 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 from bs4 import BeautifulSoup
+import lxml.html
 import pandas as pd
+import requests
 import time
+import math
 import re
 import json
 import base64
 import os
+import sys
 from io import BytesIO
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from browser_pool import get_browser_pool
+from setlistfm_store import get_show_store, show_key
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Coleta direta por HTTP: as páginas do attended são endereçáveis (?page=N),
+# então a página 1 dá o total e as demais são baixadas em paralelo. O
+# Playwright (clicando em "próxima") só entra se o HTTP for bloqueado.
+SETLISTFM_HTTP = os.getenv("SETLISTFM_HTTP", "1") == "1"
+SETLISTFM_HTTP_WORKERS = int(os.getenv("SETLISTFM_HTTP_WORKERS", "4"))
+SETLISTFM_HTTP_TIMEOUT = 20
+# Tentativas por página antes de desistir do HTTP (espera 2, 4, ... s entre elas)
+SETLISTFM_HTTP_RETRIES = int(os.getenv("SETLISTFM_HTTP_RETRIES", "3"))
+SETLISTFM_MAX_PAGES = int(os.getenv("SETLISTFM_MAX_PAGES", "200"))
+
+MONTHS = {
+    'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04',
+    'May': '05', 'Jun': '06', 'Jul': '07', 'Aug': '08',
+    'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'
+}
+
+# Sessão com pool de conexões do tamanho do paralelismo (keep-alive entre páginas)
+_http = requests.Session()
+_http.headers.update({
+    'User-Agent': USER_AGENT,
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+})
+_http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=SETLISTFM_HTTP_WORKERS))
+
+
+class HttpBlocked(Exception):
+    """O setlist.fm recusou ou não serviu a listagem por HTTP (vai para o Playwright)."""
+
+
+def _has_class(name):
+    """Predicado XPath equivalente ao ``class_=`` do BeautifulSoup."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _first(elements):
+    return elements[0] if elements else None
+
+
+_SETLIST_ITEMS = f"//li[{_has_class('setlist')}]"
+_PAGE_LINK = re.compile(r'[?&]page=(\d+)')
+
 
 class SetlistFMScraperPlaywright:
     def __init__(self, username, headless=True):
         self.username = username
         self.all_shows = []
+        self.collect_method = 'HTTP'
+        self.known = set()      # chaves dos shows já guardados (coleta incremental)
+        self.reached_end = False  # a coleta chegou de fato à última página do attended
+        self.new_count = 0
         self.browser = None
         self.page = None
         self.headless = headless
@@ -50,25 +109,12 @@ class SetlistFMScraperPlaywright:
 
     def setup_driver(self):
         try:
-            self._playwright = sync_playwright().start()
-            
-            self.browser = self._playwright.chromium.launch(
-                headless=self.headless,
-                executable_path=os.environ.get("CHROME_BIN", "/usr/bin/chromium"),
-                args=[
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-software-rasterizer',
-                    '--disable-extensions',
-                    '--window-size=1920,1080',
-                ]
-            )
-            
-            context = self.browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            # Contexto isolado no Chromium compartilhado do processo (browser_pool)
+            self._stack = ExitStack()
+            context = self._stack.enter_context(get_browser_pool().context(
+                user_agent=USER_AGENT,
                 viewport={'width': 1920, 'height': 1080}
-            )
+            ))
             
             self.page = context.new_page()
             
@@ -95,17 +141,10 @@ class SetlistFMScraperPlaywright:
     def extract_show_data(self, show_html):
         """Extrai dados de um show individual a partir do HTML"""
         try:
-            show_data = {
-                'Data': 'N/A',
-                'Artista': 'N/A',
-                'Local': 'N/A',
-                'Festival': '',
-                'Cidade': 'N/A'
-            }
-            
             soup = BeautifulSoup(show_html, 'lxml')
             
             # Data
+            date = None
             date_block = soup.find('span', class_='smallDateBlock')
             if date_block:
                 month_elem = date_block.find('strong', class_='text-uppercase')
@@ -113,64 +152,107 @@ class SetlistFMScraperPlaywright:
                 year_elem = date_block.find('span')
                 
                 if month_elem and day_elem and year_elem:
-                    month_name = month_elem.get_text().strip()
-                    day = day_elem.get_text().strip()
-                    year = year_elem.get_text().strip()
-                    
-                    months = {
-                        'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04',
-                        'May': '05', 'Jun': '06', 'Jul': '07', 'Aug': '08',
-                        'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'
-                    }
-                    month_num = months.get(month_name, '01')
-                    show_data['Data'] = f"{day.zfill(2)}/{month_num}/{year}"
+                    date = (month_elem.get_text().strip(), day_elem.get_text().strip(), year_elem.get_text().strip())
             
             # Artista
+            artist = None
             content_div = soup.find('div', class_='column content')
             if content_div:
                 artist_strong = content_div.find('strong')
                 if artist_strong:
-                    show_data['Artista'] = artist_strong.get_text().strip()
+                    artist = artist_strong.get_text().strip()
             
             # Local e cidade
+            location_text = None
             subline = soup.find('span', class_='subline')
             if subline:
                 location_span = subline.find('span')
                 if location_span:
                     location_text = location_span.get_text().strip()
-                    show_data['Local'] = location_text
-                    
-                    # Verifica se é um festival conhecido
-                    festival_info = self.identify_festival(location_text)
-                    if festival_info:
-                        show_data['Local'] = festival_info['local']
-                        show_data['Festival'] = location_text
-                        show_data['Cidade'] = festival_info['cidade']
-                    # Se não é festival, tenta extrair da string
-                    elif ',' in location_text:
-                        location_parts = [part.strip() for part in location_text.split(',')]
-                        if len(location_parts) >= 2:
-                            show_data['Local'] = location_parts[0]
-                            show_data['Cidade'] = location_parts[1]
-                    # Identifica cidades brasileiras conhecidas
-                    else:
-                        city_lower = location_text.lower()
-                        if 'curitiba' in city_lower:
-                            show_data['Cidade'] = 'Curitiba'
-                        elif 'são paulo' in city_lower or 'sao paulo' in city_lower:
-                            show_data['Cidade'] = 'São Paulo'
-                        elif 'rio de janeiro' in city_lower or 'rio' in city_lower:
-                            show_data['Cidade'] = 'Rio de Janeiro'
-                        elif 'joinville' in city_lower:
-                            show_data['Cidade'] = 'Joinville'
-                        elif 'rio negrinho' in city_lower:
-                            show_data['Cidade'] = 'Rio Negrinho'
-            
-            return show_data
+            
+            return self.build_show(date, artist, location_text)
+            
+        except Exception as e:
+            return None
+
+    def extract_show_element(self, item):
+        """Mesmo que ``extract_show_data``, direto do ``li.setlist`` já parseado pelo lxml"""
+        try:
+            date = None
+            date_block = _first(item.xpath(f".//span[{_has_class('smallDateBlock')}]"))
+            if date_block is not None:
+                month_elem = _first(date_block.xpath(f".//strong[{_has_class('text-uppercase')}]"))
+                day_elem = _first(date_block.xpath(f".//strong[{_has_class('big')}]"))
+                year_elem = _first(date_block.xpath(".//span"))
+                
+                if month_elem is not None and day_elem is not None and year_elem is not None:
+                    date = (month_elem.text_content().strip(), day_elem.text_content().strip(),
+                            year_elem.text_content().strip())
+            
+            artist = None
+            artist_strong = _first(item.xpath(".//div[@class='column content']//strong"))
+            if artist_strong is not None:
+                artist = artist_strong.text_content().strip()
+            
+            location_text = None
+            location_span = _first(item.xpath(f".//span[{_has_class('subline')}]//span"))
+            if location_span is not None:
+                location_text = location_span.text_content().strip()
+            
+            return self.build_show(date, artist, location_text)
             
         except Exception as e:
             return None
 
+    def build_show(self, date, artist, location_text):
+        """Monta o registro do show; ``date`` é (mês em inglês, dia, ano)"""
+        show_data = {
+            'Data': 'N/A',
+            'Artista': 'N/A',
+            'Local': 'N/A',
+            'Festival': '',
+            'Cidade': 'N/A'
+        }
+        
+        if date:
+            month_name, day, year = date
+            month_num = MONTHS.get(month_name, '01')
+            show_data['Data'] = f"{day.zfill(2)}/{month_num}/{year}"
+        
+        if artist is not None:
+            show_data['Artista'] = artist
+        
+        if location_text is not None:
+            show_data['Local'] = location_text
+            
+            # Verifica se é um festival conhecido
+            festival_info = self.identify_festival(location_text)
+            if festival_info:
+                show_data['Local'] = festival_info['local']
+                show_data['Festival'] = location_text
+                show_data['Cidade'] = festival_info['cidade']
+            # Se não é festival, tenta extrair da string
+            elif ',' in location_text:
+                location_parts = [part.strip() for part in location_text.split(',')]
+                if len(location_parts) >= 2:
+                    show_data['Local'] = location_parts[0]
+                    show_data['Cidade'] = location_parts[1]
+            # Identifica cidades brasileiras conhecidas
+            else:
+                city_lower = location_text.lower()
+                if 'curitiba' in city_lower:
+                    show_data['Cidade'] = 'Curitiba'
+                elif 'são paulo' in city_lower or 'sao paulo' in city_lower:
+                    show_data['Cidade'] = 'São Paulo'
+                elif 'rio de janeiro' in city_lower or 'rio' in city_lower:
+                    show_data['Cidade'] = 'Rio de Janeiro'
+                elif 'joinville' in city_lower:
+                    show_data['Cidade'] = 'Joinville'
+                elif 'rio negrinho' in city_lower:
+                    show_data['Cidade'] = 'Rio Negrinho'
+
+        return show_data
+
     def wait_for_page_load(self):
         try:
             self.page.wait_for_selector("li.setlist", timeout=15000)
@@ -245,6 +327,7 @@ class SetlistFMScraperPlaywright:
             
             if not next_button:
                 print("📚 Botão 'próxima página' não encontrado")
+                self.reached_end = True
                 return False
             
             # Scroll até o botão
@@ -266,6 +349,168 @@ class SetlistFMScraperPlaywright:
             print(f"❌ Erro ao clicar em próxima página: {e}")
             return False
 
+    # -- coleta por HTTP ---------------------------------------------------
+
+    def attended_url(self, page_number=1):
+        url = f"https://www.setlist.fm/attended/{self.username}"
+        return url if page_number == 1 else f"{url}?page={page_number}"
+
+    def fetch_page_http(self, page_number):
+        """Baixa e parseia uma página do attended. Levanta ``HttpBlocked`` se não vier a listagem.
+
+        Erro de rede ou status diferente de 200 (um 429 no meio das conexões
+        paralelas, por exemplo) é tentado de novo com espera crescente antes
+        de desistir.
+        """
+        for attempt in range(1, SETLISTFM_HTTP_RETRIES + 1):
+            try:
+                with metrics.timer("setlistfm_page_seconds", engine="http"):
+                    response = _http.get(self.attended_url(page_number), timeout=SETLISTFM_HTTP_TIMEOUT)
+                if response.status_code == 200:
+                    break
+                error = f"HTTP {response.status_code}"
+            except requests.RequestException as e:
+                error = str(e)
+            if attempt == SETLISTFM_HTTP_RETRIES:
+                raise HttpBlocked(f"página {page_number}: {error}")
+            metrics.inc("setlistfm_page_retries_total")
+            print(f"⚠️ Página {page_number}: {error}, tentando de novo")
+            time.sleep(2 ** attempt)
+        tree = lxml.html.fromstring(response.text)
+        items = tree.xpath(_SETLIST_ITEMS)
+        if not items and page_number == 1:
+            # desafio anti-bot ou página montada só por JavaScript
+            raise HttpBlocked("página 1 sem nenhum li.setlist")
+        return tree, items
+
+    def parse_page_items(self, items):
+        """Shows attended (link para /setlist/, não /show/) de uma página já parseada"""
+        page_shows = []
+        for item in items:
+            if not any(href.startswith('../setlist/') for href in item.xpath('.//a/@href')):
+                continue
+            show_data = self.extract_show_element(item)
+            if show_data and show_data['Artista'] != 'N/A' and show_data['Data'] != 'N/A':
+                page_shows.append(show_data)
+        return page_shows
+
+    def count_pages(self, tree, items):
+        """Quantas páginas tem o attended: maior link do paginador ou total / shows por página"""
+        pages = max((int(m.group(1)) for href in tree.xpath('//a/@href') for m in [_PAGE_LINK.search(href)] if m),
+                    default=1)
+        match = re.search(r'(\d+)\s+attended', tree.text_content(), re.IGNORECASE)
+        if match and items:
+            total = int(match.group(1))
+            print(f"📊 Total de shows no perfil: {total}")
+            pages = max(pages, math.ceil(total / len(items)))
+        return min(pages, SETLISTFM_MAX_PAGES)
+
+    def scrape_all_shows_http(self):
+        """Coleta completa por HTTP: página 1 primeiro, as demais em paralelo"""
+        print(f"Iniciando coleta HTTP para usuário: {self.username}")
+        tree, items = self.fetch_page_http(1)
+        total_pages = self.count_pages(tree, items)
+        print(f"📄 {total_pages} página(s), baixando com {SETLISTFM_HTTP_WORKERS} conexões")
+
+        # Junta na ordem das páginas, sem duplicatas
+        seen = set()
+
+        def add_page(page_shows) -> int:
+            new = 0
+            for show in page_shows:
+                key = show_key(show)
+                if key not in seen:
+                    seen.add(key)
+                    self.all_shows.append(show)
+                    new += 1
+            return new
+
+        add_page(self.parse_page_items(items))
+        page_size, fetched = len(items), 1
+        with ThreadPoolExecutor(max_workers=SETLISTFM_HTTP_WORKERS) as executor:
+            while not self.reached_end:
+                for page_number, (_, page_items) in zip(
+                    range(fetched + 1, total_pages + 1),
+                    executor.map(self.fetch_page_http, range(fetched + 1, total_pages + 1)),
+                ):
+                    fetched = page_number
+                    # página curta é a última; página sem nenhum show novo também
+                    # (fora do intervalo o site pode repetir a última página)
+                    if not add_page(self.parse_page_items(page_items)) or len(page_items) < page_size:
+                        self.reached_end = True
+                        break
+                # a estimativa pode ficar curta (o total não conta os shows futuros
+                # listados junto): enquanto a última página vier cheia, busca mais
+                if self.reached_end or total_pages >= SETLISTFM_MAX_PAGES:
+                    break
+                total_pages = min(total_pages + SETLISTFM_HTTP_WORKERS, SETLISTFM_MAX_PAGES)
+
+        metrics.observe("setlistfm_pages_walked", fetched, engine="http")
+        print(f"🎉 Coleta HTTP finalizada: {len(self.all_shows)} shows em {fetched} página(s)")
+        return self.all_shows
+
+    def scrape_new_shows_http(self):
+        """Coleta incremental: páginas em ordem (mais novas primeiro) até uma sem show novo"""
+        print(f"Iniciando coleta incremental para usuário: {self.username} ({len(self.known)} shows conhecidos)")
+        page_number, page_size = 1, None
+        while page_number <= SETLISTFM_MAX_PAGES:
+            _, items = self.fetch_page_http(page_number)
+            page_size = page_size or len(items)
+            page_shows = self.parse_page_items(items)
+            new_shows = [s for s in page_shows if show_key(s) not in self.known]
+            self.all_shows.extend(new_shows)
+            print(f"📄 Página {page_number}: {len(new_shows)} show(s) novo(s) de {len(page_shows)}")
+            # página só com shows conhecidos (ou a última): o resto do histórico já está guardado
+            if (page_shows and not new_shows) or len(items) < page_size:
+                break
+            page_number += 1
+
+        metrics.observe("setlistfm_pages_walked", page_number, engine="http")
+        return self.all_shows
+
+    def scrape_all_shows(self, full=False):
+        """Coleta e junta ao histórico guardado; devolve todos os shows do perfil.
+
+        Sem ``full`` só as páginas mais recentes são percorridas (até uma sem
+        show novo); com ``full`` (ou sem nada guardado) o attended inteiro é
+        coletado e o histórico é refeito. HTTP direto; se o setlist.fm bloquear,
+        volta para o Playwright (clicando em próxima).
+        """
+        store = get_show_store()
+        self.known = set() if full else store.keys()
+        shows = self.collect_shows()
+
+        if not self.known and shows and self.reached_end:
+            # coleta completa até a última página: refaz o histórico
+            store.replace(shows)
+            self.new_count = len(shows)
+        else:
+            if not self.known:
+                # o Playwright parou antes do fim (limite, páginas vazias, clique
+                # que falhou): trocar o histórico perderia shows, então só junta
+                print("⚠️ Coleta completa não chegou à última página, juntando ao histórico")
+            self.new_count = store.add(shows)
+            print(f"✅ {self.new_count} show(s) novo(s) juntado(s) ao histórico")
+
+        self.all_shows = store.shows()
+        return self.all_shows
+
+    def collect_shows(self):
+        if SETLISTFM_HTTP:
+            try:
+                if self.known:
+                    return self.scrape_new_shows_http()
+                return self.scrape_all_shows_http()
+            except HttpBlocked as e:
+                print(f"⚠️ HTTP bloqueado ({e}), usando Playwright")
+                metrics.inc("setlistfm_http_fallback_total")
+                self.all_shows = []
+                self.reached_end = False
+        self.collect_method = 'Playwright'
+        return self.scrape_all_shows_playwright()
+
+    # -- coleta pelo Playwright (fallback) ---------------------------------
+
     def get_total_shows(self):
         try:
             page_text = self.page.content()
@@ -278,7 +523,7 @@ class SetlistFMScraperPlaywright:
         except:
             return None
 
-    def scrape_all_shows(self):
+    def scrape_all_shows_playwright(self):
         if not self.setup_driver():
             return []
         
@@ -286,10 +531,11 @@ class SetlistFMScraperPlaywright:
             print(f"Iniciando coleta para usuário: {self.username}")
             
             # Acessa a página do usuário
-            url = f"https://www.setlist.fm/attended/{self.username}"
+            url = self.attended_url()
             print(f"🌐 Acessando: {url}")
             
-            self.page.goto(url)
+            with metrics.timer("page_goto_seconds", scraper="setlistfm"):
+                self.page.goto(url)
             
             # Aguarda carregamento inicial
             print("⏳ Aguardando carregamento...")
@@ -309,11 +555,16 @@ class SetlistFMScraperPlaywright:
                 # Coleta shows da página atual
                 page_shows = self.scrape_current_page()
                 
+                if self.known and page_shows and all(show_key(s) in self.known for s in page_shows):
+                    print("📚 Página só com shows já conhecidos, fim da coleta incremental")
+                    break
+                
                 if page_shows:
                     # Verifica duplicatas
                     existing_shows = {(s['Artista'], s['Data'], s['Local'], s['Festival']) for s in self.all_shows}
                     new_shows = [s for s in page_shows 
-                               if (s['Artista'], s['Data'], s['Local'], s['Festival']) not in existing_shows]
+                               if (s['Artista'], s['Data'], s['Local'], s['Festival']) not in existing_shows
+                               and show_key(s) not in self.known]
                     
                     if new_shows:
                         self.all_shows.extend(new_shows)
@@ -323,6 +574,7 @@ class SetlistFMScraperPlaywright:
                         
                         if total_shows and len(self.all_shows) >= total_shows:
                             print(f"🎉 Todos os {total_shows} shows coletados!")
+                            self.reached_end = True
                             break
                     else:
                         consecutive_empty_pages += 1
@@ -339,6 +591,7 @@ class SetlistFMScraperPlaywright:
                 page_number += 1
                 time.sleep(2)  # Pausa entre páginas
             
+            metrics.observe("setlistfm_pages_walked", page_number, engine="playwright")
             print(f"\n🎉 Coleta finalizada!")
             print(f"📊 Total de shows coletados: {len(self.all_shows)}")
             
@@ -349,16 +602,29 @@ class SetlistFMScraperPlaywright:
             return self.all_shows
             
         finally:
-            if self.browser:
-                self.browser.close()
-            if hasattr(self, '_playwright'):
-                self._playwright.stop()
-            print("🔒 Browser fechado")
+            if hasattr(self, '_stack'):
+                self._stack.close()
+            print("🔒 Contexto do browser fechado")
 
     def generate_excel_base64(self):
         if not self.all_shows:
             return None
 
+        buffer = BytesIO()
+        self.write_excel(buffer)
+        buffer.seek(0)
+
+        return base64.b64encode(buffer.read()).decode()
+
+    def write_excel(self, target):
+        """Gera a planilha em ``target`` (caminho de arquivo ou buffer binário)."""
+        start = time.perf_counter()
+        self._write_excel(target)
+        metrics.observe("excel_generation_seconds", time.perf_counter() - start, script="setlistfm")
+        size = os.path.getsize(target) if isinstance(target, str) else target.tell()
+        metrics.observe("excel_size_bytes", size, script="setlistfm")
+
+    def _write_excel(self, target):
         df = pd.DataFrame(self.all_shows)
 
         # Remove duplicatas
@@ -369,9 +635,7 @@ class SetlistFMScraperPlaywright:
         df = df.sort_values('Data_Sort', ascending=False, na_position='last')
         df = df.drop('Data_Sort', axis=1)
 
-        buffer = BytesIO()
-
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        with pd.ExcelWriter(target, engine='openpyxl') as writer:
 
             df.to_excel(writer, sheet_name='Todos os Shows', index=False)
 
@@ -394,7 +658,7 @@ class SetlistFMScraperPlaywright:
                     len(df[df['Festival'] != '']),
                     df['Data'].iloc[0] if len(df) > 0 else 'N/A',
                     df['Data'].iloc[-1] if len(df) > 0 else 'N/A',
-                    'Playwright'
+                    self.collect_method
                 ]
             }
 
@@ -439,18 +703,18 @@ class SetlistFMScraperPlaywright:
                             pass
                     worksheet.column_dimensions[column_letter].width = min(max_length + 2, 50)
 
-        buffer.seek(0)
-
-        return base64.b64encode(buffer.read()).decode()
-
 
 def main():
     USERNAME = "wsmetal"
     HEADLESS = True
+    # --output <arquivo>: grava o xlsx direto no arquivo em vez de imprimir em base64
+    OUTPUT_PATH = sys.argv[sys.argv.index("--output") + 1] if "--output" in sys.argv else None
+    # --full: coleta o attended inteiro e refaz o histórico guardado
+    FULL = "--full" in sys.argv
 
     scraper = SetlistFMScraperPlaywright(USERNAME, headless=HEADLESS)
 
-    shows = scraper.scrape_all_shows()
+    shows = scraper.scrape_all_shows(full=FULL)
 
     if not shows:
         print(json.dumps({
@@ -459,6 +723,16 @@ def main():
         }))
         return
 
+    if OUTPUT_PATH:
+        scraper.write_excel(OUTPUT_PATH)
+        print(json.dumps({
+            "success": True,
+            "message": f"{len(shows)} shows coletados ({scraper.new_count} novos)",
+            "fileName": "setlistfm_completo.xlsx",
+            "path": OUTPUT_PATH
+        }), flush=True)
+        return
+
     file_base64 = scraper.generate_excel_base64()
 
     if not file_base64:
@@ -470,7 +744,7 @@ def main():
 
     result = {
         "success": True,
-        "message": f"{len(shows)} shows coletados",
+        "message": f"{len(shows)} shows coletados ({scraper.new_count} novos)",
         "fileName": "setlistfm_completo.xlsx",
         "file": file_base64
     }
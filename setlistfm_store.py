@@ -0,0 +1,97 @@
+"""
+Shows já coletados do setlist.fm, em SQLite.
+
+A chave de um show é (Artista, Data, Local, Festival), a mesma usada para
+tirar duplicatas na planilha. Com os shows conhecidos guardados, a coleta
+incremental só percorre as páginas mais recentes do attended até achar uma
+página sem nenhum show novo e junta os novos aqui; a planilha sai desta
+tabela inteira. ``replace`` refaz a tabela a partir de uma coleta completa.
+"""
+import os
+import time
+import sqlite3
+import threading
+
+from monitor_store import DATA_DIR
+
+SETLISTFM_DB = os.getenv("SETLISTFM_DB", os.path.join(DATA_DIR, "shows.db"))
+
+SHOW_KEY = ("Artista", "Data", "Local", "Festival")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shows (
+    artista       TEXT NOT NULL,
+    data          TEXT NOT NULL,             -- dd/mm/aaaa, como na planilha
+    local         TEXT NOT NULL,
+    festival      TEXT NOT NULL,
+    cidade        TEXT NOT NULL,
+    first_seen_at REAL NOT NULL,             -- quando a coleta achou o show
+    PRIMARY KEY (artista, data, local, festival)
+);
+"""
+
+
+def show_key(show: dict) -> tuple:
+    return tuple(show[field] for field in SHOW_KEY)
+
+
+class ShowStore:
+    def __init__(self, path: str = SETLISTFM_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def keys(self) -> set:
+        with self._lock:
+            rows = self._conn.execute("SELECT artista, data, local, festival FROM shows").fetchall()
+        return {tuple(row) for row in rows}
+
+    def shows(self) -> list:
+        """Todos os shows no formato da planilha, na ordem do attended (mais novos primeiro)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM shows ORDER BY first_seen_at DESC, rowid").fetchall()
+        return [
+            {"Data": row["data"], "Artista": row["artista"], "Local": row["local"],
+             "Festival": row["festival"], "Cidade": row["cidade"]}
+            for row in rows
+        ]
+
+    def add(self, shows: list) -> int:
+        """Junta os shows à tabela (os já conhecidos são ignorados). Retorna quantos eram novos."""
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._insert(shows)
+            return self._conn.total_changes - before
+
+    def replace(self, shows: list):
+        """Refaz a tabela com o resultado de uma coleta completa."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM shows")
+            self._insert(shows)
+
+    def _insert(self, shows: list):
+        now = time.time()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO shows (artista, data, local, festival, cidade, first_seen_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(*show_key(show), show["Cidade"], now) for show in shows],
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_show_store() -> ShowStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ShowStore()
+        return _store
@@ -0,0 +1,52 @@
+"""
+Single-flight: chamadas idênticas e simultâneas compartilham uma única execução.
+
+O primeiro chamador de uma chave executa a função; quem chega com a mesma chave
+enquanto ela ainda roda só espera e recebe o mesmo resultado (ou a mesma exceção).
+"""
+import threading
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.callers = 1
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def do(self, key, fn):
+        """Executa ``fn()`` uma vez por chave em voo. Retorna ``(resultado, chamadores)``."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                flight.callers += 1
+
+        if leader:
+            try:
+                flight.result = fn()
+            except BaseException as e:
+                flight.error = e
+            finally:
+                # Sai do mapa antes de liberar os seguidores: ninguém mais se junta a este voo
+                with self._lock:
+                    del self._flights[key]
+                flight.done.set()
+        else:
+            flight.done.wait()
+
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, flight.callers
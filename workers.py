@@ -0,0 +1,315 @@
+"""
+Pool de processos pré-aquecidos para executar os scripts do app.py.
+
+Cada worker importa os módulos dos scripts uma única vez (pandas, openpyxl,
+bs4, Playwright...) e depois executa o ``main()`` do script sob demanda,
+capturando stdout/stderr como se fosse um ``subprocess.run``. Assim as rotas
+continuam recebendo um ``subprocess.CompletedProcess`` e montando o mesmo JSON
+de erro de antes.
+"""
+import os
+import io
+import sys
+import time
+import queue
+import signal
+import logging
+import threading
+import importlib
+import traceback
+import contextlib
+import subprocess
+import multiprocessing
+
+import metrics
+from admission import admission_limit
+
+# script -> módulo importado no worker
+SCRIPTS = {
+    "discogs.py": "discogs",
+    "setlistfm.py": "setlistfm",
+    "bluesky.py": "bluesky",
+    "monitorflip.py": "monitorflip",
+    "cmc.py": "cmc",
+}
+
+# Workers aquecidos na subida. WORKER_POOL_SIZE=0 desliga o pool e volta a
+# usar um subprocess por chamada
+POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "2"))
+# Teto do pool: por padrão a soma dos limites de admissão dos scripts, para
+# todo job admitido achar um worker (sem isso um bluesky esperava atrás de um
+# setlistfm). Os workers além de POOL_SIZE sobem sob demanda.
+MAX_POOL_SIZE = int(os.getenv(
+    "WORKER_POOL_MAX", str(sum(admission_limit(module) for module in SCRIPTS.values()))
+))
+# Recicla o worker depois de N execuções ou quando passar do limite de memória
+MAX_JOBS = int(os.getenv("WORKER_MAX_JOBS", "50"))
+MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "800"))
+
+
+# ---------------------------------------------------------------------------
+# LADO DO WORKER (processo filho)
+# ---------------------------------------------------------------------------
+
+def _rss_mb() -> float:
+    """Memória residente atual do processo, em MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _exit_code(code) -> int:
+    """Converte o argumento de SystemExit no returncode que o interpretador usaria."""
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _execute(job: dict) -> dict:
+    script = job["script"]
+    stdout, stderr = io.StringIO(), io.StringIO()
+    saved_argv, saved_stdin = sys.argv, sys.stdin
+    sys.argv = [script] + list(job.get("args") or [])
+    sys.stdin = io.StringIO(job.get("input") or "")
+    returncode = 0
+
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            try:
+                module = importlib.import_module(SCRIPTS[script])
+                module.main()
+            except SystemExit as e:
+                returncode = _exit_code(e.code)
+            except BaseException:
+                traceback.print_exc()
+                returncode = 1
+    finally:
+        sys.argv, sys.stdin = saved_argv, saved_stdin
+
+    return {
+        "returncode": returncode,
+        "stdout": stdout.getvalue(),
+        "stderr": stderr.getvalue(),
+        "rss_mb": _rss_mb(),
+        # fases internas medidas pelo script durante este job
+        "metrics": metrics.drain(),
+    }
+
+
+def _worker_main(conn):
+    # Grupo de processos próprio: ao matar o worker, o Chromium dele vai junto
+    try:
+        os.setpgid(0, 0)
+    except OSError:
+        pass
+
+    # Pré-aquecimento: importa todos os scripts antes do primeiro job
+    for module in SCRIPTS.values():
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            logging.warning(f"Worker {os.getpid()}: falha ao importar {module}: {e}")
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        conn.send(_execute(job))
+
+    from browser_pool import shutdown_browser_pool
+    shutdown_browser_pool()
+
+
+# ---------------------------------------------------------------------------
+# LADO DO POOL (processo do Flask)
+# ---------------------------------------------------------------------------
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.is_alive()
+
+    def stop(self, kill: bool = False):
+        try:
+            if kill:
+                self._kill()
+            else:
+                self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self._kill()
+            self.process.join(timeout=5)
+        self.conn.close()
+
+    def _kill(self):
+        """Mata o worker e o grupo dele (Chromium e driver do Playwright)."""
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (OSError, TypeError):
+            self.process.kill()
+
+
+class WorkerPool:
+    def __init__(self, size: int = POOL_SIZE, max_size: int = MAX_POOL_SIZE, max_jobs: int = MAX_JOBS,
+                 max_rss_mb: int = MAX_RSS_MB):
+        self.size = size
+        self.max_size = max(size, max_size)
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        # spawn: o processo do Flask tem threads, fork não é seguro
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._count = size  # workers existentes (ociosos + ocupados)
+        for _ in range(size):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._ctx)
+        logging.info(f"Worker {worker.pid} iniciado")
+        return worker
+
+    def _checkout(self) -> _Worker:
+        """Pega um worker ocioso e vivo; sem nenhum ocioso, sobe outro até ``max_size``.
+
+        Com o pool no teto espera um worker voltar. A espera não conta no
+        timeout do script: ele só começa a contar quando o job é enviado.
+        """
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    grow = self._count < self.max_size
+                    if grow:
+                        self._count += 1
+                if grow:
+                    metrics.inc("worker_pool_spawned_total")
+                    return self._spawn()
+                worker = self._idle.get()
+            if worker.is_alive():
+                return worker
+            logging.warning(f"Worker {worker.pid} morto encontrado no pool, substituindo")
+            worker.stop(kill=True)
+            self._idle.put(self._spawn())
+
+    def run(self, script: str, args=(), input: str = None, timeout: float = None) -> subprocess.CompletedProcess:
+        """Executa ``script`` num worker. Mesmo contrato de ``subprocess.run(capture_output=True, text=True)``."""
+        cmd = [sys.executable, script, *args]
+
+        with metrics.timer("worker_checkout_seconds", script=script):
+            worker = self._checkout()
+
+        try:
+            try:
+                worker.conn.send({"script": script, "args": list(args), "input": input})
+            except OSError:
+                return self._crashed(worker, cmd)
+
+            if not worker.conn.poll(timeout):
+                logging.warning(f"Worker {worker.pid} excedeu {timeout}s em {script}, encerrando")
+                worker.stop(kill=True)
+                worker = self._spawn()
+                raise subprocess.TimeoutExpired(cmd, timeout)
+
+            try:
+                reply = worker.conn.recv()
+            except (EOFError, OSError):
+                return self._crashed(worker, cmd)
+
+            worker.jobs += 1
+            if worker.jobs >= self.max_jobs or reply["rss_mb"] > self.max_rss_mb:
+                logging.info(
+                    f"Reciclando worker {worker.pid} "
+                    f"({worker.jobs} jobs, {reply['rss_mb']:.0f} MB)"
+                )
+                worker.stop()
+                worker = self._spawn()
+
+            metrics.merge(reply["metrics"])
+            return subprocess.CompletedProcess(cmd, reply["returncode"], reply["stdout"], reply["stderr"])
+
+        finally:
+            if not worker.is_alive():
+                worker = self._spawn()
+            self._idle.put(worker)
+
+    def _crashed(self, worker: _Worker, cmd: list) -> subprocess.CompletedProcess:
+        """Worker morreu no meio do job: devolve um resultado de falha como o de um script que quebrou."""
+        worker.process.join(timeout=5)
+        code = worker.process.exitcode
+        logging.error(f"Worker {worker.pid} morreu executando {cmd[1]} (exitcode={code})")
+        worker.stop(kill=True)
+        return subprocess.CompletedProcess(
+            cmd, code if code else -1, "",
+            f"Worker morreu durante a execucao de {cmd[1]} (exitcode={code})",
+        )
+
+    def shutdown(self):
+        for _ in range(self._count):
+            try:
+                self._idle.get(timeout=5).stop()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool()
+        return _pool
+
+
+def run_script(script: str, args=(), input: str = None, timeout: float = None) -> subprocess.CompletedProcess:
+    """Roda um dos scripts no pool de workers (ou num subprocess se o pool estiver desligado).
+
+    No modo subprocess só a duração total é medida; as fases internas do script se perdem.
+    """
+    mode = "pool" if POOL_SIZE > 0 else "subprocess"
+    outcome = "error"
+    start = time.perf_counter()
+    try:
+        if POOL_SIZE <= 0:
+            result = subprocess.run(
+                [sys.executable, script, *args],
+                input=input, capture_output=True, text=True, timeout=timeout,
+            )
+        else:
+            result = get_pool().run(script, args=args, input=input, timeout=timeout)
+        outcome = "ok" if result.returncode == 0 else "failed"
+        return result
+    except subprocess.TimeoutExpired:
+        outcome = "timeout"
+        raise
+    finally:
+        metrics.observe(
+            "worker_job_duration_seconds", time.perf_counter() - start,
+            script=script, mode=mode, outcome=outcome,
+        )